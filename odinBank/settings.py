@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,11 +44,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primeiro da lista: mede a requisição inteira, inclusive sessão e mensagens
+    'users.metricas.metricas_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'users.middleware.principal_middleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -73,12 +79,148 @@ WSGI_APPLICATION = 'odinBank.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# O banco vem do ambiente: SQLite por padrão ou PostgreSQL com
+# ODINBANK_DB_ENGINE=postgresql. No PostgreSQL as conexões saem do pool do
+# psycopg 3 (OPTIONS['pool'], requer `pip install "psycopg[binary,pool]"`), que
+# substitui CONN_MAX_AGE; iterator() usa cursores no servidor, a não ser que
+# ODINBANK_DB_SEM_CURSOR_SERVIDOR=1 (necessário atrás de pgbouncer em modo
+# transaction). A suíte também passa no PostgreSQL (16, psycopg 3.3 com pool):
+# ODINBANK_DB_ENGINE=postgresql python manage.py test users
+
+DB_ENGINE = os.environ.get('ODINBANK_DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('ODINBANK_DB_NAME', 'odinbank'),
+            'USER': os.environ.get('ODINBANK_DB_USER', 'odinbank'),
+            'PASSWORD': os.environ.get('ODINBANK_DB_PASSWORD', ''),
+            'HOST': os.environ.get('ODINBANK_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('ODINBANK_DB_PORT', '5432'),
+            'CONN_MAX_AGE': 0,
+            'CONN_HEALTH_CHECKS': True,
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('ODINBANK_DB_SEM_CURSOR_SERVIDOR') == '1',
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('ODINBANK_DB_POOL_MIN', 2)),
+                    'max_size': int(os.environ.get('ODINBANK_DB_POOL_MAX', 20)),
+                    # Segundos esperando uma conexão livre antes de falhar
+                    'timeout': int(os.environ.get('ODINBANK_DB_POOL_TIMEOUT', 10)),
+                },
+            },
+        }
+    }
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('ODINBANK_DB_NAME', BASE_DIR / 'db.sqlite3'),
+        }
     }
+else:
+    raise ImproperlyConfigured(f"ODINBANK_DB_ENGINE inválido: {DB_ENGINE!r} (use 'sqlite' ou 'postgresql')")
+
+# Perfil de produção do SQLite (opt-in com ODINBANK_SQLITE_PRODUCAO=1).
+# Os PRAGMAs abaixo são aplicados a cada nova conexão por
+# users.sqlite.aplicar_perfil_sqlite (sinal connection_created): WAL para que
+# leituras não esperem pelas escritas, synchronous=NORMAL (seguro com WAL),
+# mmap e cache maiores, busy_timeout em vez de "database is locked" imediato
+# e tabelas temporárias em memória.
+
+SQLITE_PRODUCAO = os.environ.get('ODINBANK_SQLITE_PRODUCAO') == '1'
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': int(os.environ.get('ODINBANK_SQLITE_MMAP', 256 * 1024 * 1024)),
+    # Negativo: tamanho em KiB (64 MiB)
+    'cache_size': -int(os.environ.get('ODINBANK_SQLITE_CACHE_KIB', 64 * 1024)),
+    'busy_timeout': int(os.environ.get('ODINBANK_SQLITE_BUSY_TIMEOUT', 5000)),
+    'temp_store': 'MEMORY',
+}
+
+if SQLITE_PRODUCAO and DB_ENGINE == 'sqlite':
+    DATABASES['default'].update({
+        # Conexões persistentes: os PRAGMAs são aplicados uma vez por conexão
+        'CONN_MAX_AGE': int(os.environ.get('ODINBANK_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        # Transações de escrita pegam a trava logo no BEGIN, evitando falhas
+        # ao promover uma leitura a escrita no meio da transação
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+    })
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Memória local por padrão; ODINBANK_CACHE_DIR troca para cache em arquivo,
+# compartilhado entre os processos da mesma máquina.
+
+if os.environ.get('ODINBANK_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['ODINBANK_CACHE_DIR'],
+        },
+        'sessoes': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(os.environ['ODINBANK_CACHE_DIR'], 'sessoes'),
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'odinbank',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+        'sessoes': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'odinbank-sessoes',
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        },
+    }
+
+# O contexto das páginas do cliente e o usuário logado ficam no cache 'default'
+# e são invalidados por versão (users.cache.invalidar_contas). Na memória
+# local a versão só muda no processo que fez a alteração: com vários
+# processos (gunicorn/uvicorn --workers N) os demais serviriam saldos antigos
+# até o tempo expirar. Nesse caso use ODINBANK_CACHE_DIR (ou Redis/Memcached)
+# e informe ODINBANK_PROCESSOS; com mais de um processo e cache só local, o
+# cache das contas é desligado.
+CACHE_COMPARTILHADO = CACHES['default']['BACKEND'] != 'django.core.cache.backends.locmem.LocMemCache'
+PROCESSOS = int(os.environ.get('ODINBANK_PROCESSOS', 1))
+CACHE_CONTAS_ATIVO = CACHE_COMPARTILHADO or PROCESSOS == 1
+
+# Tempo máximo (segundos) que o contexto das páginas do cliente fica em cache;
+# curto na memória local, onde só a versão do próprio processo é confiável
+CACHE_CONTAS_TIMEOUT = int(os.environ.get('ODINBANK_CACHE_CONTAS_TIMEOUT', 300 if CACHE_COMPARTILHADO else 30))
+
+# Catálogo de cartões: a chave é versionada e invalidada pelos sinais do Cartao,
+# então o tempo só limita quanto uma versão antiga ocupa o cache
+CACHE_CATALOGO_TIMEOUT = int(os.environ.get('ODINBANK_CACHE_CATALOGO_TIMEOUT', 24 * 60 * 60))
+
+# Sessões (guardam só user_id e admUser). ODINBANK_SESSAO escolhe o modo:
+#   db        - tabela django_session: uma leitura por requisição (padrão)
+#   cached_db - cache 'sessoes' na frente da tabela: leituras vêm do cache e
+#               só login/alterações escrevem no banco
+#   cookie    - cookie assinado com SECRET_KEY, sem estado no servidor; uma
+#               cópia do cookie continua válida até expirar
+# Para expirar as linhas antigas: `manage.py limpar_sessoes`.
+
+SESSAO_MODOS = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cookie': 'django.contrib.sessions.backends.signed_cookies',
 }
+SESSAO_MODO = os.environ.get('ODINBANK_SESSAO', 'db')
+if SESSAO_MODO not in SESSAO_MODOS:
+    raise ImproperlyConfigured(f"ODINBANK_SESSAO inválido: {SESSAO_MODO!r} (use {', '.join(SESSAO_MODOS)})")
+SESSION_ENGINE = SESSAO_MODOS[SESSAO_MODO]
+SESSION_CACHE_ALIAS = 'sessoes'
+
+# Tempo (segundos) que o gerente logado fica em cache entre requisições; o
+# cliente logado segue a versão da conta e usa CACHE_CONTAS_TIMEOUT
+PRINCIPAL_CACHE_TIMEOUT = int(os.environ.get('ODINBANK_PRINCIPAL_CACHE_TIMEOUT', 30))
 
 
 # Password validation
@@ -100,6 +242,35 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Pool de threads para o hash de senhas (login e cadastro assíncronos).
+# Acima de trabalhadores + fila, as requisições recebem 503 com Retry-After.
+
+HASH_POOL_TRABALHADORES = int(os.environ.get('ODINBANK_HASH_TRABALHADORES', 0)) or None
+HASH_POOL_FILA = int(os.environ.get('ODINBANK_HASH_FILA', 32))
+HASH_RETRY_AFTER = int(os.environ.get('ODINBANK_HASH_RETRY_AFTER', 1))
+
+
+# Métricas por view em /users/interno/metricas/ (formato Prometheus), acessíveis
+# só pelos IPs listados. Requisições acima dos limites vão para o log
+# "odinbank.metricas" (0 desliga o limite).
+#
+# O IP é o REMOTE_ADDR: atrás de um proxy reverso na mesma máquina toda
+# requisição externa chega como 127.0.0.1. Nesse caso defina
+# ODINBANK_METRICAS_TOKEN; o endpoint passa a exigir também o cabeçalho
+# "Authorization: Bearer <token>".
+
+METRICAS_IPS = [ip.strip() for ip in os.environ.get('ODINBANK_METRICAS_IPS', '127.0.0.1,::1').split(',') if ip.strip()]
+METRICAS_TOKEN = os.environ.get('ODINBANK_METRICAS_TOKEN', '')
+METRICAS_LIMITE_CONSULTAS = int(os.environ.get('ODINBANK_METRICAS_LIMITE_CONSULTAS', 0))
+METRICAS_LIMITE_MS = int(os.environ.get('ODINBANK_METRICAS_LIMITE_MS', 0))
+
+
+# Números de cartão: prefixo (BIN) e tamanho do pool pré-gerado
+
+CARTAO_BIN = os.environ.get('ODINBANK_CARTAO_BIN', '650487')
+CARTAO_POOL_TAMANHO = int(os.environ.get('ODINBANK_CARTAO_POOL', 1000))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Cliente, Gerente, SolicitacaoCredito, Transferencia, Cartao, CartaoCliente
+from .models import Cliente, Gerente, SolicitacaoCredito, Transferencia, Cartao, CartaoCliente, LancamentoContabil
 
 # Register your models here.
 admin.site.register(Cliente)
@@ -7,4 +7,24 @@ admin.site.register(Gerente)
 admin.site.register(SolicitacaoCredito)
 admin.site.register(Transferencia)
 admin.site.register(Cartao)
-admin.site.register(CartaoCliente)
\ No newline at end of file
+admin.site.register(CartaoCliente)
+
+
+@admin.register(LancamentoContabil)
+class LancamentoContabilAdmin(admin.ModelAdmin):
+    """O razão é só de inclusão: no admin os lançamentos são apenas consultados."""
+
+    list_display = ('created_at', 'cliente', 'conta', 'origem', 'tipo', 'valor', 'saldo_apos')
+    list_filter = ('conta', 'origem', 'tipo')
+
+    def get_readonly_fields(self, request, obj=None):
+        return [f.name for f in self.model._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
\ No newline at end of file
@@ -1,6 +1,22 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from .catalogo import aquecer_catalogo, invalidar_catalogo
+        from .sqlite import aplicar_perfil_sqlite
+        connection_created.connect(aplicar_perfil_sqlite, dispatch_uid='odinbank_perfil_sqlite')
+
+        Cartao = self.get_model('Cartao')
+        post_save.connect(invalidar_catalogo, sender=Cartao, dispatch_uid='odinbank_catalogo_salvo')
+        post_delete.connect(invalidar_catalogo, sender=Cartao, dispatch_uid='odinbank_catalogo_apagado')
+        # Consultar o banco dentro de ready() roda também em migrate/check (com
+        # as tabelas possivelmente ainda inexistentes); o catálogo é aquecido
+        # na primeira requisição do processo
+        request_started.connect(aquecer_catalogo, dispatch_uid='odinbank_aquecer_catalogo')
@@ -0,0 +1,207 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from .catalogo import invalidar_catalogo
+from .estatisticas import resumir
+from .models import Cartao, CartaoCliente, Cliente, Credencial, Gerente, LancamentoContabil
+from .numeracao import alocador_de_contas
+from .seed import cartoes_do_catalogo, cpf_ficticio
+from .transferencias import processar_lote
+
+
+@contextmanager
+def banco_temporario(arquivo=None):
+    """
+    Cria um banco de testes descartável para os benchmarks não tocarem no banco
+    real, com o ambiente de testes ativo para o Client do Django funcionar.
+
+    No SQLite o banco de testes fica em memória; `arquivo` força um banco em
+    disco (necessário para medir journal, WAL e concorrência entre conexões).
+    """
+    nome_original = connection.settings_dict['NAME']
+    teste = connection.settings_dict.setdefault('TEST', {})
+    nome_teste_original = teste.get('NAME')
+    if arquivo:
+        teste['NAME'] = str(arquivo)
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(nome_original, verbosity=0)
+        teste['NAME'] = nome_teste_original
+        teardown_test_environment()
+
+
+def cronometrar(funcao, *args, **kwargs):
+    """Executa a função e devolve (resultado, segundos)."""
+    inicio = time.perf_counter()
+    resultado = funcao(*args, **kwargs)
+    return resultado, time.perf_counter() - inicio
+
+
+def popular_banco(gerentes=5, clientes=200, transferencias=2000, solicitacoes_cartao=100, semente=42):
+    """
+    Cria um conjunto de dados reprodutível (mesma semente, mesmos dados) com
+    bulk_create: gerentes, clientes com credenciais e lançamentos de abertura,
+    histórico de transferências, catálogo de cartões e solicitações pendentes.
+    """
+    rng = random.Random(semente)
+    senha = make_password("bench")
+
+    lista_gerentes = Gerente.objects.bulk_create([
+        Gerente(
+            nome=f"Gerente {i}", cpf=cpf_ficticio(9, i), email=f"gerente{i}@odinbank.test",
+            telefone="(11)90000-0000", matricula=f"BENCH{i}", data_admissao=date(2020, 1, 1),
+            data_de_nascimento=date(1980, 1, 1), salario=Decimal("10000.00"), password=senha,
+        )
+        for i in range(gerentes)
+    ])
+    numeros = alocador_de_contas.reservar(clientes)
+    lista_clientes = Cliente.objects.bulk_create([
+        Cliente(
+            gerente_responsavel=lista_gerentes[i % gerentes] if gerentes else None,
+            numero_da_conta=numeros[i], cpf=cpf_ficticio(1, i), username=f"cliente{i}",
+            email=f"cliente{i}@odinbank.test", password=senha, data_de_nascimento=date(1990, 1, 1),
+            telefone="(11)90000-0000", tipo_de_conta="corrente",
+            saldo=Decimal(rng.randint(1000, 100000)), creditos=Decimal(rng.randint(0, 10000)),
+            status_conta=rng.choices(("ativa", "inativa", "bloqueada"), weights=(90, 7, 3))[0],
+        )
+        for i in range(clientes)
+    ], batch_size=1000)
+
+    Credencial.objects.bulk_create(
+        [Credencial(email=g.email, password=g.password, admUser=True, gerente=g) for g in lista_gerentes]
+        + [Credencial(email=c.email, password=c.password, admUser=False, cliente=c) for c in lista_clientes],
+        batch_size=1000,
+    )
+    LancamentoContabil.objects.bulk_create([
+        LancamentoContabil(
+            cliente=c, conta=conta, origem='abertura', tipo='credito', valor=getattr(c, conta),
+            saldo_apos=getattr(c, conta), descricao="Abertura de conta",
+        )
+        for c in lista_clientes
+        for conta in ('saldo', 'creditos')
+        if getattr(c, conta)
+    ], batch_size=1000)
+
+    if clientes > 1:
+        linhas = []
+        for _ in range(transferencias):
+            remetente, destinatario = rng.sample(lista_clientes, 2)
+            linhas.append({"remetente": remetente.cpf, "destinatario": destinatario.cpf, "valor": f"{rng.randint(1, 500)}.00"})
+        for inicio in range(0, len(linhas), 5000):
+            processar_lote(linhas[inicio:inicio + 5000])
+
+    cartoes = Cartao.objects.bulk_create(cartoes_do_catalogo())
+    # bulk_create não dispara post_save
+    invalidar_catalogo()
+    CartaoCliente.objects.bulk_create([
+        CartaoCliente(cliente=c, gerente_id=c.gerente_responsavel_id, cartao=rng.choice(cartoes))
+        for c in rng.sample(lista_clientes, min(solicitacoes_cartao, clientes))
+    ], batch_size=1000)
+
+    return {"gerentes": lista_gerentes, "clientes": lista_clientes}
+
+
+# Cenários do `manage.py bench`: perfil que faz a requisição, método, URL e dados
+CENARIOS = {
+    "transferencia": ("cliente", "post", "users:transferencia"),
+    "extrato": ("cliente", "get", "users:extrato"),
+    "perfil_cliente": ("cliente", "get", "users:perfil"),
+    "perfil_gerente": ("gerente", "get", "users:perfil"),
+    "listar_cartoes": ("cliente", "get", "users:listar_cartoes"),
+    "solicitacoes_cartoes": ("gerente", "get", "users:solicitacoes_cartoes"),
+}
+
+
+def _logado(usuario, admUser):
+    client = Client()
+    session = client.session
+    session["user_id"] = usuario.id
+    session["admUser"] = admUser
+    session.save()
+    return client
+
+
+def medir_cenarios(dados, requisicoes=200, aquecimento=10, usuarios=20, cenarios=None, semente=42):
+    """
+    Executa cada cenário pelo Client do Django com usuários já logados e
+    devolve vazão, percentis de latência e consultas por requisição.
+    """
+    rng = random.Random(semente)
+    sessoes = {
+        "cliente": [(c, _logado(c, False)) for c in dados["clientes"][:usuarios]],
+        "gerente": [(g, _logado(g, True)) for g in dados["gerentes"][:usuarios]],
+    }
+    cpfs = [c.cpf for c in dados["clientes"]]
+
+    resultado = {}
+    for nome in cenarios or CENARIOS:
+        perfil, metodo, rota = CENARIOS[nome]
+        if not sessoes[perfil]:
+            continue
+        url = reverse(rota)
+
+        def requisitar():
+            usuario, client = rng.choice(sessoes[perfil])
+            if metodo == "post":
+                destino = rng.choice(cpfs)
+                if destino == usuario.cpf:
+                    destino = cpfs[(cpfs.index(destino) + 1) % len(cpfs)]
+                return client.post(url, {"cpf": destino, "valor": "1.00"})
+            return client.get(url)
+
+        for _ in range(aquecimento):
+            requisitar()
+
+        amostras, consultas, erros = [], 0, 0
+        inicio = time.perf_counter()
+        for _ in range(requisicoes):
+            with CaptureQueriesContext(connection) as ctx:
+                resposta, segundos = cronometrar(requisitar)
+            amostras.append(segundos)
+            consultas += len(ctx.captured_queries)
+            erros += resposta.status_code >= 400
+        duracao = time.perf_counter() - inicio
+
+        resultado[nome] = {
+            **resumir(amostras),
+            "requisicoes_por_segundo": round(requisicoes / duracao, 1) if duracao else 0.0,
+            "consultas_por_requisicao": round(consultas / requisicoes, 2) if requisicoes else 0.0,
+            "erros": erros,
+        }
+    return resultado
+
+
+def comparar(atual, base, tolerancia=0.2):
+    """
+    Aponta regressões em relação a um resultado salvo: p95 acima da base em
+    mais de `tolerancia` (fração) ou mais consultas por requisição.
+    """
+    regressoes = []
+    for nome, medida in atual.items():
+        referencia = base.get(nome)
+        if referencia is None:
+            continue
+        if medida["p95_ms"] > referencia["p95_ms"] * (1 + tolerancia):
+            regressoes.append(
+                f"{nome}: p95 {medida['p95_ms']} ms > {referencia['p95_ms']} ms (+{tolerancia:.0%} de tolerância)"
+            )
+        if medida["consultas_por_requisicao"] > referencia["consultas_por_requisicao"] + 0.01:
+            regressoes.append(
+                f"{nome}: {medida['consultas_por_requisicao']} consultas por requisição "
+                f"> {referencia['consultas_por_requisicao']}"
+            )
+        if medida["erros"] > referencia.get("erros", 0):
+            regressoes.append(f"{nome}: {medida['erros']} erros > {referencia.get('erros', 0)}")
+    return regressoes
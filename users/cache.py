@@ -0,0 +1,77 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _chave_versao(cliente_id):
+    return f"conta:{cliente_id}:versao"
+
+
+def versao_conta(cliente_id):
+    """Versão atual dos dados da conta; muda sempre que algo da conta é alterado."""
+    chave = _chave_versao(cliente_id)
+    versao = cache.get(chave)
+    if versao is None:
+        # Um valor novo a cada inicialização impede que entradas antigas
+        # (de antes de a chave expirar) voltem a ser servidas
+        cache.add(chave, time.time_ns(), None)
+        versao = cache.get(chave)
+    return versao
+
+
+def _incrementar(ids):
+    for cliente_id in ids:
+        try:
+            cache.incr(_chave_versao(cliente_id))
+        except ValueError:
+            # Sem versão em cache: a próxima leitura já cria uma nova
+            pass
+
+
+def invalidar_contas(*ids):
+    """
+    Descarta o que estiver em cache para as contas informadas.
+
+    A versão é incrementada na hora e de novo após o commit, para que uma
+    leitura concorrente feita antes do commit não fique valendo.
+    """
+    ids = [i for i in ids if i is not None]
+    _incrementar(ids)
+    transaction.on_commit(lambda: _incrementar(ids))
+
+
+def contexto_em_cache(cliente_id, pagina, construir):
+    """Devolve o contexto da página a partir do cache da versão atual da conta."""
+    if not settings.CACHE_CONTAS_ATIVO:
+        return construir()
+    chave = f"conta:{cliente_id}:v{versao_conta(cliente_id)}:{pagina}"
+    contexto = cache.get(chave)
+    if contexto is None:
+        contexto = construir()
+        cache.set(chave, contexto, settings.CACHE_CONTAS_TIMEOUT)
+    return contexto
+
+
+def _chave_gerente(gerente_id):
+    return f"gerente:{gerente_id}:principal"
+
+
+def gerente_em_cache(gerente_id, carregar):
+    """Gerente logado, guardado por PRINCIPAL_CACHE_TIMEOUT segundos."""
+    if not settings.CACHE_CONTAS_ATIVO:
+        return carregar()
+    chave = _chave_gerente(gerente_id)
+    gerente = cache.get(chave)
+    if gerente is None:
+        gerente = carregar()
+        if gerente is not None:
+            cache.set(chave, gerente, settings.PRINCIPAL_CACHE_TIMEOUT)
+    return gerente
+
+
+def invalidar_gerente(gerente_id):
+    chave = _chave_gerente(gerente_id)
+    cache.delete(chave)
+    transaction.on_commit(lambda: cache.delete(chave))
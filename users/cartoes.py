@@ -0,0 +1,183 @@
+import secrets
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import invalidar_contas
+from .models import CartaoCliente, NumeroCartaoDisponivel, gerar_senha_cartao
+
+TAMANHO_NUMERO = 16
+
+
+def digito_luhn(parcial):
+    """Dígito que torna `parcial` + dígito válido pelo algoritmo de Luhn."""
+    soma = 0
+    for i, d in enumerate(reversed(parcial)):
+        n = int(d)
+        if i % 2 == 0:
+            n *= 2
+            if n > 9:
+                n -= 9
+        soma += n
+    return str((10 - soma % 10) % 10)
+
+
+def luhn_valido(numero):
+    return numero.isdigit() and digito_luhn(numero[:-1]) == numero[-1]
+
+
+def _gerar_candidato(bin_):
+    corpo = ''.join(secrets.choice('0123456789') for _ in range(TAMANHO_NUMERO - len(bin_) - 1))
+    parcial = bin_ + corpo
+    return parcial + digito_luhn(parcial)
+
+
+def gerar_numeros_cartao(quantidade, bin_=None):
+    """Gera `quantidade` números inéditos: nem no pool nem já atribuídos a um cartão."""
+    bin_ = bin_ or settings.CARTAO_BIN
+    numeros = set()
+    while len(numeros) < quantidade:
+        candidatos = {_gerar_candidato(bin_) for _ in range(quantidade - len(numeros))} - numeros
+        # Duas consultas por rodada, independentemente do tamanho do lote
+        candidatos -= set(CartaoCliente.objects.filter(numero_cartao__in=candidatos).values_list('numero_cartao', flat=True))
+        candidatos -= set(NumeroCartaoDisponivel.objects.filter(numero__in=candidatos).values_list('numero', flat=True))
+        numeros |= candidatos
+    return list(numeros)
+
+
+def reabastecer_pool(minimo=None, lote=1000):
+    """Completa o pool até `minimo` números livres. Retorna quantos foram incluídos."""
+    minimo = settings.CARTAO_POOL_TAMANHO if minimo is None else minimo
+    incluidos = 0
+    faltam = minimo - NumeroCartaoDisponivel.objects.count()
+    while faltam > 0:
+        numeros = gerar_numeros_cartao(min(faltam, lote))
+        NumeroCartaoDisponivel.objects.bulk_create(
+            [NumeroCartaoDisponivel(numero=n) for n in numeros],
+            ignore_conflicts=True,
+        )
+        incluidos += len(numeros)
+        faltam -= len(numeros)
+    return incluidos
+
+
+class _ConflitoNoPool(Exception):
+    pass
+
+
+def _retirar_do_pool(quantidade):
+    trava = {'skip_locked': True} if connection.features.has_select_for_update_skip_locked else {}
+    with transaction.atomic():
+        livres = list(
+            NumeroCartaoDisponivel.objects.select_for_update(**trava)
+            .order_by('id')
+            .values_list('id', 'numero')[:quantidade]
+        )
+        apagados, _ = NumeroCartaoDisponivel.objects.filter(id__in=[i for i, _ in livres]).delete()
+        if apagados != len(livres):
+            # Outro processo levou parte dos números: desfaz a retirada
+            raise _ConflitoNoPool()
+    return [n for _, n in livres]
+
+
+def reivindicar_numeros_cartao(quantidade, tentativas=3):
+    """
+    Retira `quantidade` números do pool de forma atômica.
+
+    Se o pool não tiver números suficientes, o restante é gerado na hora
+    (mais lento); rode `manage.py reabastecer_cartoes` para evitar isso.
+    """
+    numeros = []
+    for tentativa in range(tentativas):
+        try:
+            numeros = _retirar_do_pool(quantidade)
+            break
+        except _ConflitoNoPool:
+            if tentativa == tentativas - 1:
+                numeros = []
+
+    if len(numeros) < quantidade:
+        numeros += gerar_numeros_cartao(quantidade - len(numeros))
+    return numeros
+
+
+RESPOSTAS = {
+    'aprovar': ('aprovado', "Solicitação aprovada pelo gerente."),
+    'negar': ('negado', "Solicitação negada pelo gerente."),
+}
+
+
+def decidir_solicitacoes_cartao(ids, acao, gerente_id):
+    """
+    Aprova ou nega várias solicitações de cartão em uma única transação.
+
+    As mesmas regras de `CartaoCliente.clean()` são conferidas para o lote
+    inteiro em duas consultas (solicitações com cliente e cartão, e cartões
+    já aprovados), os números vêm de uma única retirada do pool e tudo é
+    gravado com bulk_update. Solicitações de outro gerente, já respondidas
+    ou inexistentes entram no relatório como ignoradas.
+    Retorna {"processadas": [...], "ignoradas": [{"id", "mensagem"}]}.
+    """
+    status, resposta = RESPOSTAS[acao]
+    ids = list(dict.fromkeys(ids))
+    processadas, ignoradas = [], []
+
+    with transaction.atomic():
+        solicitacoes = {
+            s.pk: s
+            for s in CartaoCliente.objects.select_for_update(of=('self',))
+            .select_related('cliente', 'cartao')
+            .only('status', 'cliente__creditos', 'cliente__username', 'cartao__nome', 'cartao__limite_minimo')
+            .filter(pk__in=ids, status='pendente', gerente_id=gerente_id)
+        }
+
+        aprovados = set()
+        if acao == 'aprovar' and solicitacoes:
+            aprovados = set(
+                CartaoCliente.objects.filter(
+                    status='aprovado',
+                    cliente_id__in={s.cliente_id for s in solicitacoes.values()},
+                    cartao_id__in={s.cartao_id for s in solicitacoes.values()},
+                ).values_list('cliente_id', 'cartao_id')
+            )
+
+        decididas = []
+        for pk in ids:
+            solicitacao = solicitacoes.get(pk)
+            if solicitacao is None:
+                ignoradas.append({"id": pk, "mensagem": "Solicitação não encontrada ou já respondida."})
+                continue
+            if acao == 'aprovar':
+                par = (solicitacao.cliente_id, solicitacao.cartao_id)
+                if par in aprovados:
+                    ignoradas.append({"id": pk, "mensagem": "Cliente já possui este cartão aprovado."})
+                    continue
+                if solicitacao.cartao.limite_minimo > solicitacao.cliente.creditos:
+                    ignoradas.append({"id": pk, "mensagem": "Limite do cliente não permite este cartão."})
+                    continue
+                # Duas solicitações do mesmo cartão no lote: só a primeira é aprovada
+                aprovados.add(par)
+            decididas.append(solicitacao)
+
+        campos = ['status', 'resposta_gerente', 'gerente']
+        if acao == 'aprovar' and decididas:
+            validade = timezone.now().date()
+            validade = validade.replace(year=validade.year + 5)
+            numeros = reivindicar_numeros_cartao(len(decididas))
+            for solicitacao, numero in zip(decididas, numeros):
+                solicitacao.numero_cartao = numero
+                solicitacao.validade = validade
+                solicitacao.cvv = f"{secrets.randbelow(900) + 100}"
+                solicitacao.senha = gerar_senha_cartao()
+            campos += ['numero_cartao', 'validade', 'cvv', 'senha']
+
+        for solicitacao in decididas:
+            solicitacao.status = status
+            solicitacao.resposta_gerente = resposta
+            solicitacao.gerente_id = gerente_id
+            processadas.append(solicitacao.pk)
+        CartaoCliente.objects.bulk_update(decididas, campos, batch_size=500)
+
+    invalidar_contas(*{s.cliente_id for s in decididas})
+    return {"processadas": processadas, "ignoradas": ignoradas}
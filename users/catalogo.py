@@ -0,0 +1,141 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import BooleanField, Exists, ExpressionWrapper, OuterRef, Q
+
+from .cache import contexto_em_cache
+from .models import Cartao, CartaoCliente
+
+_CHAVE_VERSAO = "catalogo:cartoes:versao"
+
+
+def _versao():
+    versao = cache.get(_CHAVE_VERSAO)
+    if versao is None:
+        # Mesmo cuidado de versao_conta: versão nova a cada inicialização
+        cache.add(_CHAVE_VERSAO, time.time_ns(), None)
+        versao = cache.get(_CHAVE_VERSAO)
+    return versao
+
+
+def _incrementar():
+    try:
+        cache.incr(_CHAVE_VERSAO)
+    except ValueError:
+        pass
+
+
+class CatalogoDeCartoes:
+    """
+    Catálogo de cartões em dois níveis: uma cópia na memória do processo e
+    outra no cache compartilhado, ambas presas à versão do catálogo. Em regime
+    a leitura custa só a consulta da versão no cache, sem tocar no banco.
+
+    Os cartões vêm ordenados por limite mínimo e já separados por tipo. As
+    instâncias são compartilhadas entre requisições e não devem ser alteradas.
+    """
+
+    def __init__(self):
+        self._local = None  # (versão, dados)
+
+    def _carregar(self):
+        cartoes = list(Cartao.objects.order_by('limite_minimo', 'id'))
+        return {
+            "todos": cartoes,
+            "por_id": {c.pk: c for c in cartoes},
+            "por_tipo": {tipo: [c for c in cartoes if c.tipo == tipo] for tipo, _ in Cartao.TIPO_CHOICES},
+        }
+
+    def _dados(self):
+        versao = _versao()
+        local = self._local
+        if local is not None and local[0] == versao:
+            return local[1]
+
+        chave = f"catalogo:cartoes:v{versao}"
+        dados = cache.get(chave)
+        if dados is None:
+            dados = self._carregar()
+            cache.set(chave, dados, settings.CACHE_CATALOGO_TIMEOUT)
+        self._local = (versao, dados)
+        return dados
+
+    def todos(self):
+        return self._dados()["todos"]
+
+    def por_tipo(self, tipo):
+        return self._dados()["por_tipo"].get(tipo, [])
+
+    def obter(self, cartao_id):
+        """Cartão pelo id, ou None se não existir."""
+        return self._dados()["por_id"].get(cartao_id)
+
+    def versao(self):
+        return _versao()
+
+    def aquecer(self):
+        self._dados()
+
+    def invalidar(self):
+        """
+        Descarta o catálogo em todos os processos. Como em invalidar_contas, a
+        versão muda na hora e de novo após o commit.
+        """
+        self._local = None
+        _incrementar()
+        transaction.on_commit(_incrementar)
+
+
+catalogo = CatalogoDeCartoes()
+
+
+def invalidar_catalogo(sender=None, **kwargs):
+    """
+    Receptor de post_save/post_delete do Cartao. bulk_create e update() não
+    disparam sinais: quem usa esses caminhos chama esta função diretamente.
+    """
+    catalogo.invalidar()
+
+
+def aquecer_catalogo(sender=None, **kwargs):
+    """Carrega o catálogo na primeira requisição do processo e sai da lista de receptores."""
+    from django.core.signals import request_started
+
+    request_started.disconnect(dispatch_uid='odinbank_aquecer_catalogo')
+    catalogo.aquecer()
+
+
+def _situacoes(cliente):
+    solicitacoes = CartaoCliente.objects.filter(cliente_id=cliente.pk, cartao=OuterRef('pk'))
+    linhas = Cartao.objects.annotate(
+        possui=Exists(solicitacoes.filter(status='aprovado')),
+        solicitado=Exists(solicitacoes.filter(status='pendente')),
+        limite_ok=ExpressionWrapper(Q(limite_minimo__lte=cliente.creditos), output_field=BooleanField()),
+    ).values_list('pk', 'possui', 'solicitado', 'limite_ok')
+
+    situacoes = {}
+    for pk, possui, solicitado, limite_ok in linhas:
+        if possui:
+            situacoes[pk] = 'aprovado'
+        elif solicitado:
+            situacoes[pk] = 'pendente'
+        elif not limite_ok:
+            situacoes[pk] = 'sem_limite'
+        else:
+            situacoes[pk] = 'disponivel'
+    return situacoes
+
+
+def situacao_dos_cartoes(cliente):
+    """
+    Situação de cada cartão do catálogo para o cliente: 'aprovado' (já
+    possui), 'pendente' (já solicitado), 'sem_limite' (créditos abaixo do
+    limite mínimo) ou 'disponivel'. Calculada em uma única consulta com Exists
+    e guardada no cache da conta; a chave inclui a versão do catálogo, então
+    cartões novos ou alterados também geram um cálculo novo.
+    """
+    return contexto_em_cache(
+        cliente.pk, f"situacao_cartoes:{catalogo.versao()}", lambda: _situacoes(cliente)
+    )
@@ -0,0 +1,78 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import invalidar_contas
+from .models import Cliente, LancamentoContabil, SolicitacaoCredito
+
+RESPOSTAS = {
+    'aprovar': ('aprovado', "Solicitação aprovada pelo gerente."),
+    'negar': ('negado', "Solicitação negada pelo gerente."),
+}
+
+
+def decidir_solicitacoes_credito(ids, acao, gerente_id, resposta=None):
+    """
+    Aprova ou nega várias solicitações de crédito em uma única transação.
+
+    Os status mudam em um único UPDATE; nas aprovações, os valores são somados
+    por cliente e aplicados com um UPDATE `creditos = creditos + delta` por
+    cliente, sem reescrever a linha inteira. Os lançamentos contábeis são
+    gravados com bulk_create. Solicitações de outro gerente, já respondidas
+    ou inexistentes entram no relatório como ignoradas.
+    Retorna {"processadas": [...], "ignoradas": [{"id", "mensagem"}]}.
+    """
+    status, resposta_padrao = RESPOSTAS[acao]
+    ids = list(dict.fromkeys(ids))
+
+    with transaction.atomic():
+        pendentes = {
+            pk: (cliente_id, valor)
+            for pk, cliente_id, valor in SolicitacaoCredito.objects.select_for_update()
+            .filter(pk__in=ids, status='pendente', gerente_id=gerente_id)
+            .values_list('pk', 'cliente_id', 'valor')
+        }
+        processadas = [pk for pk in ids if pk in pendentes]
+        ignoradas = [
+            {"id": pk, "mensagem": "Solicitação não encontrada ou já respondida."}
+            for pk in ids if pk not in pendentes
+        ]
+
+        SolicitacaoCredito.objects.filter(pk__in=processadas).update(
+            status=status, resposta_gerente=resposta or resposta_padrao
+        )
+
+        if acao == 'aprovar' and processadas:
+            deltas = defaultdict(Decimal)
+            for pk in processadas:
+                cliente_id, valor = pendentes[pk]
+                deltas[cliente_id] += valor
+            for cliente_id, delta in deltas.items():
+                Cliente.objects.filter(pk=cliente_id).update(creditos=F('creditos') + delta)
+
+            # Saldo de créditos após cada lançamento, a partir do valor final lido do banco
+            finais = dict(Cliente.objects.filter(pk__in=deltas).values_list('pk', 'creditos'))
+            correntes = {c: finais[c] - deltas[c] for c in deltas}
+            agora = timezone.now()
+            lancamentos = []
+            for pk in processadas:
+                cliente_id, valor = pendentes[pk]
+                correntes[cliente_id] += valor
+                lancamentos.append(LancamentoContabil(
+                    cliente_id=cliente_id,
+                    conta='creditos',
+                    origem='credito',
+                    tipo='credito',
+                    valor=valor,
+                    saldo_apos=correntes[cliente_id],
+                    solicitacao_id=pk,
+                    descricao="Solicitação de crédito aprovada",
+                    created_at=agora,
+                ))
+            LancamentoContabil.objects.bulk_create(lancamentos, batch_size=500)
+
+    invalidar_contas(*{pendentes[pk][0] for pk in processadas})
+    return {"processadas": processadas, "ignoradas": ignoradas}
@@ -0,0 +1,42 @@
+from functools import wraps
+
+from django.contrib import messages
+from django.http import JsonResponse
+from django.shortcuts import redirect
+
+from .middleware import principal_da_requisicao
+from .models import Cliente, Gerente
+
+
+def _exigir(modelo, mensagem_padrao, destino_padrao):
+    def decorator(view=None, *, mensagem=mensagem_padrao, destino=destino_padrao, json=False):
+        """
+        Só deixa passar o usuário logado do tipo esperado, disponível na view
+        como `request.principal`. Sem login redireciona para o login; logado
+        com o perfil errado mostra `mensagem` e redireciona para `destino`.
+        Com json=True responde 401/403 em JSON.
+        """
+        def envolver(funcao):
+            @wraps(funcao)
+            def view_protegida(request, *args, **kwargs):
+                principal = principal_da_requisicao(request)
+                if principal is None:
+                    if json:
+                        return JsonResponse({"erro": "Usuário não autenticado."}, status=401)
+                    return redirect("users:login")
+                if not isinstance(principal, modelo):
+                    if json:
+                        return JsonResponse({"erro": mensagem}, status=403)
+                    if mensagem:
+                        messages.error(request, mensagem)
+                    return redirect(destino)
+                request.principal = principal
+                return funcao(request, *args, **kwargs)
+            return view_protegida
+
+        return envolver(view) if view is not None else envolver
+    return decorator
+
+
+cliente_required = _exigir(Cliente, "Apenas clientes podem acessar esta página.", "users:perfil")
+gerente_required = _exigir(Gerente, "Apenas gerentes podem acessar esta página.", "users:login")
@@ -0,0 +1,23 @@
+import statistics
+
+
+def percentil(amostras, p):
+    """Percentil p (0-100) de uma lista de amostras, por interpolação linear."""
+    if not amostras:
+        return 0.0
+    ordenadas = sorted(amostras)
+    k = (len(ordenadas) - 1) * p / 100
+    baixo = int(k)
+    alto = min(baixo + 1, len(ordenadas) - 1)
+    return ordenadas[baixo] + (ordenadas[alto] - ordenadas[baixo]) * (k - baixo)
+
+
+def resumir(amostras):
+    """Resume tempos (em segundos) em milissegundos."""
+    return {
+        "n": len(amostras),
+        "media_ms": round(statistics.fmean(amostras) * 1000, 3) if amostras else 0.0,
+        "p50_ms": round(percentil(amostras, 50) * 1000, 3),
+        "p95_ms": round(percentil(amostras, 95) * 1000, 3),
+        "p99_ms": round(percentil(amostras, 99) * 1000, 3),
+    }
@@ -0,0 +1,138 @@
+import csv
+from decimal import Decimal
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.utils import timezone
+
+from .extrato import aplicar_filtros
+from .models import LancamentoContabil, Transferencia
+
+# Linhas buscadas do banco por vez; a memória usada não depende do tamanho do histórico
+TAMANHO_DO_BLOCO = 2000
+
+CABECALHO_CSV = ("data", "id", "tipo", "contraparte", "conta_contraparte", "valor", "status")
+
+
+def transferencias_para_exportar(cliente, filtros):
+    """
+    Transferências enviadas e recebidas pelo cliente, da mais antiga para a
+    mais recente, como tuplas (id, data, valor, status, remetente_id,
+    remetente, conta do remetente, destinatário, conta do destinatário).
+
+    O iterator() lê em blocos de TAMANHO_DO_BLOCO: no SQLite pelo cursor
+    aberto, no PostgreSQL por cursor no servidor (a menos que
+    DISABLE_SERVER_SIDE_CURSORS esteja ligado para o pgbouncer).
+    """
+    queryset = (
+        Transferencia.objects
+        .filter(Q(remetente=cliente) | Q(destinatario=cliente))
+        .order_by("data_transferencia", "id")
+    )
+    queryset = aplicar_filtros(queryset, filtros, campo_data="data_transferencia")
+    return queryset.values_list(
+        "id", "data_transferencia", "valor", "status", "remetente_id",
+        "remetente__username", "remetente__numero_da_conta",
+        "destinatario__username", "destinatario__numero_da_conta",
+    ).iterator(chunk_size=TAMANHO_DO_BLOCO)
+
+
+def _movimentos(cliente, filtros):
+    """(id, data, valor com sinal, status, contraparte, conta da contraparte) de cada transferência."""
+    for pk, data, valor, status, remetente_id, remetente, conta_rem, destinatario, conta_dest in (
+        transferencias_para_exportar(cliente, filtros)
+    ):
+        if remetente_id == cliente.id:
+            yield pk, data, -valor, status, destinatario, conta_dest
+        else:
+            yield pk, data, valor, status, remetente, conta_rem
+
+
+class _Eco:
+    """Pseudo-arquivo para o csv.writer: devolve a linha em vez de guardá-la."""
+
+    def write(self, valor):
+        return valor
+
+
+def exportar_csv(cliente, filtros):
+    """Gera o extrato em CSV, uma linha por vez."""
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(CABECALHO_CSV)
+    for pk, data, valor, status, contraparte, conta in _movimentos(cliente, filtros):
+        yield escritor.writerow((
+            timezone.localtime(data).isoformat(timespec="seconds"), pk,
+            "debito" if valor < 0 else "credito", contraparte, conta, valor, status,
+        ))
+
+
+def _data_ofx(data):
+    return timezone.localtime(data).strftime("%Y%m%d%H%M%S")
+
+
+def _texto_ofx(texto):
+    # Em SGML, '<' e '&' abririam uma nova tag ou entidade
+    return (texto or "").replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def exportar_ofx(cliente, filtros):
+    """
+    Gera o extrato em OFX 1.02 (SGML), o formato aceito pelos programas de
+    finanças e importado pelos bancos brasileiros. O saldo final (LEDGERBAL)
+    vem do razão no fim do período.
+    """
+    agora = timezone.now()
+    fim = min(filtros["fim"], agora) if filtros["fim"] else agora
+    inicio = filtros["inicio"] or cliente.data_de_cadastro
+    saldo = LancamentoContabil.saldo_em(cliente, fim)
+
+    yield (
+        "OFXHEADER:100\r\nDATA:OFXSGML\r\nVERSION:102\r\nSECURITY:NONE\r\n"
+        "ENCODING:UTF-8\r\nCHARSET:NONE\r\nCOMPRESSION:NONE\r\nOLDFILEUID:NONE\r\nNEWFILEUID:NONE\r\n\r\n"
+        "<OFX>\n"
+        "<SIGNONMSGSRSV1><SONRS><STATUS><CODE>0<SEVERITY>INFO</STATUS>"
+        f"<DTSERVER>{_data_ofx(agora)}<LANGUAGE>POR</SONRS></SIGNONMSGSRSV1>\n"
+        "<BANKMSGSRSV1><STMTTRNRS><TRNUID>1<STATUS><CODE>0<SEVERITY>INFO</STATUS>\n"
+        "<STMTRS><CURDEF>BRL\n"
+        f"<BANKACCTFROM><BANKID>ODINBANK<ACCTID>{cliente.numero_da_conta}<ACCTTYPE>CHECKING</BANKACCTFROM>\n"
+        f"<BANKTRANLIST><DTSTART>{_data_ofx(inicio)}<DTEND>{_data_ofx(fim)}\n"
+    )
+    for pk, data, valor, status, contraparte, conta in _movimentos(cliente, filtros):
+        if status != "concluida":
+            continue
+        direcao = "para" if valor < 0 else "de"
+        yield (
+            f"<STMTTRN><TRNTYPE>{'DEBIT' if valor < 0 else 'CREDIT'}<DTPOSTED>{_data_ofx(data)}"
+            f"<TRNAMT>{valor}<FITID>{pk}<NAME>{_texto_ofx(contraparte)[:32]}"
+            f"<MEMO>Transferência {direcao} {_texto_ofx(contraparte)} ({conta})</STMTTRN>\n"
+        )
+    yield (
+        "</BANKTRANLIST>\n"
+        f"<LEDGERBAL><BALAMT>{Decimal(saldo)}<DTASOF>{_data_ofx(fim)}</LEDGERBAL>\n"
+        "</STMTRS></STMTTRNRS></BANKMSGSRSV1>\n</OFX>\n"
+    )
+
+
+async def em_blocos_assincronos(linhas):
+    """
+    Entrega um gerador de exportação como iterador assíncrono, para o ASGI.
+
+    Com um gerador síncrono o StreamingHttpResponse do ASGI faria list() de
+    tudo antes de enviar. Aqui cada bloco de TAMANHO_DO_BLOCO linhas é lido
+    com sync_to_async, na thread da requisição (a mesma do cursor aberto
+    pelo iterator()), e enviado antes do próximo.
+    """
+    proximo_bloco = sync_to_async(lambda: "".join(islice(linhas, TAMANHO_DO_BLOCO)))
+    try:
+        while bloco := await proximo_bloco():
+            yield bloco
+    finally:
+        # Cliente desconectado no meio: o cursor é fechado na mesma thread
+        await sync_to_async(linhas.close)()
+
+
+FORMATOS = {
+    "csv": (exportar_csv, "text/csv; charset=utf-8"),
+    "ofx": (exportar_ofx, "application/x-ofx; charset=utf-8"),
+}
@@ -0,0 +1,98 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import LancamentoContabil
+
+ITENS_POR_PAGINA = 50
+
+
+def _data_local(valor, fim=False):
+    """Converte 'AAAA-MM-DD' no início do dia (ou do dia seguinte, se fim=True)."""
+    data = parse_date(valor or '')
+    if data is None:
+        return None
+    if fim:
+        data += timedelta(days=1)
+    return timezone.make_aware(datetime.combine(data, time.min))
+
+
+def _decimal(valor):
+    try:
+        numero = Decimal(valor)
+    except (InvalidOperation, TypeError):
+        return None
+    return numero if numero.is_finite() else None
+
+
+def ler_filtros(params):
+    """Lê os filtros de período e valor aceitos pelo extrato."""
+    return {
+        "inicio": _data_local(params.get("inicio")),
+        "fim": _data_local(params.get("fim"), fim=True),
+        "valor_min": _decimal(params.get("valor_min")),
+        "valor_max": _decimal(params.get("valor_max")),
+    }
+
+
+def aplicar_filtros(queryset, filtros, campo_data="created_at", campo_valor="valor"):
+    if filtros["inicio"]:
+        queryset = queryset.filter(**{f"{campo_data}__gte": filtros["inicio"]})
+    if filtros["fim"]:
+        queryset = queryset.filter(**{f"{campo_data}__lt": filtros["fim"]})
+    if filtros["valor_min"] is not None:
+        queryset = queryset.filter(**{f"{campo_valor}__gte": filtros["valor_min"]})
+    if filtros["valor_max"] is not None:
+        queryset = queryset.filter(**{f"{campo_valor}__lte": filtros["valor_max"]})
+    return queryset
+
+
+def codificar_cursor(data, pk):
+    return f"{data.isoformat()}_{pk}"
+
+
+def decodificar_cursor(cursor):
+    """Devolve (data, id) do cursor ou None se ele for inválido."""
+    data, _, pk = (cursor or '').rpartition('_')
+    data = parse_datetime(data)
+    if data is None or not pk.isdigit():
+        return None
+    return data, int(pk)
+
+
+def lancamentos_do_cliente(cliente, filtros):
+    """Lançamentos da conta de saldo do cliente, mais recentes primeiro."""
+    queryset = (
+        LancamentoContabil.objects
+        .filter(cliente=cliente, conta="saldo")
+        .only("id", "tipo", "valor", "saldo_apos", "descricao", "created_at")
+        .order_by("-created_at", "-id")
+    )
+    return aplicar_filtros(queryset, filtros)
+
+
+def pagina_extrato(cliente, params, por_pagina=ITENS_POR_PAGINA):
+    """
+    Uma página do extrato, lida do razão com paginação por cursor em (created_at, id).
+
+    Retorna (lancamentos, proximo_cursor); proximo_cursor é None na última página.
+    """
+    queryset = lancamentos_do_cliente(cliente, ler_filtros(params))
+
+    posicao = decodificar_cursor(params.get("cursor"))
+    if posicao:
+        data, pk = posicao
+        queryset = queryset.filter(Q(created_at__lt=data) | Q(created_at=data, id__lt=pk))
+
+    # Busca um item a mais só para saber se existe próxima página
+    lancamentos = list(queryset[:por_pagina + 1])
+    proximo_cursor = None
+    if len(lancamentos) > por_pagina:
+        lancamentos = lancamentos[:por_pagina]
+        ultimo = lancamentos[-1]
+        proximo_cursor = codificar_cursor(ultimo.created_at, ultimo.pk)
+
+    return lancamentos, proximo_cursor
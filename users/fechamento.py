@@ -0,0 +1,190 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Cliente, LancamentoContabil, SaldoMensal
+
+ZERO = Decimal('0.00')
+
+
+def inicio_do_mes(data):
+    return date(data.year, data.month, 1)
+
+
+def proximo_mes(mes):
+    return date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+
+
+def mes_anterior(mes):
+    return date(mes.year - (mes.month == 1), (mes.month - 2) % 12 + 1, 1)
+
+
+def limites_do_mes(mes):
+    """Início do mês e início do mês seguinte, no fuso do projeto."""
+    return (
+        timezone.make_aware(datetime.combine(mes, time.min)),
+        timezone.make_aware(datetime.combine(proximo_mes(mes), time.min)),
+    )
+
+
+def meses_a_fechar(ate=None):
+    """
+    Meses ainda sem fechamento, do seguinte ao último fechado (ou do primeiro
+    lançamento) até `ate`, por padrão o último mês completo.
+    """
+    ultimo_completo = mes_anterior(inicio_do_mes(timezone.localdate()))
+    ate = min(inicio_do_mes(ate), ultimo_completo) if ate else ultimo_completo
+
+    ultimo_fechado = SaldoMensal.objects.aggregate(mes=Max('mes'))['mes']
+    if ultimo_fechado:
+        mes = proximo_mes(ultimo_fechado)
+    else:
+        primeiro = LancamentoContabil.objects.aggregate(data=Min('created_at'))['data']
+        if primeiro is None:
+            return []
+        mes = inicio_do_mes(timezone.localtime(primeiro))
+
+    meses = []
+    while mes <= ate:
+        meses.append(mes)
+        mes = proximo_mes(mes)
+    return meses
+
+
+def _saldos_de_abertura(ids, mes, inicio):
+    """
+    Saldo de cada cliente no início do mês: o fechamento do mês anterior e,
+    para quem não tem, o último lançamento antes do mês (uma subconsulta por lote).
+    """
+    saldos = dict(
+        SaldoMensal.objects.filter(cliente_id__in=ids, mes=mes_anterior(mes))
+        .values_list('cliente_id', 'saldo_final')
+    )
+    faltando = [pk for pk in ids if pk not in saldos]
+    if faltando:
+        ultimo = (
+            LancamentoContabil.objects
+            .filter(cliente=OuterRef('pk'), conta='saldo', created_at__lt=inicio)
+            .order_by('-created_at', '-id')
+            .values('saldo_apos')[:1]
+        )
+        clientes = Cliente.objects.filter(pk__in=faltando).annotate(abertura=Subquery(ultimo))
+        for pk, saldo in clientes.values_list('pk', 'abertura'):
+            saldos[pk] = saldo if saldo is not None else ZERO
+    return saldos
+
+
+def _movimentos_do_mes(filtro, inicio, fim):
+    """Totais de entradas, saídas e quantidade de lançamentos do período, por cliente."""
+    return {
+        linha['cliente_id']: linha
+        for linha in LancamentoContabil.objects
+        .filter(filtro, conta='saldo', created_at__gte=inicio, created_at__lt=fim)
+        .values('cliente_id')
+        .annotate(
+            entradas=Sum('valor', filter=Q(tipo='credito')),
+            saidas=Sum('valor', filter=Q(tipo='debito')),
+            quantidade=Count('id'),
+        )
+        .order_by()
+    }
+
+
+def fechar_mes(mes, lote=1000):
+    """
+    Grava o SaldoMensal de `mes` para os clientes cadastrados até o fim dele,
+    em lotes de `lote` clientes: algumas consultas agregadas e um bulk_create
+    por lote, cada um em sua transação. Clientes já fechados no mês são pulados,
+    então o comando pode ser interrompido e executado de novo.
+    Retorna a quantidade de fechamentos gravados.
+    """
+    mes = inicio_do_mes(mes)
+    inicio, fim = limites_do_mes(mes)
+    pendentes = (
+        Cliente.objects.filter(data_de_cadastro__lt=fim)
+        .exclude(saldos_mensais__mes=mes)
+        .order_by('pk')
+        .values_list('pk', flat=True)
+    )
+
+    total = 0
+    ultimo = 0
+    while True:
+        ids = list(pendentes.filter(pk__gt=ultimo)[:lote])
+        if not ids:
+            break
+        ultimo = ids[-1]
+        with transaction.atomic():
+            abertura = _saldos_de_abertura(ids, mes, inicio)
+            movimentos = _movimentos_do_mes(Q(cliente_id__in=ids), inicio, fim)
+            fechamentos = []
+            for pk in ids:
+                m = movimentos.get(pk, {})
+                entradas = m.get('entradas') or ZERO
+                saidas = m.get('saidas') or ZERO
+                fechamentos.append(SaldoMensal(
+                    cliente_id=pk, mes=mes, saldo_inicial=abertura[pk],
+                    saldo_final=abertura[pk] + entradas - saidas,
+                    total_entradas=entradas, total_saidas=saidas,
+                    quantidade_lancamentos=m.get('quantidade', 0),
+                ))
+            SaldoMensal.objects.bulk_create(fechamentos, batch_size=lote)
+        total += len(fechamentos)
+    return total
+
+
+def resumo_mensal(cliente, meses=12):
+    """
+    Resumo dos últimos `meses` meses do cliente, do mais recente para o mais
+    antigo. Os meses fechados vêm do SaldoMensal; o mês corrente (e os que
+    ainda não foram fechados) é o último fechamento mais os lançamentos
+    posteriores a ele.
+    """
+    fechados = list(
+        SaldoMensal.objects.filter(cliente=cliente)
+        .order_by('-mes')
+        .values('mes', 'saldo_inicial', 'saldo_final', 'total_entradas', 'total_saidas')[:meses]
+    )
+
+    mes_atual = inicio_do_mes(timezone.localdate())
+    if fechados:
+        desde = proximo_mes(fechados[0]['mes'])
+        saldo = fechados[0]['saldo_final']
+    else:
+        # Sem nenhum fechamento: os meses desde o cadastro, limitados a `meses`
+        desde = mes_atual
+        for _ in range(meses - 1):
+            desde = mes_anterior(desde)
+        desde = max(desde, inicio_do_mes(timezone.localtime(cliente.data_de_cadastro)))
+        inicio, _ = limites_do_mes(desde)
+        saldo = LancamentoContabil.saldo_em(cliente, inicio - timedelta(microseconds=1))
+
+    abertos = []
+    mes = desde
+    if mes <= mes_atual:
+        inicio, _ = limites_do_mes(mes)
+        _, fim = limites_do_mes(mes_atual)
+        # Uma consulta agregada por mês para todos os meses em aberto
+        totais = {
+            linha['mes'].date(): (linha['entradas'] or ZERO, linha['saidas'] or ZERO)
+            for linha in LancamentoContabil.objects
+            .filter(cliente=cliente, conta='saldo', created_at__gte=inicio, created_at__lt=fim)
+            .annotate(mes=TruncMonth('created_at'))
+            .values('mes')
+            .annotate(entradas=Sum('valor', filter=Q(tipo='credito')), saidas=Sum('valor', filter=Q(tipo='debito')))
+            .order_by()
+        }
+        while mes <= mes_atual:
+            entradas, saidas = totais.get(mes, (ZERO, ZERO))
+            abertos.append({
+                'mes': mes, 'saldo_inicial': saldo, 'saldo_final': saldo + entradas - saidas,
+                'total_entradas': entradas, 'total_saidas': saidas,
+            })
+            saldo += entradas - saidas
+            mes = proximo_mes(mes)
+
+    return (list(reversed(abertos)) + fechados)[:meses]
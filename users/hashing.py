@@ -0,0 +1,60 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+
+class FilaDeHashCheia(Exception):
+    """Todas as vagas do pool de hash estão ocupadas."""
+
+
+class ExecutorDeHash:
+    """
+    Pool de threads limitado para o PBKDF2 de login e cadastro.
+
+    Aceita no máximo `trabalhadores + limite_fila` tarefas ao mesmo tempo;
+    acima disso recusa na hora com FilaDeHashCheia em vez de enfileirar sem fim.
+    """
+
+    def __init__(self, trabalhadores, limite_fila):
+        self._executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix="odinbank-hash")
+        self._vagas = threading.BoundedSemaphore(trabalhadores + limite_fila)
+
+    async def executar(self, funcao, *args):
+        if not self._vagas.acquire(blocking=False):
+            raise FilaDeHashCheia()
+        try:
+            futuro = self._executor.submit(funcao, *args)
+        except BaseException:
+            self._vagas.release()
+            raise
+        # A vaga só é liberada quando a thread termina, mesmo se a requisição for cancelada
+        futuro.add_done_callback(lambda _: self._vagas.release())
+        return await asyncio.wrap_future(futuro)
+
+
+_executor = None
+_trava = threading.Lock()
+
+
+def executor_de_hash():
+    global _executor
+    if _executor is None:
+        with _trava:
+            if _executor is None:
+                _executor = ExecutorDeHash(
+                    getattr(settings, "HASH_POOL_TRABALHADORES", None) or min(4, os.cpu_count() or 1),
+                    getattr(settings, "HASH_POOL_FILA", 32),
+                )
+    return _executor
+
+
+async def verificar_senha(senha, hash_senha):
+    return await executor_de_hash().executar(check_password, senha, hash_senha)
+
+
+async def gerar_hash(senha):
+    return await executor_de_hash().executar(make_password, senha)
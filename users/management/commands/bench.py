@@ -0,0 +1,69 @@
+import json
+from pathlib import Path
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+from users.benchmark import CENARIOS, banco_temporario, comparar, medir_cenarios, popular_banco
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark reprodutível das principais páginas em um banco temporário: popula os dados, "
+        "mede vazão, latência (p50/p95/p99) e consultas por requisição e imprime em JSON. "
+        "Com --comparar, aponta regressões em relação a um resultado salvo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--gerentes', type=int, default=5)
+        parser.add_argument('--clientes', type=int, default=500)
+        parser.add_argument('--transferencias', type=int, default=5000, help="Histórico criado antes da medição")
+        parser.add_argument('--solicitacoes-cartao', type=int, default=200)
+        parser.add_argument('--requisicoes', type=int, default=200, help="Requisições medidas por cenário")
+        parser.add_argument('--aquecimento', type=int, default=10, help="Requisições descartadas por cenário")
+        parser.add_argument('--usuarios', type=int, default=20, help="Usuários logados que se alternam nas requisições")
+        parser.add_argument('--cenario', action='append', choices=sorted(CENARIOS), help="Executa só este cenário (repetível)")
+        parser.add_argument('--semente', type=int, default=42, help="Semente dos dados e da ordem das requisições")
+        parser.add_argument('--saida', help="Grava o resultado neste arquivo (para usar como base depois)")
+        parser.add_argument('--comparar', help="Resultado salvo para comparação")
+        parser.add_argument('--tolerancia', type=float, default=0.2, help="Aumento aceito no p95 (fração)")
+
+    def handle(self, *args, **options):
+        base = None
+        if options['comparar']:
+            caminho = Path(options['comparar'])
+            if not caminho.exists():
+                raise CommandError(f"Arquivo {caminho} não encontrado.")
+            base = json.loads(caminho.read_text())
+
+        # O cache do processo pode ter páginas de outras execuções
+        for alias in caches:
+            caches[alias].clear()
+
+        with banco_temporario():
+            dados = popular_banco(
+                gerentes=options['gerentes'],
+                clientes=options['clientes'],
+                transferencias=options['transferencias'],
+                solicitacoes_cartao=options['solicitacoes_cartao'],
+                semente=options['semente'],
+            )
+            resultado = medir_cenarios(
+                dados,
+                requisicoes=options['requisicoes'],
+                aquecimento=options['aquecimento'],
+                usuarios=options['usuarios'],
+                cenarios=options['cenario'],
+                semente=options['semente'],
+            )
+
+        saida = json.dumps(resultado, indent=2)
+        if options['saida']:
+            Path(options['saida']).write_text(saida + "\n")
+        self.stdout.write(saida)
+
+        if base is not None:
+            regressoes = comparar(resultado, base, options['tolerancia'])
+            if regressoes:
+                raise CommandError("Regressões encontradas:\n" + "\n".join(regressoes))
+            self.stdout.write(self.style.SUCCESS("Nenhuma regressão em relação à base."))
@@ -0,0 +1,87 @@
+import json
+import random
+from datetime import date
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from users.benchmark import banco_temporario, cronometrar
+from users.estatisticas import resumir
+from users.models import Cliente, Credencial, Gerente
+
+
+def busca_antiga(email):
+    """Caminho anterior do login: tenta gerente e, se não achar, cliente."""
+    try:
+        return Gerente.objects.get(email=email)
+    except Gerente.DoesNotExist:
+        try:
+            return Cliente.objects.get(email=email)
+        except Cliente.DoesNotExist:
+            return None
+
+
+def busca_credencial(email):
+    return (
+        Credencial.objects.only("password", "admUser", "gerente_id", "cliente_id")
+        .filter(email=email)
+        .first()
+    )
+
+
+class Command(BaseCommand):
+    help = "Compara a latência do login antes (duas buscas) e depois da tabela de credenciais."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=500, help="Clientes criados (e 1/10 disso de gerentes)")
+        parser.add_argument('--logins', type=int, default=2000, help="Buscas medidas por caminho")
+        parser.add_argument('--completos', type=int, default=50, help="Logins completos pela view (com hash)")
+
+    def handle(self, *args, **options):
+        with banco_temporario():
+            resultado = self._executar(options)
+        self.stdout.write(json.dumps(resultado, indent=2))
+
+    def _criar_usuarios(self, quantidade):
+        senha = make_password("bench")
+        for i in range(max(1, quantidade // 10)):
+            Gerente(
+                nome=f"Gerente {i}", cpf=f"{i:03d}.111.111-11", email=f"gerente{i}@odinbank.test",
+                telefone="(11)90000-0000", matricula=f"B{i}", data_admissao=date(2020, 1, 1),
+                data_de_nascimento=date(1980, 1, 1), salario=1, password=senha,
+            ).save()
+        for i in range(quantidade):
+            Cliente(
+                cpf=f"{i:03d}.222.222-22", username=f"cliente{i}", email=f"cliente{i}@odinbank.test",
+                password=senha, data_de_nascimento=date(1990, 1, 1), telefone="(11)90000-0000",
+                tipo_de_conta="corrente",
+            ).save()
+        return [f"cliente{i}@odinbank.test" for i in range(quantidade)]
+
+    def _medir_busca(self, busca, emails, repeticoes):
+        amostras = []
+        for _ in range(repeticoes):
+            _, segundos = cronometrar(busca, random.choice(emails))
+            amostras.append(segundos)
+        return resumir(amostras)
+
+    def _executar(self, options):
+        emails = self._criar_usuarios(options['usuarios'])
+
+        # Logins de clientes são o pior caso do caminho antigo (erram o gerente primeiro)
+        resultado = {
+            "busca_antiga": self._medir_busca(busca_antiga, emails, options['logins']),
+            "busca_credencial": self._medir_busca(busca_credencial, emails, options['logins']),
+        }
+
+        client = Client()
+        amostras = []
+        for _ in range(options['completos']):
+            _, segundos = cronometrar(
+                client.post, reverse("users:login"), {"email": random.choice(emails), "password": "bench"}
+            )
+            amostras.append(segundos)
+        resultado["login_completo"] = resumir(amostras)
+        return resultado
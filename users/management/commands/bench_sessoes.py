@@ -0,0 +1,66 @@
+import json
+from datetime import date
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from users.benchmark import banco_temporario, cronometrar
+from users.estatisticas import resumir
+from users.models import Cliente
+
+
+class Command(BaseCommand):
+    help = "Compara o custo por requisição de cada modo de sessão (db, cached_db e cookie assinado)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requisicoes', type=int, default=500, help="Páginas autenticadas medidas por modo")
+        parser.add_argument('--logins', type=int, default=5, help="Logins medidos por modo (inclui o hash da senha)")
+
+    def handle(self, *args, **options):
+        with banco_temporario():
+            Cliente.objects.create(
+                cpf="000.000.000-00", username="bench", email="bench@odinbank.test",
+                password=make_password("bench"), data_de_nascimento=date(1990, 1, 1),
+                telefone="(11)90000-0000", tipo_de_conta="corrente",
+            )
+            resultado = {
+                modo: self._medir(engine, options)
+                for modo, engine in settings.SESSAO_MODOS.items()
+            }
+        self.stdout.write(json.dumps(resultado, indent=2))
+
+    def _medir(self, engine, options):
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        with override_settings(SESSION_ENGINE=engine):
+            client = Client()
+            logins = []
+            for _ in range(options['logins']):
+                _, segundos = cronometrar(
+                    client.post, reverse("users:login"), {"email": "bench@odinbank.test", "password": "bench"}
+                )
+                logins.append(segundos)
+
+            # Primeira visita monta o cache da página; as medidas pegam só o custo da sessão
+            url = reverse("users:perfil")
+            client.get(url)
+            amostras = []
+            consultas_sessao = 0
+            for _ in range(options['requisicoes']):
+                with CaptureQueriesContext(connection) as ctx:
+                    resposta, segundos = cronometrar(client.get, url)
+                if resposta.status_code != 200:
+                    raise RuntimeError(f"Página autenticada respondeu {resposta.status_code} com {engine}")
+                amostras.append(segundos)
+                consultas_sessao += sum(1 for q in ctx.captured_queries if "django_session" in q["sql"])
+
+        return {
+            "login": resumir(logins),
+            "pagina_autenticada": resumir(amostras),
+            "consultas_de_sessao_por_requisicao": round(consultas_sessao / options['requisicoes'], 2),
+        }
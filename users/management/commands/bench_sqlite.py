@@ -0,0 +1,131 @@
+import json
+import random
+import tempfile
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.test.utils import override_settings
+
+from users.benchmark import banco_temporario
+from users.estatisticas import resumir
+from users.extrato import pagina_extrato
+from users.models import Cliente, Transferencia
+from users.numeracao import alocador_de_contas
+from users.transferencias import processar_lote
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede leituras de extrato concorrentes com transferências em um banco SQLite em disco, "
+        "com a configuração padrão e com o perfil de produção (WAL, mmap, busy_timeout)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--segundos', type=float, default=5, help="Duração da carga por perfil")
+        parser.add_argument('--leitores', type=int, default=4, help="Threads lendo extratos")
+        parser.add_argument('--escritores', type=int, default=2, help="Threads fazendo transferências")
+        parser.add_argument('--clientes', type=int, default=200, help="Contas criadas no banco")
+
+    def handle(self, *args, **options):
+        resultado = {}
+        for perfil, producao in (("padrao", False), ("producao", True)):
+            with tempfile.TemporaryDirectory() as pasta:
+                resultado[perfil] = self._medir_perfil(Path(pasta) / "bench.sqlite3", producao, options)
+        self.stdout.write(json.dumps(resultado, indent=2))
+
+    def _medir_perfil(self, arquivo, producao, options):
+        opcoes_originais = connection.settings_dict.get('OPTIONS', {})
+        connection.settings_dict['OPTIONS'] = (
+            {**opcoes_originais, 'transaction_mode': 'IMMEDIATE'} if producao
+            else {k: v for k, v in opcoes_originais.items() if k != 'transaction_mode'}
+        )
+        try:
+            with override_settings(SQLITE_PRODUCAO=producao), banco_temporario(arquivo):
+                clientes = self._popular(options['clientes'])
+                with connection.cursor() as cursor:
+                    cursor.execute("PRAGMA journal_mode")
+                    journal = cursor.fetchone()[0]
+                medicao = self._carga(clientes, options)
+                medicao["journal_mode"] = journal
+                return medicao
+        finally:
+            connection.settings_dict['OPTIONS'] = opcoes_originais
+
+    def _popular(self, quantidade):
+        numeros = alocador_de_contas.reservar(quantidade)
+        Cliente.objects.bulk_create([
+            Cliente(
+                numero_da_conta=numeros[i], cpf=f"{i:03d}.{i // 1000:03d}.000-00", username=f"bench{i}",
+                email=f"bench{i}@odinbank.test", password="-", data_de_nascimento=date(1990, 1, 1),
+                telefone="(11)90000-0000", tipo_de_conta="corrente", saldo=Decimal("1000000.00"),
+            )
+            for i in range(quantidade)
+        ])
+        clientes = list(Cliente.objects.all())
+        # Histórico inicial para as leituras de extrato terem o que paginar
+        linhas = [
+            {"remetente": random.choice(clientes).cpf, "destinatario": random.choice(clientes).cpf, "valor": "1.00"}
+            for _ in range(quantidade * 20)
+        ]
+        processar_lote([l for l in linhas if l["remetente"] != l["destinatario"]])
+        return clientes
+
+    def _carga(self, clientes, options):
+        parar = threading.Event()
+        leituras, escritas = [], []
+        erros = {"leitura": 0, "escrita": 0}
+        trava = threading.Lock()
+
+        def ler():
+            try:
+                while not parar.is_set():
+                    inicio = time.perf_counter()
+                    try:
+                        pagina_extrato(random.choice(clientes), {}, 50)
+                    except OperationalError:
+                        with trava:
+                            erros["leitura"] += 1
+                        continue
+                    with trava:
+                        leituras.append(time.perf_counter() - inicio)
+            finally:
+                connection.close()
+
+        def escrever():
+            try:
+                while not parar.is_set():
+                    remetente, destinatario = random.sample(clientes, 2)
+                    inicio = time.perf_counter()
+                    try:
+                        Transferencia(remetente=remetente, destinatario=destinatario, valor=Decimal("1.00")).save()
+                    except (OperationalError, ValidationError):
+                        with trava:
+                            erros["escrita"] += 1
+                        continue
+                    with trava:
+                        escritas.append(time.perf_counter() - inicio)
+            finally:
+                connection.close()
+
+        threads = (
+            [threading.Thread(target=ler) for _ in range(options['leitores'])]
+            + [threading.Thread(target=escrever) for _ in range(options['escritores'])]
+        )
+        for t in threads:
+            t.start()
+        time.sleep(options['segundos'])
+        parar.set()
+        for t in threads:
+            t.join()
+
+        return {
+            "leituras": {**resumir(leituras), "por_segundo": round(len(leituras) / options['segundos'], 1)},
+            "escritas": {**resumir(escritas), "por_segundo": round(len(escritas) / options['segundos'], 1)},
+            "erros": erros,
+        }
@@ -0,0 +1,75 @@
+import json
+import random
+from datetime import date
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from users.benchmark import banco_temporario, cronometrar
+from users.models import Cliente, Transferencia
+from users.transferencias import processar_lote
+
+
+class Command(BaseCommand):
+    help = "Compara transferências uma a uma com o processamento em lote (em um banco temporário)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, default=1000, help="Transferências por rodada")
+        parser.add_argument('--clientes', type=int, default=50, help="Contas envolvidas")
+
+    def handle(self, *args, **options):
+        with banco_temporario():
+            resultado = self._executar(options['linhas'], options['clientes'])
+        self.stdout.write(json.dumps(resultado, indent=2))
+
+    def _criar_clientes(self, quantidade):
+        Cliente.objects.bulk_create([
+            Cliente(
+                cpf=f"{i:03d}.000.000-{i % 100:02d}",
+                username=f"bench{i}",
+                email=f"bench{i}@odinbank.test",
+                password="!",
+                data_de_nascimento=date(1990, 1, 1),
+                telefone="(11)90000-0000",
+                tipo_de_conta="corrente",
+                saldo=Decimal("1000000.00"),
+            )
+            for i in range(quantidade)
+        ])
+        return list(Cliente.objects.values_list('cpf', flat=True))
+
+    def _gerar_linhas(self, cpfs, quantidade):
+        linhas = []
+        for _ in range(quantidade):
+            remetente, destinatario = random.sample(cpfs, 2)
+            linhas.append({
+                "remetente": remetente,
+                "destinatario": destinatario,
+                "valor": f"{random.randint(1, 10000) / 100:.2f}",
+            })
+        return linhas
+
+    def _uma_a_uma(self, linhas):
+        # Reproduz o caminho da view: busca por CPF e save() por linha
+        for linha in linhas:
+            Transferencia(
+                remetente=Cliente.objects.get(cpf=linha["remetente"]),
+                destinatario=Cliente.objects.get(cpf=linha["destinatario"]),
+                valor=Decimal(linha["valor"]),
+            ).save()
+
+    def _executar(self, quantidade, clientes):
+        cpfs = self._criar_clientes(clientes)
+        linhas = self._gerar_linhas(cpfs, quantidade)
+
+        _, tempo_individual = cronometrar(self._uma_a_uma, linhas)
+        _, tempo_lote = cronometrar(processar_lote, linhas)
+
+        return {
+            "linhas": quantidade,
+            "uma_a_uma_s": round(tempo_individual, 4),
+            "lote_s": round(tempo_lote, 4),
+            "linhas_por_segundo_uma_a_uma": round(quantidade / tempo_individual, 1),
+            "linhas_por_segundo_lote": round(quantidade / tempo_lote, 1),
+            "ganho": round(tempo_individual / tempo_lote, 2),
+        }
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from users.fechamento import fechar_mes, inicio_do_mes, meses_a_fechar
+
+
+def _mes(valor):
+    try:
+        return datetime.strptime(valor, "%Y-%m").date()
+    except ValueError:
+        raise CommandError(f"Mês inválido: {valor} (use AAAA-MM).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Fecha os meses completos ainda não fechados, gravando o SaldoMensal de cada cliente "
+        "(saldo de abertura, de fechamento e totais do mês) em lotes de clientes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ate', help="Último mês a fechar (AAAA-MM); padrão: o mês passado")
+        parser.add_argument('--mes', help="Fecha só este mês (AAAA-MM), completando clientes que faltaram")
+        parser.add_argument('--lote', type=int, default=1000, help="Clientes por transação")
+
+    def handle(self, *args, **options):
+        if options['mes']:
+            meses = [_mes(options['mes'])]
+            if meses[0] >= inicio_do_mes(timezone.localdate()):
+                raise CommandError("Só meses completos podem ser fechados.")
+        else:
+            meses = meses_a_fechar(_mes(options['ate']) if options['ate'] else None)
+        if not meses:
+            self.stdout.write("Nenhum mês a fechar.")
+            return
+
+        for mes in meses:
+            total = fechar_mes(mes, lote=options['lote'])
+            self.stdout.write(f"{mes:%m/%Y}: {total} fechamento(s) gravado(s).")
+        self.stdout.write(self.style.SUCCESS(f"{len(meses)} mês(es) processado(s)."))
@@ -0,0 +1,43 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.transferencias import ler_lote_csv, ler_lote_json, processar_lote
+
+
+class Command(BaseCommand):
+    help = "Importa um lote de transferências (CSV ou JSON) em uma única transação."
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help="Arquivo .csv (remetente,destinatario,valor) ou .json")
+        parser.add_argument('--json', action='store_true', help="Imprime o relatório completo em JSON")
+
+    def handle(self, *args, **options):
+        caminho = Path(options['arquivo'])
+        if not caminho.exists():
+            raise CommandError(f"Arquivo {caminho} não encontrado.")
+
+        conteudo = caminho.read_bytes()
+        try:
+            if caminho.suffix.lower() == '.json':
+                linhas = ler_lote_json(conteudo)
+            else:
+                linhas = ler_lote_csv(conteudo)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise CommandError(f"Lote inválido: {e}")
+
+        resultados = processar_lote(linhas)
+
+        if options['json']:
+            self.stdout.write(json.dumps(resultados, ensure_ascii=False, indent=2))
+            return
+
+        for r in resultados:
+            if r["status"] != "ok":
+                self.stdout.write(self.style.ERROR(f"Linha {r['linha']}: {r['mensagem']}"))
+
+        sucesso = sum(1 for r in resultados if r["status"] == "ok")
+        self.stdout.write(self.style.SUCCESS(
+            f"{sucesso} transferência(s) aplicada(s), {len(resultados) - sucesso} falha(s)."
+        ))
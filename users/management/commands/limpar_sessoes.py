@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Apaga sessões expiradas da tabela django_session em lotes pequenos, "
+        "para não segurar a trava de escrita do banco como um único DELETE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help="Linhas apagadas por transação")
+        parser.add_argument('--pausa', type=float, default=0.05, help="Segundos entre lotes (libera o banco para outras escritas)")
+
+    def handle(self, *args, **options):
+        if settings.SESSAO_MODO == 'cookie':
+            self.stdout.write("Sessões em cookie assinado: não há linhas no banco para limpar.")
+            return
+
+        agora = timezone.now()
+        total = 0
+        while True:
+            ids = list(
+                Session.objects.filter(expire_date__lt=agora)
+                .values_list('session_key', flat=True)[:options['lote']]
+            )
+            if not ids:
+                break
+            apagadas, _ = Session.objects.filter(session_key__in=ids).delete()
+            total += apagadas
+            time.sleep(options['pausa'])
+
+        self.stdout.write(self.style.SUCCESS(f"{total} sessão(ões) expirada(s) apagada(s)."))
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.cartoes import reabastecer_pool
+
+
+class Command(BaseCommand):
+    help = "Completa o pool de números de cartão pré-gerados (BIN + Luhn)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--minimo', type=int, default=None,
+            help=f"Números livres desejados no pool (padrão: CARTAO_POOL_TAMANHO={settings.CARTAO_POOL_TAMANHO})",
+        )
+        parser.add_argument('--lote', type=int, default=1000, help="Números gerados por bulk_create")
+
+    def handle(self, *args, **options):
+        incluidos = reabastecer_pool(minimo=options['minimo'], lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f"{incluidos} número(s) incluído(s) no pool."))
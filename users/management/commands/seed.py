@@ -0,0 +1,43 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.seed import POR_ESCALA, SENHA_PADRAO, semear
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera dados sintéticos em volume para testes de carga (gerentes, clientes, transferências, "
+        "cartões e solicitações de crédito) com bulk_create em lotes e imprime linhas por segundo. "
+        f"Escala 1 = {POR_ESCALA['clientes']} clientes e {POR_ESCALA['transferencias']} transferências; "
+        f"todas as contas usam a senha '{SENHA_PADRAO}'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', type=float, default=1.0, help="Multiplica todas as quantidades")
+        parser.add_argument('--semente', type=int, default=42, help="Semente dos dados gerados")
+        parser.add_argument('--lote', type=int, default=5000, help="Linhas por bulk_create")
+        parser.add_argument(
+            '--trabalhadores', type=int, default=4,
+            help="Processos gravando transferências em paralelo (ignorado no SQLite, que tem um único escritor)",
+        )
+
+    def handle(self, *args, **options):
+        if options['escala'] <= 0 or options['lote'] <= 0 or options['trabalhadores'] <= 0:
+            raise CommandError("--escala, --lote e --trabalhadores devem ser positivos.")
+
+        def progresso(tabela, linhas):
+            if options['verbosity'] > 1:
+                self.stderr.write(f"{tabela}: {linhas} linhas")
+
+        try:
+            resultado = semear(
+                escala=options['escala'],
+                semente=options['semente'],
+                lote=options['lote'],
+                trabalhadores=options['trabalhadores'],
+                progresso=progresso,
+            )
+        except ValueError as erro:
+            raise CommandError(str(erro))
+        self.stdout.write(json.dumps(resultado, indent=2))
@@ -0,0 +1,179 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.utils.decorators import sync_and_async_middleware
+
+from .estatisticas import percentil
+
+logger = logging.getLogger("odinbank.metricas")
+
+# Limites (segundos) dos buckets do histograma de latência
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUANTIS = (50, 95, 99)
+
+
+class _MetricasDaView:
+    def __init__(self, amostras):
+        self.requisicoes = 0
+        self.latencia_total = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.consultas = 0
+        self.sql_total = 0.0
+        # Janela das latências mais recentes, para p50/p95/p99
+        self.recentes = deque(maxlen=amostras)
+
+
+class RegistroDeMetricas:
+    """Contadores por view, em memória do processo (cada worker expõe os seus)."""
+
+    def __init__(self, amostras=1000):
+        self._amostras = amostras
+        self._trava = threading.Lock()
+        self._views = {}
+
+    def registrar(self, view, segundos, consultas, sql_segundos):
+        with self._trava:
+            metricas = self._views.get(view)
+            if metricas is None:
+                metricas = self._views[view] = _MetricasDaView(self._amostras)
+            metricas.requisicoes += 1
+            metricas.latencia_total += segundos
+            for i, limite in enumerate(BUCKETS):
+                if segundos <= limite:
+                    metricas.buckets[i] += 1
+            metricas.consultas += consultas
+            metricas.sql_total += sql_segundos
+            metricas.recentes.append(segundos)
+
+    def limpar(self):
+        with self._trava:
+            self._views.clear()
+
+    def exportar(self):
+        """Texto no formato de exposição do Prometheus."""
+        with self._trava:
+            views = sorted(self._views.items())
+            linhas = [
+                "# HELP odinbank_requisicoes_total Requisições atendidas por view.",
+                "# TYPE odinbank_requisicoes_total counter",
+            ]
+            linhas += [f'odinbank_requisicoes_total{{view="{v}"}} {m.requisicoes}' for v, m in views]
+
+            linhas += [
+                "# HELP odinbank_latencia_segundos Latência das requisições por view.",
+                "# TYPE odinbank_latencia_segundos histogram",
+            ]
+            for v, m in views:
+                for limite, quantidade in zip(BUCKETS, m.buckets):
+                    linhas.append(f'odinbank_latencia_segundos_bucket{{view="{v}",le="{limite}"}} {quantidade}')
+                linhas.append(f'odinbank_latencia_segundos_bucket{{view="{v}",le="+Inf"}} {m.requisicoes}')
+                linhas.append(f'odinbank_latencia_segundos_sum{{view="{v}"}} {m.latencia_total:.6f}')
+                linhas.append(f'odinbank_latencia_segundos_count{{view="{v}"}} {m.requisicoes}')
+
+            linhas += [
+                "# HELP odinbank_latencia_quantil_segundos Quantis da latência nas requisições mais recentes.",
+                "# TYPE odinbank_latencia_quantil_segundos gauge",
+            ]
+            for v, m in views:
+                recentes = list(m.recentes)
+                for q in QUANTIS:
+                    linhas.append(
+                        f'odinbank_latencia_quantil_segundos{{view="{v}",quantile="{q / 100}"}} '
+                        f'{percentil(recentes, q):.6f}'
+                    )
+
+            linhas += [
+                "# HELP odinbank_sql_consultas_total Consultas SQL executadas por view.",
+                "# TYPE odinbank_sql_consultas_total counter",
+            ]
+            linhas += [f'odinbank_sql_consultas_total{{view="{v}"}} {m.consultas}' for v, m in views]
+            linhas += [
+                "# HELP odinbank_sql_segundos_total Tempo total gasto em SQL por view.",
+                "# TYPE odinbank_sql_segundos_total counter",
+            ]
+            linhas += [f'odinbank_sql_segundos_total{{view="{v}"}} {m.sql_total:.6f}' for v, m in views]
+        return "\n".join(linhas) + "\n"
+
+
+registro = RegistroDeMetricas()
+
+
+class _ContadorSQL:
+    """execute_wrapper que conta as consultas e soma o tempo gasto nelas."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.segundos += time.perf_counter() - inicio
+            self.consultas += 1
+
+
+def _nome_da_view(request):
+    rota = getattr(request, "resolver_match", None)
+    if rota is None or not rota.url_name:
+        return "nao_resolvida"
+    return rota.view_name
+
+
+def _instalar_contador(contador):
+    connection.execute_wrappers.append(contador)
+
+
+def _remover_contador(contador):
+    connection.execute_wrappers.remove(contador)
+
+
+def _registrar_requisicao(request, segundos, contador):
+    view = _nome_da_view(request)
+    registro.registrar(view, segundos, contador.consultas, contador.segundos)
+
+    limite_consultas = settings.METRICAS_LIMITE_CONSULTAS
+    limite_ms = settings.METRICAS_LIMITE_MS
+    if (limite_consultas and contador.consultas > limite_consultas) or (limite_ms and segundos * 1000 > limite_ms):
+        logger.warning(
+            "Requisição lenta: %s %s (view %s) levou %.1f ms com %d consultas (%.1f ms em SQL)",
+            request.method, request.path, view, segundos * 1000, contador.consultas, contador.segundos * 1000,
+        )
+
+
+@sync_and_async_middleware
+def metricas_middleware(get_response):
+    """
+    Mede cada requisição: latência, número de consultas e tempo em SQL,
+    agrupados pelo nome da URL. Requisições acima de METRICAS_LIMITE_CONSULTAS
+    ou METRICAS_LIMITE_MS são registradas no log "odinbank.metricas".
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            # A conexão é por thread: o contador vai para a thread em que o
+            # sync_to_async da requisição executa o ORM, não para o loop
+            contador = _ContadorSQL()
+            await sync_to_async(_instalar_contador)(contador)
+            inicio = time.perf_counter()
+            try:
+                resposta = await get_response(request)
+            finally:
+                segundos = time.perf_counter() - inicio
+                await sync_to_async(_remover_contador)(contador)
+            _registrar_requisicao(request, segundos, contador)
+            return resposta
+    else:
+        def middleware(request):
+            contador = _ContadorSQL()
+            inicio = time.perf_counter()
+            with connection.execute_wrapper(contador):
+                resposta = get_response(request)
+            _registrar_requisicao(request, time.perf_counter() - inicio, contador)
+            return resposta
+    return middleware
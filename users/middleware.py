@@ -0,0 +1,40 @@
+from asgiref.sync import iscoroutinefunction
+from django.utils.decorators import sync_and_async_middleware
+from django.utils.functional import SimpleLazyObject
+
+from .cache import contexto_em_cache, gerente_em_cache
+from .models import Cliente, Gerente
+
+
+def _resolver(request):
+    usuario_id = request.session.get("user_id")
+    if usuario_id is None:
+        return None
+    if request.session.get("admUser", False):
+        return gerente_em_cache(usuario_id, lambda: Gerente.objects.filter(pk=usuario_id).first())
+    # O cliente fica no cache da versão da conta: qualquer alteração o descarta
+    return contexto_em_cache(usuario_id, "principal", lambda: Cliente.objects.filter(pk=usuario_id).first())
+
+
+def principal_da_requisicao(request):
+    """Gerente ou Cliente logado (ou None), resolvido uma única vez por requisição."""
+    if not hasattr(request, "_principal"):
+        request._principal = _resolver(request)
+    return request._principal
+
+
+@sync_and_async_middleware
+def principal_middleware(get_response):
+    """
+    Anexa `request.principal` com o usuário logado. A resolução é preguiçosa:
+    páginas que não usam o usuário (login, cadastro) não leem sessão nem banco.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            request.principal = SimpleLazyObject(lambda: principal_da_requisicao(request))
+            return await get_response(request)
+    else:
+        def middleware(request):
+            request.principal = SimpleLazyObject(lambda: principal_da_requisicao(request))
+            return get_response(request)
+    return middleware
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_cartaocliente_cvv_cartaocliente_numero_cartao_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cartaocliente',
+            name='senha',
+            field=models.CharField(blank=True, max_length=6, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='cliente',
+            constraint=models.CheckConstraint(condition=models.Q(('saldo__gte', 0)), name='cliente_saldo_nao_negativo'),
+        ),
+    ]
@@ -0,0 +1,118 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:53
+
+from decimal import Decimal
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def reconstruir_razao(apps, schema_editor):
+    """
+    Monta o razão a partir do histórico existente: transferências concluídas e
+    solicitações de crédito aprovadas são reaplicadas em ordem de data. O saldo
+    de abertura de cada conta é o saldo atual menos as movimentações líquidas,
+    então o último saldo_apos de cada conta bate com o saldo atual.
+    """
+    Cliente = apps.get_model('users', 'Cliente')
+    Transferencia = apps.get_model('users', 'Transferencia')
+    SolicitacaoCredito = apps.get_model('users', 'SolicitacaoCredito')
+    LancamentoContabil = apps.get_model('users', 'LancamentoContabil')
+
+    clientes = {
+        c['id']: c for c in Cliente.objects.values('id', 'username', 'saldo', 'creditos', 'data_de_cadastro')
+    }
+
+    # (data, ordem, id, conta, cliente, tipo, valor, origem, descrição, fk)
+    eventos = []
+    for t in Transferencia.objects.filter(status='concluida').values(
+        'id', 'remetente_id', 'destinatario_id', 'valor', 'data_transferencia'
+    ).iterator():
+        remetente = clientes[t['remetente_id']]
+        destinatario = clientes[t['destinatario_id']]
+        eventos.append((t['data_transferencia'], 0, t['id'], 'saldo', remetente['id'], 'debito', t['valor'],
+                        'transferencia', f"Transferência enviada para {destinatario['username']}", t['id']))
+        eventos.append((t['data_transferencia'], 1, t['id'], 'saldo', destinatario['id'], 'credito', t['valor'],
+                        'transferencia', f"Transferência recebida de {remetente['username']}", t['id']))
+    for s in SolicitacaoCredito.objects.filter(status='aprovado').values(
+        'id', 'cliente_id', 'valor', 'data_solicitacao'
+    ).iterator():
+        eventos.append((s['data_solicitacao'], 2, s['id'], 'creditos', s['cliente_id'], 'credito', s['valor'],
+                        'credito', "Solicitação de crédito aprovada", s['id']))
+    eventos.sort(key=lambda e: e[:3])
+
+    # Saldo de abertura: atual menos o efeito líquido de todo o histórico
+    correntes = {}
+    primeiro_evento = {}
+    for data, _, _, conta, cliente_id, tipo, valor, *_ in eventos:
+        chave = (cliente_id, conta)
+        correntes[chave] = correntes.get(chave, Decimal('0')) + (valor if tipo == 'credito' else -valor)
+        primeiro_evento.setdefault(cliente_id, data)
+    for (cliente_id, conta), liquido in list(correntes.items()):
+        correntes[(cliente_id, conta)] = Decimal(clientes[cliente_id][conta]) - liquido
+
+    lancamentos = []
+    for cliente_id, cliente in clientes.items():
+        abertura_em = min(cliente['data_de_cadastro'], primeiro_evento.get(cliente_id, cliente['data_de_cadastro']))
+        for conta in ('saldo', 'creditos'):
+            chave = (cliente_id, conta)
+            valor = correntes.setdefault(chave, Decimal(cliente[conta]))
+            if valor:
+                lancamentos.append(LancamentoContabil(
+                    cliente_id=cliente_id,
+                    conta=conta,
+                    origem='abertura',
+                    # Histórico inconsistente (ex.: saldo editado à mão) pode dar abertura negativa
+                    tipo='credito' if valor > 0 else 'debito',
+                    valor=abs(valor),
+                    saldo_apos=valor,
+                    descricao="Abertura de conta",
+                    created_at=abertura_em,
+                ))
+
+    for data, _, _, conta, cliente_id, tipo, valor, origem, descricao, fk in eventos:
+        chave = (cliente_id, conta)
+        correntes[chave] += valor if tipo == 'credito' else -valor
+        lancamentos.append(LancamentoContabil(
+            cliente_id=cliente_id,
+            conta=conta,
+            origem=origem,
+            tipo=tipo,
+            valor=valor,
+            saldo_apos=correntes[chave],
+            descricao=descricao,
+            created_at=data,
+            transferencia_id=fk if origem == 'transferencia' else None,
+            solicitacao_id=fk if origem == 'credito' else None,
+        ))
+    LancamentoContabil.objects.bulk_create(lancamentos, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_transferencia_atomica'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LancamentoContabil',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('conta', models.CharField(choices=[('saldo', 'Saldo'), ('creditos', 'Créditos')], default='saldo', max_length=10)),
+                ('origem', models.CharField(choices=[('abertura', 'Abertura de conta'), ('transferencia', 'Transferência'), ('credito', 'Aprovação de crédito'), ('ajuste', 'Ajuste do gerente')], max_length=15)),
+                ('tipo', models.CharField(choices=[('credito', 'Crédito'), ('debito', 'Débito')], max_length=7)),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('saldo_apos', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('descricao', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lancamentos', to='users.cliente')),
+                ('solicitacao', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lancamentos', to='users.solicitacaocredito')),
+                ('transferencia', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lancamentos', to='users.transferencia')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['cliente', 'created_at'], name='lancamento_cliente_data_idx')],
+            },
+        ),
+        migrations.RunPython(reconstruir_razao, migrations.RunPython.noop),
+    ]
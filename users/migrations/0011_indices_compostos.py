@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def preencher_gerente_dos_cartoes(apps, schema_editor):
+    """Solicitações antigas passam a apontar para o gerente atual do cliente."""
+    Cliente = apps.get_model('users', 'Cliente')
+    CartaoCliente = apps.get_model('users', 'CartaoCliente')
+    CartaoCliente.objects.filter(gerente__isnull=True).update(
+        gerente_id=Subquery(
+            Cliente.objects.filter(pk=OuterRef('cliente_id')).values('gerente_responsavel_id')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_lancamentocontabil'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cartaocliente',
+            index=models.Index(fields=['cliente', 'status'], name='cartao_cliente_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cartaocliente',
+            index=models.Index(fields=['gerente', '-data_solicitacao'], name='cartao_gerente_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['gerente_responsavel', 'status_conta', 'username'], name='cliente_gerente_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitacaocredito',
+            index=models.Index(fields=['gerente', '-data_solicitacao'], name='solicitacao_gerente_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transferencia',
+            index=models.Index(fields=['remetente', '-data_transferencia'], name='transf_remetente_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transferencia',
+            index=models.Index(fields=['destinatario', '-data_transferencia'], name='transf_destinatario_data_idx'),
+        ),
+        migrations.RunPython(preencher_gerente_dos_cartoes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def criar_credenciais(apps, schema_editor):
+    """Gera as credenciais dos usuários existentes; gerentes têm precedência no e-mail, como no login antigo."""
+    Gerente = apps.get_model('users', 'Gerente')
+    Cliente = apps.get_model('users', 'Cliente')
+    Credencial = apps.get_model('users', 'Credencial')
+
+    emails = set()
+    credenciais = []
+    for papel, modelo in (('gerente', Gerente), ('cliente', Cliente)):
+        for usuario in modelo.objects.only('id', 'email', 'password', 'admUser').iterator():
+            if usuario.email in emails:
+                continue
+            emails.add(usuario.email)
+            credenciais.append(Credencial(
+                email=usuario.email,
+                password=usuario.password,
+                admUser=usuario.admUser,
+                **{f'{papel}_id': usuario.id},
+            ))
+    Credencial.objects.bulk_create(credenciais, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_indices_compostos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Credencial',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254, unique=True)),
+                ('password', models.CharField(max_length=128)),
+                ('admUser', models.BooleanField(default=False)),
+                ('cliente', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='credencial', to='users.cliente')),
+                ('gerente', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='credencial', to='users.gerente')),
+            ],
+        ),
+        migrations.RunPython(criar_credenciais, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_credencial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=50, unique=True)),
+                ('proximo', models.BigIntegerField(default=1)),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0013_sequencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NumeroCartaoDisponivel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.CharField(max_length=16, unique=True)),
+            ],
+        ),
+    ]
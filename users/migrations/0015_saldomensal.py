@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:31
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0014_numerocartaodisponivel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('saldo_inicial', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('saldo_final', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('total_entradas', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_saidas', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('quantidade_lancamentos', models.PositiveIntegerField(default=0)),
+                ('fechado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos_mensais', to='users.cliente')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('cliente', 'mes'), name='saldo_mensal_cliente_mes_unico')],
+            },
+        ),
+    ]
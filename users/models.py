@@ -1,19 +1,100 @@
 import random
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import F
 from django.core.validators import RegexValidator
-from django.apps import apps
 from django.utils import timezone
 from decimal import Decimal
 from django.core.exceptions import ValidationError
 from django.contrib.auth.hashers import make_password
+from .cache import invalidar_contas, invalidar_gerente
+
+class RastreioAlteracoesMixin(models.Model):
+    """
+    Guarda os valores carregados do banco e, em atualizações, grava só as
+    colunas alteradas (update_fields). Evita reler a linha antes do save()
+    para saber o valor anterior de um campo: use `original_value('status')`.
+    """
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._originais = instancia._valores_atuais()
+        return instancia
+
+    def _valores_atuais(self):
+        adiados = self.get_deferred_fields()
+        return {
+            f.attname: getattr(self, f.attname)
+            for f in self._meta.concrete_fields
+            if f.attname not in adiados
+        }
+
+    def _attname(self, campo):
+        return self._meta.get_field(campo).attname
+
+    def _obter_originais(self):
+        if self._state.adding:
+            return None
+        if getattr(self, '_originais', None) is None:
+            # Instância que não veio de uma consulta (ex.: bulk_create): lê uma vez
+            self._originais = type(self)._base_manager.filter(pk=self.pk).values(
+                *self._valores_atuais()
+            ).first()
+        return self._originais
+
+    def original_value(self, campo):
+        """Valor do campo quando a instância foi carregada (ou salva pela última vez)."""
+        return (self._obter_originais() or {}).get(self._attname(campo))
+
+    @property
+    def changed_fields(self):
+        """Colunas alteradas desde a carga; em instâncias novas, todas."""
+        originais = self._obter_originais()
+        if originais is None:
+            return [f.attname for f in self._meta.concrete_fields if not f.primary_key]
+        return [
+            attname for attname, valor in self._valores_atuais().items()
+            if attname != self._meta.pk.attname
+            and (attname not in originais or originais[attname] != valor)
+        ]
+
+    def has_changed(self, *campos):
+        alterados = self.changed_fields
+        return any(self._attname(c) in alterados for c in campos)
+
+    def save(self, *args, **kwargs):
+        if (
+            not args
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+            and getattr(self, '_originais', None) is not None
+            and not self._state.adding
+        ):
+            # Sem alterações a lista fica vazia e o Django não executa nada
+            kwargs['update_fields'] = self.changed_fields
+        super().save(*args, **kwargs)
+        self._marcar_como_salvo(kwargs.get('update_fields'))
+
+    def _marcar_como_salvo(self, campos=None):
+        atuais = self._valores_atuais()
+        if campos is None or getattr(self, '_originais', None) is None:
+            self._originais = atuais
+        else:
+            attnames = {self._attname(c) for c in campos}
+            self._originais.update({k: v for k, v in atuais.items() if k in attnames})
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._marcar_como_salvo(fields)
 
 def gerar_numero_conta():
-    Cliente = apps.get_model('users', 'Cliente')
-    while True:
-        numero = str(random.randint(10000000, 99999999))
-        if not Cliente.objects.filter(numero_da_conta=numero).exists():
-            return numero
-        
+    """Próximo número de conta: sequencial reservado em blocos, com dígito verificador."""
+    from .numeracao import alocador_de_contas
+    return alocador_de_contas.proximo()
+
 cpf_validator = RegexValidator(
     regex=r'^\d{3}\.\d{3}\.\d{3}-\d{2}$',
     message="CPF deve estar no formato XXX.XXX.XXX-XX"
@@ -25,17 +106,56 @@ telefone_validator = RegexValidator(
 )
 
 def gerar_numero_cartao_unico():
-    """Gera um número de cartão único com 16 dígitos."""
-    while True:
-        numero = ''.join([str(random.randint(0, 9)) for _ in range(16)])
-        if not CartaoCliente.objects.filter(numero_cartao=numero).exists():
-            return numero
+    """Número de cartão único com 16 dígitos, retirado do pool pré-gerado."""
+    from .cartoes import reivindicar_numeros_cartao
+    return reivindicar_numeros_cartao(1)[0]
 
 def gerar_senha_cartao():
     """Gera uma senha de 4 dígitos."""
     return ''.join([str(random.randint(0, 9)) for _ in range(4)])
 
-class Gerente(models.Model):
+def sincronizar_credencial(usuario, papel, novo):
+    """Mantém a credencial de login igual ao e-mail, senha e perfil do gerente ou cliente."""
+    dados = {'email': usuario.email, 'password': usuario.password, 'admUser': usuario.admUser}
+    if novo or not Credencial.objects.filter(**{papel: usuario}).update(**dados):
+        Credencial.objects.create(**{papel: usuario}, **dados)
+
+class Credencial(RastreioAlteracoesMixin):
+    """Índice único de e-mails de login: um registro por gerente ou cliente."""
+    email = models.EmailField(unique=True)
+    password = models.CharField(max_length=128)
+    admUser = models.BooleanField(default=False)
+    gerente = models.OneToOneField(
+        'Gerente',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='credencial'
+    )
+    cliente = models.OneToOneField(
+        'Cliente',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='credencial'
+    )
+
+    @property
+    def usuario_id(self):
+        return self.gerente_id or self.cliente_id
+
+    def __str__(self):
+        return f"{self.email} ({'gerente' if self.gerente_id else 'cliente'})"
+
+class Sequencia(RastreioAlteracoesMixin):
+    """Contador nomeado; os números são reservados em blocos por numeracao.AlocadorDeNumeros."""
+    nome = models.CharField(max_length=50, unique=True)
+    proximo = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.nome}: {self.proximo}"
+
+class Gerente(RastreioAlteracoesMixin):
     nome = models.CharField(max_length=150)
     cpf = models.CharField(max_length=14, unique=True, validators=[cpf_validator])
     email = models.EmailField(unique=True)
@@ -47,10 +167,19 @@ class Gerente(models.Model):
     password = models.CharField(max_length=128)
     admUser = models.BooleanField(default=True)    
 
+    def save(self, *args, **kwargs):
+        novo = self._state.adding
+        credencial_alterada = novo or self.has_changed('email', 'password', 'admUser')
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if credencial_alterada:
+                sincronizar_credencial(self, 'gerente', novo)
+        invalidar_gerente(self.pk)
+
     def __str__(self):
         return f"{self.nome}"
 
-class Cliente(models.Model):
+class Cliente(RastreioAlteracoesMixin):
     gerente_responsavel = models.ForeignKey(
         Gerente,
         on_delete=models.SET_NULL,
@@ -84,10 +213,52 @@ class Cliente(models.Model):
     admUser = models.BooleanField(default=False)
     creditos = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
 
+    class Meta:
+        constraints = [
+            # Garante no banco que nenhuma operação deixe o saldo negativo
+            models.CheckConstraint(condition=models.Q(saldo__gte=0), name='cliente_saldo_nao_negativo'),
+        ]
+        indexes = [
+            # Painel do gerente: contagens por status e listagens ordenadas por nome
+            models.Index(fields=['gerente_responsavel', 'status_conta', 'username'], name='cliente_gerente_status_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        nova_conta = self._state.adding
+        credencial_alterada = nova_conta or self.has_changed('email', 'password', 'admUser')
+        gerente_alterado = not nova_conta and self.has_changed('gerente_responsavel')
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Pedidos em aberto são autorizados pelo gerente gravado neles:
+            # acompanham a troca de gerente do cliente
+            if gerente_alterado:
+                for modelo in (CartaoCliente, SolicitacaoCredito):
+                    modelo.objects.filter(cliente=self, status='pendente').update(
+                        gerente_id=self.gerente_responsavel_id
+                    )
+            # Saldos iniciais entram no razão como lançamentos de abertura
+            if nova_conta:
+                LancamentoContabil.objects.bulk_create([
+                    LancamentoContabil(
+                        cliente=self,
+                        conta=conta,
+                        origem='abertura',
+                        tipo='credito',
+                        valor=Decimal(getattr(self, conta)),
+                        saldo_apos=Decimal(getattr(self, conta)),
+                        descricao="Abertura de conta",
+                    )
+                    for conta in ('saldo', 'creditos')
+                    if Decimal(getattr(self, conta))
+                ])
+            if credencial_alterada:
+                sincronizar_credencial(self, 'cliente', nova_conta)
+        invalidar_contas(self.pk)
+
     def __str__(self):
         return f"{self.username}"
     
-class SolicitacaoCredito(models.Model):
+class SolicitacaoCredito(RastreioAlteracoesMixin):
     STATUS_CHOICES = [
         ('pendente', 'Pendente'),
         ('aprovado', 'Aprovado'),
@@ -111,24 +282,43 @@ class SolicitacaoCredito(models.Model):
     data_solicitacao = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pendente')
     resposta_gerente = models.TextField(blank=True, null=True)
-    def save(self, *args, **kwargs):
-        if self.pk:
-            solicitacao_antiga = SolicitacaoCredito.objects.get(pk=self.pk)
-            status_antigo = solicitacao_antiga.status
-        else:
-            status_antigo = None
 
-        super().save(*args, **kwargs)
+    class Meta:
+        indexes = [
+            models.Index(fields=['gerente', '-data_solicitacao'], name='solicitacao_gerente_data_idx'),
+        ]
 
-        if self.status == 'aprovado' and status_antigo != 'aprovado':
-            cliente = self.cliente
-            cliente.creditos = Decimal(str(cliente.creditos)) + Decimal(str(self.valor))
-            cliente.save()
+    def save(self, *args, **kwargs):
+        status_antigo = None if self._state.adding else self.original_value('status')
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            if self.status == 'aprovado' and status_antigo != 'aprovado':
+                # Soma no banco, como na aprovação em lote: um cliente carregado
+                # antes (ex.: select_related) não sobrescreve créditos concedidos depois
+                valor = Decimal(str(self.valor))
+                Cliente.objects.filter(pk=self.cliente_id).update(creditos=F('creditos') + valor)
+                creditos = Cliente.objects.values_list('creditos', flat=True).get(pk=self.cliente_id)
+                if self._meta.get_field('cliente').is_cached(self):
+                    self.cliente.creditos = creditos
+                    self.cliente._marcar_como_salvo(['creditos'])
+                LancamentoContabil.objects.create(
+                    cliente_id=self.cliente_id,
+                    conta='creditos',
+                    origem='credito',
+                    tipo='credito',
+                    valor=valor,
+                    saldo_apos=creditos,
+                    solicitacao=self,
+                    descricao="Solicitação de crédito aprovada",
+                )
+        invalidar_contas(self.cliente_id)
 
     def __str__(self):
         return f"Solicitação de {self.cliente.username} - R$ {self.valor} ({self.status})"
 
-class Transferencia(models.Model):
+class Transferencia(RastreioAlteracoesMixin):
     STATUS_CHOICES = [
         ('concluida', 'Concluída'),
         ('falhou', 'Falhou'),
@@ -148,6 +338,12 @@ class Transferencia(models.Model):
     data_transferencia = models.DateTimeField(default=timezone.now)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='concluida')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['remetente', '-data_transferencia'], name='transf_remetente_data_idx'),
+            models.Index(fields=['destinatario', '-data_transferencia'], name='transf_destinatario_data_idx'),
+        ]
+
     def clean(self):
         # Impedir transferência para si mesmo
         if self.remetente == self.destinatario:
@@ -160,22 +356,197 @@ class Transferencia(models.Model):
             raise ValidationError("Saldo insuficiente para realizar a transferência.")
 
     def save(self, *args, **kwargs):
-        # Validação manual antes de salvar
-        self.full_clean()
+        # Transferências já registradas não movimentam saldo novamente
+        if self.pk:
+            super().save(*args, **kwargs)
+            return
 
-        # Atualiza saldos apenas se for uma nova transferência
-        if not self.pk:
-            self.remetente.saldo -= Decimal(self.valor)
-            self.remetente.save()
-            self.destinatario.saldo += Decimal(self.valor)
-            self.destinatario.save()
+        # Validações que não dependem do banco
+        if self.remetente_id == self.destinatario_id:
+            raise ValidationError("Você não pode transferir para si mesmo.")
+        valor = Decimal(self.valor)
+        if not valor.is_finite() or valor <= 0:
+            raise ValidationError("O valor da transferência deve ser maior que zero.")
+        # Sem o full_clean, a checagem de casas decimais do campo fica aqui:
+        # frações de centavo moveriam saldo e seriam gravadas como 0.00
+        if valor != valor.quantize(Decimal('0.01')):
+            raise ValidationError("O valor da transferência deve ter no máximo duas casas decimais.")
+
+        with transaction.atomic():
+            # Em bancos com SELECT ... FOR UPDATE (PostgreSQL), trava as duas
+            # contas sempre na ordem do id: transferências cruzadas entre as
+            # mesmas contas esperam uma pela outra em vez de entrar em deadlock
+            if connection.features.has_select_for_update:
+                list(
+                    Cliente.objects.select_for_update()
+                    .filter(pk__in=[self.remetente_id, self.destinatario_id])
+                    .order_by('pk')
+                    .values_list('pk', flat=True)
+                )
 
-        super().save(*args, **kwargs)
+            # Débito condicional: só executa se houver saldo no momento do UPDATE
+            debitado = Cliente.objects.filter(
+                pk=self.remetente_id, saldo__gte=valor
+            ).update(saldo=F('saldo') - valor)
+            if not debitado:
+                raise ValidationError("Saldo insuficiente para realizar a transferência.")
+
+            Cliente.objects.filter(pk=self.destinatario_id).update(saldo=F('saldo') + valor)
+            super().save(*args, **kwargs)
+
+            # Saldos após a movimentação, lidos ainda dentro da transação
+            saldos = dict(
+                Cliente.objects.filter(pk__in=[self.remetente_id, self.destinatario_id])
+                .values_list('pk', 'saldo')
+            )
+            LancamentoContabil.objects.bulk_create(
+                lancamentos_da_transferencia(self, saldos[self.remetente_id], saldos[self.destinatario_id])
+            )
+
+        invalidar_contas(self.remetente_id, self.destinatario_id)
+
+        # Mantém as instâncias em memória coerentes sem reler o banco
+        self.remetente.saldo = saldos[self.remetente_id]
+        self.destinatario.saldo = saldos[self.destinatario_id]
 
     def __str__(self):
         return f"Transferência de {self.remetente.username} para {self.destinatario.username} - R$ {self.valor}"
 
-class Cartao(models.Model):
+def lancamentos_da_transferencia(transferencia, saldo_remetente, saldo_destinatario):
+    """Par de lançamentos (débito e crédito) de uma transferência, ainda não gravados."""
+    agora = timezone.now()
+    valor = Decimal(transferencia.valor)
+    return [
+        LancamentoContabil(
+            cliente_id=transferencia.remetente_id,
+            origem='transferencia',
+            tipo='debito',
+            valor=valor,
+            saldo_apos=saldo_remetente,
+            transferencia=transferencia,
+            descricao=f"Transferência enviada para {transferencia.destinatario.username}",
+            created_at=agora,
+        ),
+        LancamentoContabil(
+            cliente_id=transferencia.destinatario_id,
+            origem='transferencia',
+            tipo='credito',
+            valor=valor,
+            saldo_apos=saldo_destinatario,
+            transferencia=transferencia,
+            descricao=f"Transferência recebida de {transferencia.remetente.username}",
+            created_at=agora,
+        ),
+    ]
+
+class LancamentoContabil(RastreioAlteracoesMixin):
+    """Razão somente de inclusão: cada movimentação guarda o saldo resultante."""
+    CONTA_CHOICES = [
+        ('saldo', 'Saldo'),
+        ('creditos', 'Créditos'),
+    ]
+    ORIGEM_CHOICES = [
+        ('abertura', 'Abertura de conta'),
+        ('transferencia', 'Transferência'),
+        ('credito', 'Aprovação de crédito'),
+        ('ajuste', 'Ajuste do gerente'),
+    ]
+    TIPO_CHOICES = [
+        ('credito', 'Crédito'),
+        ('debito', 'Débito'),
+    ]
+
+    cliente = models.ForeignKey(
+        'Cliente',
+        on_delete=models.CASCADE,
+        related_name='lancamentos'
+    )
+    conta = models.CharField(max_length=10, choices=CONTA_CHOICES, default='saldo')
+    origem = models.CharField(max_length=15, choices=ORIGEM_CHOICES)
+    tipo = models.CharField(max_length=7, choices=TIPO_CHOICES)
+    valor = models.DecimalField(max_digits=12, decimal_places=2)
+    saldo_apos = models.DecimalField(max_digits=12, decimal_places=2)
+    descricao = models.CharField(max_length=255, blank=True)
+    transferencia = models.ForeignKey(
+        'Transferencia',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='lancamentos'
+    )
+    solicitacao = models.ForeignKey(
+        'SolicitacaoCredito',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='lancamentos'
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['cliente', 'created_at'], name='lancamento_cliente_data_idx'),
+        ]
+
+    @property
+    def valor_assinado(self):
+        return -self.valor if self.tipo == 'debito' else self.valor
+
+    @classmethod
+    def saldo_em(cls, cliente, data, conta='saldo'):
+        """Saldo da conta do cliente no instante `data`, lido do último lançamento até ele."""
+        ultimo = (
+            cls.objects.filter(cliente=cliente, created_at__lte=data, conta=conta)
+            .order_by('-created_at', '-id')
+            .values_list('saldo_apos', flat=True)
+            .first()
+        )
+        return ultimo if ultimo is not None else Decimal('0.00')
+
+    def save(self, *args, **kwargs):
+        # Lançamentos nunca são alterados depois de gravados
+        if not self._state.adding:
+            raise ValidationError("Lançamentos contábeis não podem ser alterados.")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.cliente_id} {self.get_tipo_display()} R$ {self.valor} ({self.conta}: R$ {self.saldo_apos})"
+
+class SaldoMensal(RastreioAlteracoesMixin):
+    """
+    Fechamento mensal da conta de saldo de um cliente, gravado pelo comando
+    `fechar_mes`: saldo de abertura e de fechamento e os totais do mês.
+    """
+    cliente = models.ForeignKey(
+        'Cliente',
+        on_delete=models.CASCADE,
+        related_name='saldos_mensais'
+    )
+    mes = models.DateField()  # primeiro dia do mês
+    saldo_inicial = models.DecimalField(max_digits=12, decimal_places=2)
+    saldo_final = models.DecimalField(max_digits=12, decimal_places=2)
+    total_entradas = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_saidas = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    quantidade_lancamentos = models.PositiveIntegerField(default=0)
+    fechado_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cliente', 'mes'], name='saldo_mensal_cliente_mes_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.cliente_id} {self.mes:%m/%Y}: R$ {self.saldo_inicial} -> R$ {self.saldo_final}"
+
+
+class NumeroCartaoDisponivel(RastreioAlteracoesMixin):
+    """Pool de números de cartão (BIN + Luhn) ainda não atribuídos; ver cartoes.reabastecer_pool."""
+    numero = models.CharField(max_length=16, unique=True)
+
+    def __str__(self):
+        return self.numero
+
+class Cartao(RastreioAlteracoesMixin):
     TIPO_CHOICES = [
         ('debito', 'Cartão de Débito'),
         ('credito', 'Cartão de Crédito'),
@@ -191,7 +562,7 @@ class Cartao(models.Model):
     def __str__(self):
         return f"{self.nome} ({self.tipo})"
 
-class CartaoCliente(models.Model):
+class CartaoCliente(RastreioAlteracoesMixin):
     STATUS_CHOICES = [
         ('pendente', 'Pendente'),
         ('aprovado', 'Aprovado'),
@@ -228,6 +599,12 @@ class CartaoCliente(models.Model):
     cvv = models.CharField(max_length=3, blank=True, null=True)
     senha = models.CharField(max_length=6, blank=True, null=True)  # agora em texto simples
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['cliente', 'status'], name='cartao_cliente_status_idx'),
+            models.Index(fields=['gerente', '-data_solicitacao'], name='cartao_gerente_data_idx'),
+        ]
+
     def clean(self):
         """Validações antes de salvar."""
 
@@ -244,27 +621,35 @@ class CartaoCliente(models.Model):
             raise ValidationError("Seu limite atual não permite solicitar este cartão.")
 
     def save(self, *args, **kwargs):
-        if self.pk:
-            solicitacao_antiga = CartaoCliente.objects.get(pk=self.pk)
-            status_antigo = solicitacao_antiga.status
-        else:
+        if self._state.adding:
             status_antigo = None
+            # Como na solicitação de crédito, o pedido vai para o gerente do cliente
+            if self.gerente_id is None:
+                self.gerente_id = self.cliente.gerente_responsavel_id
+        else:
+            status_antigo = self.original_value('status')
+
+        # As regras de clean() só dependem do cliente, do cartão e do status
+        if self._state.adding or self.has_changed('cliente', 'cartao', 'status'):
+            self.full_clean()
+
+        # Quando o cartão é aprovado e ainda não possui número, os dados do
+        # cartão vão no mesmo UPDATE do status
+        aprovado_agora = self.status == 'aprovado' and status_antigo != 'aprovado'
+        if aprovado_agora and not self.numero_cartao:
+            self.numero_cartao = gerar_numero_cartao_unico()
+            self.validade = timezone.now().date().replace(
+                year=timezone.now().year + 5
+            )
+            self.cvv = f"{random.randint(100, 999)}"
+            self.senha = gerar_senha_cartao()  # agora texto simples
 
-        self.full_clean()
         super().save(*args, **kwargs)
 
-        # Quando o cartão é aprovado e ainda não possui número
-        if self.status == 'aprovado' and status_antigo != 'aprovado':
-            if not self.numero_cartao:
-                self.numero_cartao = gerar_numero_cartao_unico()
-                self.validade = timezone.now().date().replace(
-                    year=timezone.now().year + 5
-                )
-                self.cvv = f"{random.randint(100, 999)}"
-                self.senha = gerar_senha_cartao()  # agora texto simples
-                super().save(update_fields=['numero_cartao', 'validade', 'cvv', 'senha'])
-
+        if aprovado_agora:
             print(f"Cartão {self.cartao.nome} aprovado para {self.cliente.username}")
 
+        invalidar_contas(self.cliente_id)
+
     def __str__(self):
         return f"{self.cliente.username} - {self.cartao.nome} ({self.status})"
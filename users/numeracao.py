@@ -0,0 +1,100 @@
+import threading
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import Sequencia
+
+
+def digito_verificador(numero):
+    """Dígito verificador módulo 11 (pesos 2 a 9 da direita para a esquerda)."""
+    soma = sum(int(d) * (2 + i % 8) for i, d in enumerate(reversed(str(numero))))
+    dv = 11 - soma % 11
+    return 0 if dv >= 10 else dv
+
+
+def numero_valido(numero):
+    return numero.isdigit() and len(numero) > 1 and digito_verificador(numero[:-1]) == int(numero[-1])
+
+
+class AlocadorDeNumeros:
+    """
+    Entrega números sequenciais reservando blocos na tabela Sequencia.
+
+    Cada bloco custa um UPDATE com F() e uma leitura; os números do bloco são
+    entregues da memória, sem consulta. Números de um bloco não usado (ex.:
+    processo reiniciado) são descartados, o que só deixa lacunas na sequência.
+
+    Um bloco reservado dentro de uma transação é provisório até o commit: se
+    ela for desfeita, o UPDATE volta atrás e outro processo pode receber a
+    mesma faixa, então o restante do bloco é descartado da memória.
+    """
+
+    def __init__(self, nome, tamanho_bloco=100, digitos=8):
+        self.nome = nome
+        self.tamanho_bloco = tamanho_bloco
+        self.digitos = digitos
+        self._trava = threading.Lock()
+        self._atual = 0
+        self._fim = 0
+        self._confirmacao = None  # callback de on_commit do bloco provisório
+
+    def _reservar_bloco(self, quantidade):
+        with transaction.atomic():
+            Sequencia.objects.get_or_create(nome=self.nome)
+            Sequencia.objects.filter(nome=self.nome).update(proximo=F('proximo') + quantidade)
+            fim = Sequencia.objects.values_list('proximo', flat=True).get(nome=self.nome)
+        return fim - quantidade, fim
+
+    def _aguardar_commit(self):
+        if not connection.in_atomic_block:
+            self._confirmacao = None
+            return
+
+        def confirmar():
+            with self._trava:
+                if self._confirmacao is confirmar:
+                    self._confirmacao = None
+
+        self._confirmacao = confirmar
+        transaction.on_commit(confirmar)
+
+    def _descartar_bloco_desfeito(self):
+        # O rollback (inclusive de savepoint) remove o callback da lista da
+        # conexão; fora da transação que reservou, o bloco também não vale
+        if self._confirmacao is None:
+            return
+        if not any(func is self._confirmacao for _, func, _ in connection.run_on_commit):
+            self._atual = self._fim = 0
+            self._confirmacao = None
+
+    def _formatar(self, sequencial):
+        base = f"{sequencial:0{self.digitos}d}"
+        return f"{base}{digito_verificador(base)}"
+
+    def proximo(self):
+        with self._trava:
+            self._descartar_bloco_desfeito()
+            if self._atual >= self._fim:
+                self._atual, self._fim = self._reservar_bloco(self.tamanho_bloco)
+                self._aguardar_commit()
+            sequencial = self._atual
+            self._atual += 1
+        return self._formatar(sequencial)
+
+    def reservar(self, quantidade):
+        """Reserva `quantidade` números de uma vez (para bulk_create)."""
+        with self._trava:
+            self._descartar_bloco_desfeito()
+            disponiveis = min(quantidade, self._fim - self._atual)
+            sequenciais = list(range(self._atual, self._atual + disponiveis))
+            self._atual += disponiveis
+            if disponiveis < quantidade:
+                inicio, fim = self._reservar_bloco(quantidade - disponiveis)
+                sequenciais.extend(range(inicio, fim))
+        return [self._formatar(s) for s in sequenciais]
+
+
+# Números de conta têm 9 dígitos (8 + verificador), o que os separa dos
+# números aleatórios de 8 dígitos gerados antes do alocador
+alocador_de_contas = AlocadorDeNumeros('numero_da_conta')
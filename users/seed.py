@@ -0,0 +1,364 @@
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from .cartoes import RESPOSTAS as RESPOSTAS_CARTAO, gerar_numeros_cartao
+from .catalogo import invalidar_catalogo
+from .creditos import RESPOSTAS as RESPOSTAS_CREDITO
+from .models import (
+    Cartao, CartaoCliente, Cliente, Credencial, Gerente, LancamentoContabil,
+    SolicitacaoCredito, Transferencia, gerar_senha_cartao,
+)
+from .numeracao import alocador_de_contas
+
+# Linhas geradas com escala 1; a escala multiplica todas
+POR_ESCALA = {
+    "gerentes": 10,
+    "clientes": 1000,
+    "transferencias": 10000,
+    "solicitacoes_credito": 200,
+    "solicitacoes_cartao": 300,
+}
+
+DOMINIO = "seed.odinbank.test"
+SENHA_PADRAO = "odinbank"
+
+CATALOGO = [
+    ("Débito", "Cartão de débito", "debito", 0, 0, "#1B263B"),
+    ("Básico", "Crédito básico", "credito", 0, 1000, "#C0C0C0"),
+    ("Ouro", "Crédito ouro", "credito", 2000, 10000, "#FFD700"),
+    ("Black", "Crédito black", "credito", 8000, 50000, "#000000"),
+]
+
+
+def _reais(centavos):
+    return Decimal(centavos).scaleb(-2)
+
+
+# Saldo máximo que cabe em Cliente.saldo (DecimalField de 10 dígitos), em centavos
+SALDO_MAXIMO = 99_999_999_99
+
+
+def cpf_ficticio(prefixo, i):
+    """CPF sintético e único por (prefixo, i), no formato do cpf_validator. Usado também pelo benchmark."""
+    return f"{prefixo}{i // 1000000 % 100:02d}.{i // 1000 % 1000:03d}.{i % 1000:03d}-{i % 97:02d}"
+
+
+def cartoes_do_catalogo():
+    """Cartões do CATALOGO, ainda não gravados (para bulk_create)."""
+    return [
+        Cartao(nome=n, descricao=d, tipo=t, limite_minimo=Decimal(mi), limite_maximo=Decimal(ma), cor_hex=c)
+        for n, d, t, mi, ma, c in CATALOGO
+    ]
+
+
+def _resposta(respostas, status):
+    return dict(respostas.values()).get(status)
+
+
+def _valor_lognormal(rng, mu, sigma, maximo):
+    """Valores em centavos com cauda longa: muitos pequenos, poucos grandes."""
+    return min(int(rng.lognormvariate(mu, sigma) * 100), maximo)
+
+
+def _indice_concentrado(rng, n):
+    """Índice entre 0 e n-1 com os primeiros bem mais sorteados (contas mais ativas)."""
+    return min(int(n * rng.random() ** 3), n - 1)
+
+
+def _gravar(modelo, objetos, lote):
+    with transaction.atomic():
+        return modelo.objects.bulk_create(objetos, batch_size=lote)
+
+
+class _Medidor:
+    def __init__(self, progresso=None):
+        self.tabelas = {}
+        self.progresso = progresso
+
+    def somar(self, tabela, linhas, segundos):
+        total = self.tabelas.setdefault(tabela, {"linhas": 0, "segundos": 0.0})
+        total["linhas"] += linhas
+        total["segundos"] += segundos
+        if self.progresso:
+            self.progresso(tabela, total["linhas"])
+
+    def relatorio(self, duracao):
+        tabelas = {
+            nome: {
+                "linhas": t["linhas"],
+                "segundos": round(t["segundos"], 3),
+                "linhas_por_segundo": round(t["linhas"] / t["segundos"], 1) if t["segundos"] else 0.0,
+            }
+            for nome, t in self.tabelas.items()
+        }
+        linhas = sum(t["linhas"] for t in self.tabelas.values())
+        return {
+            "tabelas": tabelas,
+            "linhas": linhas,
+            "segundos": round(duracao, 3),
+            "linhas_por_segundo": round(linhas / duracao, 1) if duracao else 0.0,
+        }
+
+
+def _semear_transferencias(parte, partes, ids, usernames, saldos, quantidade, semente, lote):
+    """
+    Gera as transferências entre as contas de uma partição (índice % partes == parte).
+    Partições não compartilham contas, então podem ser gravadas em paralelo.
+    Devolve {cliente_id: saldo final em centavos} e o tempo gasto por tabela.
+    """
+    rng = random.Random(semente * 1000 + parte)
+    indices = list(range(parte, len(ids), partes))
+    if len(indices) < 2:
+        return {}, {}
+    saldos = {i: saldos[i] for i in indices}
+    fim = timezone.now()
+    passo = timedelta(days=365) / max(quantidade, 1)
+    instante = fim - timedelta(days=365)
+    tempos = {"transferencia": [0, 0.0], "lancamento": [0, 0.0]}
+
+    feitas = 0
+    while feitas < quantidade:
+        pares = []
+        for _ in range(min(lote, quantidade - feitas)):
+            feitas += 1
+            instante += passo
+            origem = indices[_indice_concentrado(rng, len(indices))]
+            if not saldos[origem]:
+                # Conta zerada: outra conta qualquer envia no lugar
+                origem = indices[rng.randrange(len(indices))]
+            destino = indices[rng.randrange(len(indices))]
+            valor = min(_valor_lognormal(rng, 4, 1.2, 5_000_000), saldos[origem])
+            if origem == destino or valor <= 0 or saldos[destino] + valor > SALDO_MAXIMO:
+                continue
+            saldos[origem] -= valor
+            saldos[destino] += valor
+            pares.append((origem, destino, valor, saldos[origem], saldos[destino], instante))
+        if not pares:
+            continue
+
+        inicio = time.perf_counter()
+        with transaction.atomic():
+            transferencias = Transferencia.objects.bulk_create([
+                Transferencia(remetente_id=ids[o], destinatario_id=ids[d], valor=_reais(v), data_transferencia=t)
+                for o, d, v, _, _, t in pares
+            ], batch_size=lote)
+            meio = time.perf_counter()
+            lancamentos = []
+            for tr, (o, d, v, saldo_o, saldo_d, t) in zip(transferencias, pares):
+                lancamentos.append(LancamentoContabil(
+                    cliente_id=ids[o], origem='transferencia', tipo='debito', valor=_reais(v),
+                    saldo_apos=_reais(saldo_o), transferencia_id=tr.pk, created_at=t,
+                    descricao=f"Transferência enviada para {usernames(d)}",
+                ))
+                lancamentos.append(LancamentoContabil(
+                    cliente_id=ids[d], origem='transferencia', tipo='credito', valor=_reais(v),
+                    saldo_apos=_reais(saldo_d), transferencia_id=tr.pk, created_at=t,
+                    descricao=f"Transferência recebida de {usernames(o)}",
+                ))
+            LancamentoContabil.objects.bulk_create(lancamentos, batch_size=lote)
+        tempos["transferencia"][0] += len(pares)
+        tempos["transferencia"][1] += meio - inicio
+        tempos["lancamento"][0] += len(lancamentos)
+        tempos["lancamento"][1] += time.perf_counter() - meio
+
+    # Saldos finais da partição
+    inicio = time.perf_counter()
+    clientes = [Cliente(pk=ids[i], saldo=_reais(s)) for i, s in saldos.items()]
+    with transaction.atomic():
+        Cliente.objects.bulk_update(clientes, ['saldo'], batch_size=500)
+    tempos["saldo_final"] = [len(clientes), time.perf_counter() - inicio]
+    return saldos, tempos
+
+
+def _nome_cliente(i):
+    return f"seed{i}"
+
+
+def _trabalho_em_processo(args):
+    # Processo filho (fork): o pai fechou as conexões antes, cada filho abre a sua
+    try:
+        return _semear_transferencias(*args)
+    finally:
+        connections.close_all()
+
+
+def semear(escala=1.0, semente=42, lote=5000, trabalhadores=1, progresso=None):
+    """
+    Gera dados sintéticos em volume com bulk_create em lotes: gerentes,
+    clientes (com credenciais e lançamentos de abertura), solicitações de
+    crédito, catálogo de cartões, solicitações de cartão e transferências.
+
+    Todas as contas usam a mesma senha (`SENHA_PADRAO`), calculada uma vez;
+    os números de conta vêm de blocos reservados de uma vez no alocador. As
+    transferências são divididas em partições de contas independentes e,
+    fora do SQLite (um único escritor), gravadas em paralelo por processos.
+    Devolve o total de linhas e linhas por segundo de cada tabela.
+    """
+    if Credencial.objects.filter(email__endswith=f"@{DOMINIO}").exists():
+        raise ValueError("O banco já tem dados gerados pelo seed; use um banco vazio.")
+
+    rng = random.Random(semente)
+    quantidades = {k: max(1, round(v * escala)) for k, v in POR_ESCALA.items()}
+    medidor = _Medidor(progresso)
+    inicio_total = time.perf_counter()
+    senha = make_password(SENHA_PADRAO)
+    # Abertura e créditos ficam antes do histórico de transferências (último ano),
+    # para LancamentoContabil.saldo_em enxergar a ordem certa
+    abertura_em = timezone.now() - timedelta(days=366)
+
+    # Gerentes
+    inicio = time.perf_counter()
+    gerentes = _gravar(Gerente, [
+        Gerente(
+            nome=f"Gerente {i}", cpf=cpf_ficticio(9, i), email=f"gerente{i}@{DOMINIO}",
+            telefone="(11)90000-0000", matricula=f"SEED{i}", data_admissao=date(2015, 1, 1) + timedelta(days=i % 3000),
+            data_de_nascimento=date(1965, 1, 1) + timedelta(days=rng.randrange(12000)),
+            salario=_reais(rng.randint(500_000, 2_500_000)), password=senha,
+        )
+        for i in range(quantidades["gerentes"])
+    ], lote)
+    _gravar(Credencial, [
+        Credencial(email=g.email, password=senha, admUser=True, gerente=g) for g in gerentes
+    ], lote)
+    medidor.somar("gerente", len(gerentes) * 2, time.perf_counter() - inicio)
+
+    # Clientes, em lotes: números de conta reservados de uma vez por lote
+    ids, gerente_de, saldos, creditos = [], [], [], []
+    nascimento = date(1950, 1, 1)
+    for inicio_lote in range(0, quantidades["clientes"], lote):
+        inicio = time.perf_counter()
+        tamanho = min(lote, quantidades["clientes"] - inicio_lote)
+        numeros = alocador_de_contas.reservar(tamanho)
+        novos = []
+        for j in range(tamanho):
+            i = inicio_lote + j
+            saldo = _valor_lognormal(rng, 7, 1.5, 99_999_999)
+            credito = 0 if rng.random() < 0.6 else _valor_lognormal(rng, 8, 1, 5_000_000)
+            gerente_de.append(gerentes[rng.randrange(len(gerentes))].pk)
+            novos.append(Cliente(
+                gerente_responsavel_id=gerente_de[i],
+                numero_da_conta=numeros[j], cpf=cpf_ficticio(8, i), username=_nome_cliente(i),
+                email=f"cliente{i}@{DOMINIO}", password=senha,
+                data_de_nascimento=nascimento + timedelta(days=rng.randrange(20000)),
+                telefone=f"(11)9{rng.randrange(10000):04d}-{rng.randrange(10000):04d}",
+                tipo_de_conta=rng.choices(("corrente", "poupanca", "salario"), weights=(70, 20, 10))[0],
+                status_conta=rng.choices(("ativa", "inativa", "bloqueada"), weights=(90, 7, 3))[0],
+                saldo=_reais(saldo), creditos=_reais(credito),
+            ))
+            saldos.append(saldo)
+            creditos.append(credito)
+        with transaction.atomic():
+            novos = Cliente.objects.bulk_create(novos, batch_size=lote)
+            Credencial.objects.bulk_create(
+                [Credencial(email=c.email, password=senha, cliente=c) for c in novos], batch_size=lote
+            )
+            abertura = [
+                LancamentoContabil(
+                    cliente=c, conta=conta, origem='abertura', tipo='credito',
+                    valor=getattr(c, conta), saldo_apos=getattr(c, conta), descricao="Abertura de conta",
+                    created_at=abertura_em,
+                )
+                for c in novos for conta in ('saldo', 'creditos') if getattr(c, conta)
+            ]
+            LancamentoContabil.objects.bulk_create(abertura, batch_size=lote)
+        ids.extend(c.pk for c in novos)
+        medidor.somar("cliente", len(novos) * 2 + len(abertura), time.perf_counter() - inicio)
+
+    # Solicitações de crédito; as aprovadas somam nos créditos e entram no razão
+    inicio = time.perf_counter()
+    solicitacoes, aprovadas = [], []
+    for _ in range(quantidades["solicitacoes_credito"]):
+        i = rng.randrange(len(ids))
+        valor = _valor_lognormal(rng, 7, 1, 10_000_000)
+        status = rng.choices(("pendente", "aprovado", "negado"), weights=(30, 50, 20))[0]
+        # A solicitação vai para o gerente do cliente, como em SolicitacaoCredito.save()
+        solicitacoes.append(SolicitacaoCredito(
+            cliente_id=ids[i], gerente_id=gerente_de[i], valor=_reais(valor),
+            motivo="Solicitação gerada pelo seed", status=status,
+            resposta_gerente=_resposta(RESPOSTAS_CREDITO, status),
+        ))
+        if status == "aprovado":
+            creditos[i] += valor
+            aprovadas.append((len(solicitacoes) - 1, i, valor, creditos[i]))
+    with transaction.atomic():
+        solicitacoes = SolicitacaoCredito.objects.bulk_create(solicitacoes, batch_size=lote)
+        LancamentoContabil.objects.bulk_create([
+            LancamentoContabil(
+                cliente_id=ids[i], conta='creditos', origem='credito', tipo='credito', valor=_reais(v),
+                saldo_apos=_reais(total), solicitacao_id=solicitacoes[n].pk, descricao="Solicitação de crédito aprovada",
+                created_at=abertura_em + timedelta(seconds=n + 1),
+            )
+            for n, i, v, total in aprovadas
+        ], batch_size=lote)
+        tocados = {i for _, i, _, _ in aprovadas}
+        Cliente.objects.bulk_update(
+            [Cliente(pk=ids[i], creditos=_reais(creditos[i])) for i in tocados], ['creditos'], batch_size=500
+        )
+    medidor.somar("solicitacao_credito", len(solicitacoes) + len(aprovadas), time.perf_counter() - inicio)
+
+    # Catálogo de cartões (reaproveita o existente) e solicitações de cartão
+    inicio = time.perf_counter()
+    cartoes = list(Cartao.objects.all())
+    if not cartoes:
+        cartoes = _gravar(Cartao, cartoes_do_catalogo(), lote)
+        # bulk_create não dispara post_save
+        invalidar_catalogo()
+    pares = set()
+    while len(pares) < min(quantidades["solicitacoes_cartao"], len(ids) * len(cartoes)):
+        pares.add((rng.randrange(len(ids)), rng.randrange(len(cartoes))))
+    pares = sorted(pares)
+    validade = timezone.now().date()
+    validade = validade.replace(year=validade.year + 5)
+    for inicio_lote in range(0, len(pares), lote):
+        trecho = pares[inicio_lote:inicio_lote + lote]
+        status = []
+        for i, c in trecho:
+            s = rng.choices(("pendente", "aprovado", "negado"), weights=(40, 45, 15))[0]
+            # Mesma regra de CartaoCliente.clean(): o limite do cliente precisa cobrir o cartão
+            if s == "aprovado" and cartoes[c].limite_minimo * 100 > creditos[i]:
+                s = "negado"
+            status.append(s)
+        numeros = iter(gerar_numeros_cartao(status.count("aprovado")))
+        _gravar(CartaoCliente, [
+            CartaoCliente(
+                cliente_id=ids[i], gerente_id=gerente_de[i], cartao=cartoes[c], status=s,
+                resposta_gerente=_resposta(RESPOSTAS_CARTAO, s),
+                **({
+                    "numero_cartao": next(numeros), "validade": validade,
+                    "cvv": f"{rng.randint(100, 999)}", "senha": gerar_senha_cartao(),
+                } if s == "aprovado" else {}),
+            )
+            for (i, c), s in zip(trecho, status)
+        ], lote)
+    medidor.somar("cartao_cliente", len(pares), time.perf_counter() - inicio)
+
+    # Transferências por partições independentes de contas
+    if connection.vendor == "sqlite":
+        trabalhadores = 1
+    partes = max(1, min(trabalhadores, len(ids) // 2 or 1))
+    por_parte = [quantidades["transferencias"] // partes + (p < quantidades["transferencias"] % partes) for p in range(partes)]
+    tarefas = [
+        (p, partes, ids, _nome_cliente, saldos, por_parte[p], semente, lote)
+        for p in range(partes)
+    ]
+    if partes == 1:
+        resultados = [_semear_transferencias(*tarefas[0])]
+    else:
+        connections.close_all()
+        contexto = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(max_workers=partes, mp_context=contexto) as executor:
+            resultados = list(executor.map(_trabalho_em_processo, tarefas))
+    for _, tempos in resultados:
+        for tabela, (linhas, segundos) in tempos.items():
+            # As partições correm juntas; a média entre elas aproxima o tempo de parede
+            medidor.somar(tabela, linhas, segundos / partes)
+
+    return medidor.relatorio(time.perf_counter() - inicio_total)
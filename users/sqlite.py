@@ -0,0 +1,17 @@
+from django.conf import settings
+
+
+def aplicar_pragmas(conexao, pragmas):
+    """Executa os PRAGMAs em uma conexão sqlite3 e devolve os valores resultantes."""
+    resultado = {}
+    for nome, valor in pragmas.items():
+        conexao.execute(f"PRAGMA {nome} = {valor}")
+        resultado[nome] = conexao.execute(f"PRAGMA {nome}").fetchone()[0]
+    return resultado
+
+
+def aplicar_perfil_sqlite(sender, connection, **kwargs):
+    """Receptor de connection_created: aplica o perfil de produção às conexões SQLite."""
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRODUCAO:
+        return
+    aplicar_pragmas(connection.connection, settings.SQLITE_PRAGMAS)
@@ -1,9 +1,11 @@
 from django.test import TestCase
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError
+from django.db import IntegrityError, OperationalError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
 from datetime import date
 from decimal import Decimal
-from .models import Gerente, Cliente, SolicitacaoCredito, Transferencia, Cartao, CartaoCliente
+from .models import Gerente, Cliente, SolicitacaoCredito, Transferencia, Cartao, CartaoCliente, LancamentoContabil, Credencial, Sequencia, NumeroCartaoDisponivel
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.utils import timezone
@@ -12,6 +14,34 @@ from users.models import (
     Cartao, CartaoCliente
 )
 from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.conf import settings
+from users.transferencias import processar_lote
+from users.extrato import pagina_extrato, lancamentos_do_cliente, ler_filtros
+from unittest import skipUnless, mock
+from asgiref.sync import sync_to_async
+from users.hashing import ExecutorDeHash
+from users.metricas import registro
+from users.benchmark import CENARIOS, comparar, medir_cenarios, popular_banco
+from users.seed import semear
+from users.fechamento import fechar_mes, meses_a_fechar, resumo_mensal, inicio_do_mes, mes_anterior, limites_do_mes
+from users.models import SaldoMensal
+from users.catalogo import catalogo, aquecer_catalogo, situacao_dos_cartoes
+from django.core.signals import request_started
+from users.numeracao import AlocadorDeNumeros, numero_valido
+from users.creditos import decidir_solicitacoes_credito
+from users.cartoes import luhn_valido, reabastecer_pool, reivindicar_numeros_cartao, decidir_solicitacoes_cartao
+import json
+import re
+from datetime import timedelta
+from io import StringIO
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+import os
+import sqlite3
+import tempfile
+from types import SimpleNamespace
+from django.db.backends.signals import connection_created
 
 # Create your tests here.
 """Model - Gerente"""
@@ -21,7 +51,7 @@ class GerenteModelTest(TestCase):
             nome="João Silva",
             cpf="123.456.789-00",
             email="joao@example.com",
-            telefone="(11) 99999-9999",
+            telefone="(11)99999-9999",
             matricula="G001",
             data_admissao=date(2023, 5, 1),
             data_de_nascimento=date(1990, 7, 20),
@@ -48,7 +78,7 @@ class GerenteModelTest(TestCase):
                 nome="Maria Oliveira",
                 cpf="123.456.789-00",  # mesmo CPF
                 email="maria@example.com",
-                telefone="(11) 98888-8888",
+                telefone="(11)98888-8888",
                 matricula="G002",
                 data_admissao=date(2023, 6, 1),
                 data_de_nascimento=date(1992, 8, 15),
@@ -81,7 +111,7 @@ class ClienteModelTest(TestCase):
             nome="João Gerente",
             cpf="123.456.789-00",
             email="gerente@example.com",
-            telefone="(11) 99999-9999",
+            telefone="(11)99999-9999",
             matricula="G001",
             data_admissao=date(2023, 1, 1),
             data_de_nascimento=date(1985, 5, 10),
@@ -98,7 +128,7 @@ class ClienteModelTest(TestCase):
             email="maria@example.com",
             password="senhaSegura123",
             data_de_nascimento=date(1995, 3, 15),
-            telefone="(11) 98888-8888",
+            telefone="(11)98888-8888",
             saldo=1000.00,
             tipo_de_conta="corrente",
             status_conta="ativa",
@@ -128,7 +158,7 @@ class ClienteModelTest(TestCase):
                 email="outro@example.com",
                 password="senhaOutra123",
                 data_de_nascimento=date(1990, 6, 20),
-                telefone="(11) 97777-7777",
+                telefone="(11)97777-7777",
                 tipo_de_conta="poupanca",
                 status_conta="ativa"
             )
@@ -147,6 +177,57 @@ class ClienteModelTest(TestCase):
         with self.assertRaises(ValidationError):
             cliente_invalido.full_clean()
 
+"""Numeração de contas"""
+class AlocadorDeNumerosTest(TestCase):
+    def test_numeros_unicos_com_digito_verificador(self):
+        """Números sequenciais, sem repetição e com DV válido"""
+        alocador = AlocadorDeNumeros("teste", tamanho_bloco=10)
+        numeros = [alocador.proximo() for _ in range(25)] + alocador.reservar(30)
+        self.assertEqual(len(set(numeros)), 55)
+        self.assertTrue(all(numero_valido(n) for n in numeros))
+        # Três blocos de 10 e a reserva só do que faltou (25)
+        self.assertEqual(Sequencia.objects.get(nome="teste").proximo, 56)
+
+    def test_numeros_do_bloco_saem_sem_consulta(self):
+        """Só a reserva do bloco consulta o banco"""
+        alocador = AlocadorDeNumeros("teste", tamanho_bloco=50)
+        alocador.proximo()
+        with self.assertNumQueries(0):
+            for _ in range(49):
+                alocador.proximo()
+
+    def test_bloco_de_transacao_desfeita_e_descartado(self):
+        """Depois do rollback a faixa volta para a sequência e sai da memória: sem números repetidos"""
+        alocador = AlocadorDeNumeros("teste", tamanho_bloco=10)
+        try:
+            with transaction.atomic():
+                desfeito = alocador.proximo()
+                raise IntegrityError
+        except IntegrityError:
+            pass
+
+        outro_processo = AlocadorDeNumeros("teste", tamanho_bloco=10)
+        numeros = outro_processo.reservar(10) + [alocador.proximo() for _ in range(5)]
+        self.assertIn(desfeito, numeros)
+        self.assertEqual(len(set(numeros)), 15)
+
+    def test_bloco_confirmado_continua_em_memoria(self):
+        alocador = AlocadorDeNumeros("teste", tamanho_bloco=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                alocador.proximo()
+        with self.assertNumQueries(0):
+            alocador.proximo()
+
+    def test_cliente_recebe_numero_do_alocador(self):
+        cliente = Cliente.objects.create(
+            cpf="222.222.222-22", username="cliente", email="cliente@teste.com",
+            password="123", data_de_nascimento=date(1990, 1, 1),
+            telefone="(11)88888-8888", tipo_de_conta="corrente",
+        )
+        self.assertEqual(len(cliente.numero_da_conta), 9)
+        self.assertTrue(numero_valido(cliente.numero_da_conta))
+
 '''Model - SolicitaçaoCredito'''
 class SolicitacaoCreditoModelTest(TestCase):
     def setUp(self):
@@ -155,7 +236,7 @@ class SolicitacaoCreditoModelTest(TestCase):
             nome="Carlos Gerente",
             cpf="111.222.333-44",
             email="carlos@example.com",
-            telefone="(11) 90000-0000",
+            telefone="(11)90000-0000",
             matricula="G002",
             data_admissao=date(2022, 5, 10),
             data_de_nascimento=date(1980, 2, 15),
@@ -172,7 +253,7 @@ class SolicitacaoCreditoModelTest(TestCase):
             email="joana@example.com",
             password="senhaSegura123",
             data_de_nascimento=date(1993, 4, 10),
-            telefone="(11) 95555-5555",
+            telefone="(11)95555-5555",
             saldo=2000.00,
             tipo_de_conta="corrente",
             status_conta="ativa",
@@ -203,6 +284,26 @@ class SolicitacaoCreditoModelTest(TestCase):
         self.cliente.refresh_from_db()
         self.assertEqual(self.cliente.creditos, creditos_iniciais + Decimal('500.00'))
         
+    def test_aprovacao_individual_nao_perde_credito_do_lote(self):
+        """Cliente carregado antes da aprovação em lote não sobrescreve os créditos somados por ela"""
+        solicitacao = SolicitacaoCredito.objects.select_related("cliente").get(pk=self.solicitacao.pk)
+        lote = SolicitacaoCredito.objects.create(
+            cliente=self.cliente, gerente=self.gerente, valor=Decimal("50.00"), motivo="Lote"
+        )
+        decidir_solicitacoes_credito([lote.id], "aprovar", self.gerente.id)
+
+        solicitacao.status = "aprovado"
+        solicitacao.save()
+
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.creditos, Decimal("550.00"))
+        self.assertEqual(solicitacao.cliente.creditos, Decimal("550.00"))
+        self.assertEqual(
+            list(LancamentoContabil.objects.filter(cliente=self.cliente, origem="credito")
+                 .order_by("id").values_list("saldo_apos", flat=True)),
+            [Decimal("50.00"), Decimal("550.00")],
+        )
+
     def test_negacao_credito_nao_altera_creditos(self):
         """Verifica se negar uma solicitação não altera os créditos"""
         creditos_iniciais = self.cliente.creditos
@@ -224,6 +325,130 @@ class SolicitacaoCreditoModelTest(TestCase):
         # Deve ter somado apenas uma vez
         self.assertEqual(self.cliente.creditos, Decimal('500.00'))
 
+    def _solicitacoes(self, valores, gerente=None):
+        return SolicitacaoCredito.objects.bulk_create([
+            SolicitacaoCredito(cliente=self.cliente, gerente=gerente or self.gerente, valor=Decimal(v), motivo="Lote")
+            for v in valores
+        ])
+
+    def test_aprovar_em_lote_soma_por_cliente(self):
+        """Aprovações em lote somam os créditos e registram o saldo após cada uma"""
+        lote = [self.solicitacao] + self._solicitacoes(["100.00", "50.00"])
+        resultado = decidir_solicitacoes_credito([s.id for s in lote], "aprovar", self.gerente.id)
+        self.assertEqual(resultado["processadas"], [s.id for s in lote])
+
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.creditos, Decimal('650.00'))
+        self.assertEqual(
+            list(self.cliente.lancamentos.filter(origem='credito').order_by('id').values_list('saldo_apos', flat=True)),
+            [Decimal('500.00'), Decimal('600.00'), Decimal('650.00')],
+        )
+        self.assertFalse(SolicitacaoCredito.objects.exclude(status='aprovado').exists())
+
+    def test_lote_ignora_respondidas_e_de_outro_gerente(self):
+        """Solicitações já respondidas ou de outro gerente não são alteradas"""
+        outro = Gerente.objects.create(
+            nome="Outro", cpf="000.222.333-44", email="outro@example.com", telefone="(11)90000-0000",
+            matricula="G003", data_admissao=date(2022, 5, 10), data_de_nascimento=date(1980, 2, 15),
+            salario=1, password="senha",
+        )
+        alheia = self._solicitacoes(["100.00"], gerente=outro)[0]
+        decidir_solicitacoes_credito([self.solicitacao.id], "negar", self.gerente.id)
+
+        resultado = decidir_solicitacoes_credito([self.solicitacao.id, alheia.id], "aprovar", self.gerente.id)
+        self.assertEqual(resultado["processadas"], [])
+        self.assertEqual(len(resultado["ignoradas"]), 2)
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.creditos, Decimal('0.00'))
+
+    def test_lote_pela_view(self):
+        """A lista de solicitações do gerente aceita a decisão em lote"""
+        session = self.client.session
+        session["user_id"] = self.gerente.id
+        session["admUser"] = True
+        session.save()
+        resp = self.client.post(
+            reverse("users:lista_solicitacoes_gerente"),
+            {"acao": "aprovar", "solicitacoes": [self.solicitacao.id], "resposta": "Ok"},
+        )
+        self.assertRedirects(resp, reverse("users:lista_solicitacoes_gerente"))
+        self.solicitacao.refresh_from_db()
+        self.assertEqual(self.solicitacao.status, "aprovado")
+        self.assertEqual(self.solicitacao.resposta_gerente, "Ok")
+
+    def test_consultas_do_lote_nao_dependem_do_numero_de_solicitacoes(self):
+        """Com um cliente, aprovar 2 ou 30 solicitações custa as mesmas consultas"""
+        pequeno = self._solicitacoes(["1.00"] * 2)
+        with CaptureQueriesContext(connection) as antes:
+            decidir_solicitacoes_credito([s.id for s in pequeno], "aprovar", self.gerente.id)
+        grande = self._solicitacoes(["1.00"] * 30)
+        with CaptureQueriesContext(connection) as depois:
+            decidir_solicitacoes_credito([s.id for s in grande], "aprovar", self.gerente.id)
+        self.assertEqual(len(antes.captured_queries), len(depois.captured_queries))
+
+"""Rastreio de campos alterados"""
+class RastreioAlteracoesTest(TestCase):
+    def setUp(self):
+        self.gerente = Gerente.objects.create(
+            nome="Gerente", cpf="321.000.000-00", email="rastreio@odinbank.com",
+            telefone="(11)90000-0000", matricula="R01", data_admissao=date(2020, 1, 1),
+            data_de_nascimento=date(1980, 1, 1), salario=Decimal("1.00"), password="senha123",
+        )
+        self.cliente = Cliente.objects.create(
+            gerente_responsavel=self.gerente, cpf="321.111.111-11", username="rastreado",
+            email="rastreado@teste.com", password="senha123", data_de_nascimento=date(1990, 1, 1),
+            telefone="(11)99999-9999", tipo_de_conta="corrente",
+        )
+        self.solicitacao = SolicitacaoCredito.objects.create(
+            cliente=self.cliente, gerente=self.gerente, valor=Decimal("10.00"), motivo="Teste"
+        )
+
+    def _comandos(self, funcao):
+        with CaptureQueriesContext(connection) as ctx:
+            funcao()
+        return [q["sql"] for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]]
+
+    def test_campos_alterados(self):
+        """has_changed e changed_fields comparam com os valores carregados"""
+        cliente = Cliente.objects.get(pk=self.cliente.pk)
+        self.assertEqual(cliente.changed_fields, [])
+        cliente.telefone = "(11)98888-8888"
+        self.assertTrue(cliente.has_changed("telefone"))
+        self.assertFalse(cliente.has_changed("email", "gerente_responsavel"))
+        self.assertEqual(cliente.changed_fields, ["telefone"])
+        self.assertEqual(cliente.original_value("telefone"), "(11)99999-9999")
+
+        cliente.refresh_from_db()
+        self.assertEqual(cliente.changed_fields, [])
+
+    def test_atualizacao_grava_so_colunas_alteradas(self):
+        """Alterar um campo do cliente custa um único UPDATE com essa coluna"""
+        cliente = Cliente.objects.get(pk=self.cliente.pk)
+        cliente.telefone = "(11)98888-8888"
+        comandos = self._comandos(cliente.save)
+        self.assertEqual(len(comandos), 1)
+        self.assertIn('"telefone"', comandos[0])
+        self.assertNotIn('"saldo"', comandos[0])
+
+        # Sem alterações, nada é executado
+        self.assertEqual(self._comandos(cliente.save), [])
+
+    def test_negar_credito_sem_reler_a_solicitacao(self):
+        """Mudar o status não relê a linha antes de salvar"""
+        solicitacao = SolicitacaoCredito.objects.get(pk=self.solicitacao.pk)
+        solicitacao.status = "negado"
+        comandos = self._comandos(solicitacao.save)
+        self.assertEqual(len(comandos), 1)
+        self.assertTrue(comandos[0].startswith("UPDATE"))
+
+    def test_troca_de_email_atualiza_credencial(self):
+        """A credencial só é sincronizada quando e-mail, senha ou perfil mudam"""
+        cliente = Cliente.objects.get(pk=self.cliente.pk)
+        cliente.email = "novo@teste.com"
+        self.assertEqual(len(self._comandos(cliente.save)), 2)
+        self.assertTrue(Credencial.objects.filter(email="novo@teste.com", cliente=cliente).exists())
+
+
 """Model - Transferencia"""
 class TransferenciaModelTest(TestCase):
     def setUp(self):
@@ -232,7 +457,7 @@ class TransferenciaModelTest(TestCase):
             nome="Carlos Gerente",
             cpf="111.222.333-44",
             email="carlos@example.com",
-            telefone="(11) 90000-0000",
+            telefone="(11)90000-0000",
             matricula="G001",
             data_admissao=date(2020, 5, 10),
             data_de_nascimento=date(1980, 2, 15),
@@ -249,7 +474,7 @@ class TransferenciaModelTest(TestCase):
             email="joao@example.com",
             password="senha123",
             data_de_nascimento=date(1990, 1, 1),
-            telefone="(11) 99999-9999",
+            telefone="(11)99999-9999",
             saldo=Decimal("1000.00"),
             tipo_de_conta="corrente",
             status_conta="ativa",
@@ -262,7 +487,7 @@ class TransferenciaModelTest(TestCase):
             email="maria@example.com",
             password="senha456",
             data_de_nascimento=date(1995, 5, 5),
-            telefone="(11) 98888-8888",
+            telefone="(11)98888-8888",
             saldo=Decimal("500.00"),
             tipo_de_conta="corrente",
             status_conta="ativa",
@@ -283,6 +508,14 @@ class TransferenciaModelTest(TestCase):
         self.assertEqual(self.cliente1.saldo, Decimal("800.00"))
         self.assertEqual(self.cliente2.saldo, Decimal("700.00"))
 
+    def test_transferencia_com_fracao_de_centavo_e_recusada(self):
+        """Valores com mais de duas casas decimais não movimentam saldo"""
+        with self.assertRaises(ValidationError):
+            Transferencia.objects.create(remetente=self.cliente1, destinatario=self.cliente2, valor=Decimal("0.004"))
+        self.cliente1.refresh_from_db()
+        self.assertEqual(self.cliente1.saldo, Decimal("1000.00"))
+        self.assertFalse(Transferencia.objects.exists())
+
     def test_transferencia_para_si_mesmo_lanca_erro(self):
         """Impede que o cliente envie transferência para si mesmo"""
         transferencia = Transferencia(
@@ -325,6 +558,977 @@ class TransferenciaModelTest(TestCase):
             "Transferência de joao para maria - R$ 100.00"
         )
 
+    def test_transferencia_com_instancia_desatualizada_nao_gera_saldo_negativo(self):
+        """O débito é condicional no banco, mesmo com o saldo em memória desatualizado"""
+        copia_antiga = Cliente.objects.get(pk=self.cliente1.pk)
+        Transferencia.objects.create(
+            remetente=self.cliente1,
+            destinatario=self.cliente2,
+            valor=Decimal("800.00"),
+        )
+
+        with self.assertRaises(ValidationError):
+            Transferencia.objects.create(
+                remetente=copia_antiga,
+                destinatario=self.cliente2,
+                valor=Decimal("800.00"),
+            )
+
+        self.cliente1.refresh_from_db()
+        self.assertEqual(self.cliente1.saldo, Decimal("200.00"))
+        self.assertEqual(Transferencia.objects.count(), 1)
+
+    def test_transferencia_usa_updates_atomicos(self):
+        """Débito, crédito, inserção, leitura dos saldos e lançamentos no razão"""
+        with CaptureQueriesContext(connection) as ctx:
+            Transferencia.objects.create(
+                remetente=self.cliente1,
+                destinatario=self.cliente2,
+                valor=Decimal("50.00"),
+            )
+        comandos = [q["sql"] for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]]
+        # Mais o SELECT ... FOR UPDATE das duas contas onde o banco suporta
+        self.assertEqual(len(comandos), 5 + connection.features.has_select_for_update)
+
+    def test_saldo_negativo_bloqueado_pelo_banco(self):
+        """A constraint impede saldo negativo mesmo fora da transferência"""
+        with self.assertRaises(IntegrityError):
+            Cliente.objects.filter(pk=self.cliente1.pk).update(saldo=Decimal("-1.00"))
+
+"""Transferências em lote"""
+class TransferenciaLoteTest(TestCase):
+    def setUp(self):
+        self.clientes = [
+            Cliente.objects.create(
+                cpf=f"{i}{i}{i}.000.000-00",
+                username=f"cliente{i}",
+                email=f"cliente{i}@example.com",
+                password="senha123",
+                data_de_nascimento=date(1990, 1, 1),
+                telefone="(11)99999-9999",
+                saldo=Decimal("100.00"),
+                tipo_de_conta="corrente",
+            )
+            for i in range(1, 4)
+        ]
+
+    def test_lote_aplica_saldos_e_reporta_por_linha(self):
+        """Linhas válidas são aplicadas e as inválidas reportadas sem afetar o lote"""
+        a, b, c = self.clientes
+        resultados = processar_lote([
+            {"remetente": a.cpf, "destinatario": b.cpf, "valor": "60.00"},
+            {"remetente": a.cpf, "destinatario": c.cpf, "valor": "60.00"},  # sem saldo após a 1ª
+            {"remetente": b.cpf, "destinatario": c.cpf, "valor": "160.00"},  # usa o crédito da 1ª
+            {"remetente": a.cpf, "destinatario": "000.000.000-00", "valor": "1.00"},
+            {"remetente": a.cpf, "destinatario": b.cpf, "valor": "abc"},
+            {"remetente": a.cpf, "destinatario": b.cpf, "valor": "0.004"},
+        ])
+
+        self.assertEqual([r["status"] for r in resultados], ["ok", "erro", "ok", "erro", "erro", "erro"])
+        self.assertEqual(resultados[5]["mensagem"], "Valor inválido.")
+        for cliente in self.clientes:
+            cliente.refresh_from_db()
+        self.assertEqual(a.saldo, Decimal("40.00"))
+        self.assertEqual(b.saldo, Decimal("0.00"))
+        self.assertEqual(c.saldo, Decimal("260.00"))
+        self.assertEqual(Transferencia.objects.count(), 2)
+
+    def test_lote_soma_deltas_sem_perder_escrita_concorrente(self):
+        """Um crédito gravado depois da leitura do lote não é sobrescrito e o razão termina no saldo real"""
+        a, b, _ = self.clientes
+
+        def transferencia_com_credito_concorrente(*args, **kwargs):
+            Cliente.objects.filter(pk=a.pk).update(saldo=F("saldo") + 30)
+            return Transferencia(*args, **kwargs)
+
+        with mock.patch("users.transferencias.Transferencia", wraps=Transferencia) as classe:
+            classe.side_effect = transferencia_com_credito_concorrente
+            resultados = processar_lote([{"remetente": a.cpf, "destinatario": b.cpf, "valor": "10.00"}])
+
+        self.assertEqual(resultados[0]["status"], "ok")
+        a.refresh_from_db()
+        self.assertEqual(a.saldo, Decimal("120.00"))
+        self.assertEqual(LancamentoContabil.saldo_em(a, timezone.now()), Decimal("120.00"))
+
+    def test_banco_ocupado_vira_relatorio(self):
+        """Trava do SQLite durante o lote: as linhas são recusadas em vez de um erro 500"""
+        a, b, _ = self.clientes
+        with mock.patch.object(LancamentoContabil.objects, "bulk_create",
+                               side_effect=OperationalError("database is locked")):
+            resultados = processar_lote([{"remetente": a.cpf, "destinatario": b.cpf, "valor": "10.00"}])
+        self.assertEqual(resultados[0]["status"], "erro")
+        self.assertIn("banco ocupado", resultados[0]["mensagem"])
+        a.refresh_from_db()
+        self.assertEqual(a.saldo, Decimal("100.00"))
+
+    def test_lote_usa_numero_fixo_de_consultas(self):
+        """O custo em consultas não cresce com o tamanho do lote"""
+        a, b, c = self.clientes
+        linhas = [{"remetente": a.cpf, "destinatario": b.cpf, "valor": "0.01"}] * 50
+        linhas += [{"remetente": b.cpf, "destinatario": c.cpf, "valor": "0.01"}] * 50
+
+        with CaptureQueriesContext(connection) as ctx:
+            processar_lote(linhas)
+        comandos = [q["sql"] for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]]
+        # SELECT dos CPFs, UPDATE dos saldos, releitura e bulk_create das transferências e lançamentos,
+        # que o backend pode quebrar em poucos comandos — nunca um por linha
+        self.assertLess(len(comandos), 10)
+
+    def test_view_lote_json(self):
+        """O endpoint usa o cliente logado como remetente e devolve o relatório"""
+        a, b, _ = self.clientes
+        session = self.client.session
+        session["user_id"] = a.id
+        session["admUser"] = False
+        session.save()
+
+        resp = self.client.post(
+            reverse("users:transferencia_lote"),
+            data=json.dumps([{"destinatario": b.cpf, "valor": "10.00"}]),
+            content_type="application/json",
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["sucesso"], 1)
+        b.refresh_from_db()
+        self.assertEqual(b.saldo, Decimal("110.00"))
+
+"""Extrato"""
+class ExtratoTest(TestCase):
+    def setUp(self):
+        self.cliente = Cliente.objects.create(
+            cpf="111.111.111-11",
+            username="titular",
+            email="titular@example.com",
+            password="senha123",
+            data_de_nascimento=date(1990, 1, 1),
+            telefone="(11)99999-9999",
+            saldo=Decimal("1000.00"),
+            tipo_de_conta="corrente",
+        )
+        self.outro = Cliente.objects.create(
+            cpf="222.222.222-22",
+            username="outro",
+            email="outro@example.com",
+            password="senha123",
+            data_de_nascimento=date(1990, 1, 1),
+            telefone="(11)99999-9999",
+            saldo=Decimal("1000.00"),
+            tipo_de_conta="corrente",
+        )
+        # Mesma data em todas para exercitar o desempate pelo id
+        data = timezone.now()
+        for i in range(1, 6):
+            Transferencia.objects.create(remetente=self.cliente, destinatario=self.outro,
+                                         valor=Decimal(i), data_transferencia=data)
+            Transferencia.objects.create(remetente=self.outro, destinatario=self.cliente,
+                                         valor=Decimal(i * 10), data_transferencia=data)
+
+    def test_paginacao_por_cursor_percorre_tudo_sem_repetir(self):
+        """Cada lançamento aparece uma única vez, do mais recente para o mais antigo"""
+        vistos = []
+        params = {}
+        while True:
+            pagina, cursor = pagina_extrato(self.cliente, params, por_pagina=3)
+            vistos.extend(t.pk for t in pagina)
+            if not cursor:
+                break
+            params = {"cursor": cursor}
+
+        esperados = LancamentoContabil.objects.filter(cliente=self.cliente, conta="saldo")
+        self.assertEqual(vistos, sorted(esperados.values_list("pk", flat=True), reverse=True))
+        self.assertEqual(len(vistos), 11)  # abertura + 10 transferências
+
+    def test_filtro_por_valor(self):
+        """Os filtros de valor são aplicados no banco"""
+        pagina, _ = pagina_extrato(self.cliente, {"valor_min": "5", "valor_max": "20"})
+        self.assertEqual(sorted(t.valor for t in pagina), [Decimal("5"), Decimal("10"), Decimal("20")])
+
+    def test_consultas_nao_dependem_do_historico(self):
+        """A view faz o mesmo número de consultas independentemente da quantidade de linhas"""
+        session = self.client.session
+        session["user_id"] = self.cliente.id
+        session["admUser"] = False
+        session.save()
+
+        # A primeira requisição do processo aqueceria o catálogo de cartões na medição
+        catalogo.aquecer()
+        with CaptureQueriesContext(connection) as antes:
+            self.client.get(reverse("users:extrato"))
+        for i in range(20):
+            Transferencia.objects.create(remetente=self.outro, destinatario=self.cliente, valor=Decimal("1"))
+        with CaptureQueriesContext(connection) as depois:
+            resp = self.client.get(reverse("users:extrato"))
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(antes.captured_queries), len(depois.captured_queries))
+
+    def _logar(self, usuario, admUser=False):
+        session = self.client.session
+        session["user_id"] = usuario.id
+        session["admUser"] = admUser
+        session.save()
+
+    def test_exportar_csv_em_streaming(self):
+        """O CSV sai em streaming, da transferência mais antiga para a mais recente, com o sinal do cliente"""
+        self._logar(self.cliente)
+        resp = self.client.get(reverse("users:exportar_extrato", args=["csv"]))
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        self.assertIn("attachment", resp["Content-Disposition"])
+
+        linhas = b"".join(resp.streaming_content).decode().splitlines()
+        self.assertEqual(linhas[0], "data,id,tipo,contraparte,conta_contraparte,valor,status")
+        self.assertEqual(len(linhas), 11)
+        valores = [Decimal(l.split(",")[5]) for l in linhas[1:]]
+        self.assertEqual(valores[:2], [Decimal("-1"), Decimal("10")])
+        self.assertEqual(sum(valores), Decimal("135"))
+
+    async def test_exportar_em_streaming_pelo_asgi(self):
+        """Pelo ASGI a resposta usa um iterador assíncrono e sai em blocos, sem montar o arquivo inteiro"""
+        await sync_to_async(self._logar)(self.cliente)
+        self.async_client.cookies = self.client.cookies
+        with mock.patch("users.exportacao.TAMANHO_DO_BLOCO", 4):
+            resp = await self.async_client.get(reverse("users:exportar_extrato", args=["csv"]))
+            self.assertTrue(resp.streaming)
+            self.assertTrue(resp.is_async)
+            blocos = [bloco async for bloco in resp.streaming_content]
+
+        self.assertEqual(len(blocos), 3)  # cabeçalho + 10 linhas, 4 por bloco
+        linhas = b"".join(blocos).decode().splitlines()
+        self.assertEqual(linhas[0], "data,id,tipo,contraparte,conta_contraparte,valor,status")
+        self.assertEqual(len(linhas), 11)
+
+    def test_exportar_filtra_por_periodo(self):
+        antiga = Transferencia.objects.create(
+            remetente=self.outro, destinatario=self.cliente, valor=Decimal("7"),
+            data_transferencia=timezone.now() - timedelta(days=400),
+        )
+        self._logar(self.cliente)
+        fim = (timezone.localdate() - timedelta(days=300)).isoformat()
+        resp = self.client.get(reverse("users:exportar_extrato", args=["csv"]), {"fim": fim})
+        linhas = b"".join(resp.streaming_content).decode().splitlines()
+        self.assertEqual(len(linhas), 2)
+        self.assertEqual(linhas[1].split(",")[1], str(antiga.pk))
+
+    def test_exportar_ofx(self):
+        self._logar(self.cliente)
+        resp = self.client.get(reverse("users:exportar_extrato", args=["ofx"]))
+        conteudo = b"".join(resp.streaming_content).decode()
+        self.assertTrue(conteudo.startswith("OFXHEADER:100"))
+        self.assertEqual(conteudo.count("<STMTTRN>"), 10)
+        self.assertEqual(conteudo.count("<TRNTYPE>DEBIT"), 5)
+        self.cliente.refresh_from_db()
+        self.assertIn(f"<BALAMT>{self.cliente.saldo}", conteudo)
+        self.assertEqual(self.client.get(reverse("users:exportar_extrato", args=["pdf"])).status_code, 404)
+
+    def test_gerente_exporta_so_os_proprios_clientes(self):
+        gerente = Gerente.objects.create(
+            nome="Auditor", cpf="333.333.333-33", email="auditor@example.com", telefone="(11)99999-9999",
+            matricula="AUD1", data_admissao=date(2020, 1, 1), data_de_nascimento=date(1980, 1, 1),
+            salario=Decimal("5000.00"), password="senha123",
+        )
+        Cliente.objects.filter(pk=self.cliente.pk).update(gerente_responsavel=gerente)
+        self._logar(gerente, admUser=True)
+        url = reverse("users:exportar_extrato_cliente", args=[self.cliente.pk, "csv"])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        url = reverse("users:exportar_extrato_cliente", args=[self.outro.pk, "csv"])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class SaldoMensalTest(TestCase):
+    def setUp(self):
+        self.cliente = Cliente.objects.create(
+            cpf="444.444.444-44", username="mensal", email="mensal@example.com", password="senha123",
+            data_de_nascimento=date(1990, 1, 1), telefone="(11)99999-9999", tipo_de_conta="corrente",
+        )
+        # Histórico de três meses atrás até o mês corrente: +100 por mês e -30 no mês passado
+        self.meses = [inicio_do_mes(timezone.localdate())]
+        for _ in range(3):
+            self.meses.insert(0, mes_anterior(self.meses[0]))
+        Cliente.objects.filter(pk=self.cliente.pk).update(data_de_cadastro=limites_do_mes(self.meses[0])[0])
+        saldo = Decimal("0")
+        lancamentos = []
+        for mes in self.meses:
+            inicio, _ = limites_do_mes(mes)
+            saldo += 100
+            lancamentos.append(LancamentoContabil(
+                cliente=self.cliente, origem="ajuste", tipo="credito", valor=Decimal("100"),
+                saldo_apos=saldo, created_at=inicio + timedelta(days=1),
+            ))
+        lancamentos.append(LancamentoContabil(
+            cliente=self.cliente, origem="ajuste", tipo="debito", valor=Decimal("30"),
+            saldo_apos=Decimal("270"), created_at=limites_do_mes(self.meses[2])[0] + timedelta(days=2),
+        ))
+        LancamentoContabil.objects.bulk_create(lancamentos)
+        Cliente.objects.filter(pk=self.cliente.pk).update(saldo=Decimal("370"))
+
+    def test_fechamento_incremental(self):
+        """Fecha só os meses completos, com saldos iguais ao razão, e não repete fechamentos"""
+        self.assertEqual(meses_a_fechar(), self.meses[:3])
+        for mes in meses_a_fechar():
+            self.assertEqual(fechar_mes(mes, lote=1), 1)
+        self.assertEqual(meses_a_fechar(), [])
+        self.assertEqual(fechar_mes(self.meses[0]), 0)
+
+        fechamentos = list(SaldoMensal.objects.filter(cliente=self.cliente).order_by("mes"))
+        self.assertEqual([f.saldo_final for f in fechamentos], [Decimal("100"), Decimal("200"), Decimal("270")])
+        self.assertEqual(fechamentos[2].saldo_inicial, Decimal("200"))
+        self.assertEqual(fechamentos[2].total_saidas, Decimal("30"))
+        self.assertEqual(fechamentos[2].quantidade_lancamentos, 2)
+        for f in fechamentos:
+            _, fim = limites_do_mes(f.mes)
+            self.assertEqual(f.saldo_final, LancamentoContabil.saldo_em(self.cliente, fim - timedelta(microseconds=1)))
+
+    def test_resumo_usa_fechamentos_e_soma_o_mes_aberto(self):
+        """Com ou sem fechamento o resumo é o mesmo; com fechamento ele não agrega os meses fechados"""
+        self.cliente.refresh_from_db()
+        sem_fechamento = resumo_mensal(self.cliente)
+        self.assertEqual([m["mes"] for m in sem_fechamento], list(reversed(self.meses)))
+        self.assertEqual(sem_fechamento[0]["saldo_final"], self.cliente.saldo)
+
+        call_command("fechar_mes", stdout=StringIO())
+        LancamentoContabil.objects.filter(created_at__lt=limites_do_mes(self.meses[3])[0]).delete()
+        com_fechamento = resumo_mensal(self.cliente)
+        self.assertEqual(com_fechamento, sem_fechamento)
+
+"""Model - LancamentoContabil"""
+class LancamentoContabilTest(TestCase):
+    def setUp(self):
+        self.gerente = Gerente.objects.create(
+            nome="Carlos Gerente",
+            cpf="111.222.333-44",
+            email="carlos@example.com",
+            telefone="(11)90000-0000",
+            matricula="G001",
+            data_admissao=date(2020, 5, 10),
+            data_de_nascimento=date(1980, 2, 15),
+            salario=Decimal("10000.00"),
+            password="senha123",
+        )
+        self.cliente1 = Cliente.objects.create(
+            gerente_responsavel=self.gerente,
+            cpf="999.888.777-66",
+            username="joao",
+            email="joao@example.com",
+            password="senha123",
+            data_de_nascimento=date(1990, 1, 1),
+            telefone="(11)99999-9999",
+            saldo=Decimal("1000.00"),
+            tipo_de_conta="corrente",
+        )
+        self.cliente2 = Cliente.objects.create(
+            gerente_responsavel=self.gerente,
+            cpf="555.444.333-22",
+            username="maria",
+            email="maria@example.com",
+            password="senha456",
+            data_de_nascimento=date(1995, 5, 5),
+            telefone="(11)98888-8888",
+            saldo=Decimal("500.00"),
+            tipo_de_conta="corrente",
+        )
+
+    def test_transferencia_gera_lancamentos_com_saldo_resultante(self):
+        """Débito e crédito ficam no razão com o saldo após cada lançamento"""
+        Transferencia.objects.create(remetente=self.cliente1, destinatario=self.cliente2, valor=Decimal("200.00"))
+
+        debito = LancamentoContabil.objects.get(cliente=self.cliente1, origem="transferencia")
+        credito = LancamentoContabil.objects.get(cliente=self.cliente2, origem="transferencia")
+        self.assertEqual((debito.tipo, debito.saldo_apos), ("debito", Decimal("800.00")))
+        self.assertEqual((credito.tipo, credito.saldo_apos), ("credito", Decimal("700.00")))
+
+    def test_saldo_em_data_passada(self):
+        """O saldo em um instante é o saldo_apos do último lançamento até ele"""
+        antes = timezone.now()
+        Transferencia.objects.create(remetente=self.cliente1, destinatario=self.cliente2, valor=Decimal("200.00"))
+
+        self.assertEqual(LancamentoContabil.saldo_em(self.cliente1, antes), Decimal("1000.00"))
+        self.assertEqual(LancamentoContabil.saldo_em(self.cliente1, timezone.now()), Decimal("800.00"))
+
+    def test_aprovacao_de_credito_gera_lancamento(self):
+        """Créditos aprovados entram no razão de créditos"""
+        solicitacao = SolicitacaoCredito.objects.create(
+            cliente=self.cliente1, gerente=self.gerente, valor=Decimal("300.00"), motivo="Teste"
+        )
+        solicitacao.status = "aprovado"
+        solicitacao.save()
+
+        lancamento = LancamentoContabil.objects.get(cliente=self.cliente1, conta="creditos")
+        self.assertEqual(lancamento.saldo_apos, Decimal("300.00"))
+
+    def test_ajuste_do_gerente_gera_lancamento(self):
+        """Alterar o saldo na tela do gerente registra a diferença no razão"""
+        session = self.client.session
+        session["user_id"] = self.gerente.id
+        session["admUser"] = True
+        session.save()
+
+        self.client.post(reverse("users:cliente_detalhes", args=[self.cliente1.id]), {
+            "username": "joao",
+            "cpf": self.cliente1.cpf,
+            "email": self.cliente1.email,
+            "telefone": self.cliente1.telefone,
+            "tipo_de_conta": "corrente",
+            "status_conta": "ativa",
+            "saldo": "900.00",
+        })
+
+        ajuste = LancamentoContabil.objects.get(cliente=self.cliente1, origem="ajuste")
+        self.assertEqual((ajuste.tipo, ajuste.valor, ajuste.saldo_apos), ("debito", Decimal("100.00"), Decimal("900.00")))
+
+    def test_ajuste_usa_o_saldo_lido_com_trava(self):
+        """Uma transferência entre a leitura da página e o save não gera ajuste fantasma"""
+        session = self.client.session
+        session["user_id"] = self.gerente.id
+        session["admUser"] = True
+        session.save()
+
+        filtro = Credencial.objects.filter
+
+        def filtro_com_transferencia(*args, **kwargs):
+            # Crédito concorrente depois do carregamento inicial do cliente
+            Cliente.objects.filter(pk=self.cliente1.pk).update(saldo=F("saldo") + 30)
+            return filtro(*args, **kwargs)
+
+        with mock.patch.object(Credencial.objects, "filter", side_effect=filtro_com_transferencia):
+            self.client.post(reverse("users:cliente_detalhes", args=[self.cliente1.id]), {
+                "username": "joao renomeado", "cpf": self.cliente1.cpf, "email": self.cliente1.email,
+                "telefone": self.cliente1.telefone, "tipo_de_conta": "corrente", "status_conta": "ativa",
+                "saldo": "1000.00",
+            })
+
+        self.cliente1.refresh_from_db()
+        self.assertEqual(self.cliente1.username, "joao renomeado")
+        self.assertEqual(LancamentoContabil.saldo_em(self.cliente1, timezone.now()), self.cliente1.saldo)
+
+    def test_ajuste_com_saldo_invalido_e_recusado(self):
+        """Saldo negativo ou NaN mostra uma mensagem em vez de quebrar a página"""
+        session = self.client.session
+        session["user_id"] = self.gerente.id
+        session["admUser"] = True
+        session.save()
+
+        for saldo in ("-5", "NaN", "1.005"):
+            resp = self.client.post(reverse("users:cliente_detalhes", args=[self.cliente1.id]), {
+                "username": "joao", "cpf": self.cliente1.cpf, "email": self.cliente1.email,
+                "telefone": self.cliente1.telefone, "tipo_de_conta": "corrente", "status_conta": "ativa",
+                "saldo": saldo,
+            }, follow=True)
+            self.assertContains(resp, "Saldo inválido.")
+        self.cliente1.refresh_from_db()
+        self.assertEqual(self.cliente1.saldo, Decimal("1000.00"))
+        self.assertFalse(LancamentoContabil.objects.filter(origem="ajuste").exists())
+
+    def test_email_de_outro_usuario_e_recusado(self):
+        """Usar o e-mail de um gerente ou de outro cliente mostra uma mensagem em vez de erro 500"""
+        session = self.client.session
+        session["user_id"] = self.gerente.id
+        session["admUser"] = True
+        session.save()
+
+        for email in (self.gerente.email, self.cliente2.email):
+            resp = self.client.post(reverse("users:cliente_detalhes", args=[self.cliente1.id]), {
+                "username": "joao", "cpf": self.cliente1.cpf, "email": email,
+                "telefone": self.cliente1.telefone, "tipo_de_conta": "corrente", "status_conta": "ativa",
+                "saldo": "1000.00",
+            }, follow=True)
+            self.assertContains(resp, "Este e-mail já está cadastrado!")
+        self.cliente1.refresh_from_db()
+        self.assertEqual(self.cliente1.email, "joao@example.com")
+
+    def test_admin_do_razao_e_somente_leitura(self):
+        """No admin os lançamentos podem ser vistos, mas não criados, alterados ou apagados"""
+        from django.contrib.auth.models import User
+
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "senha123"))
+        lancamento = LancamentoContabil.objects.filter(cliente=self.cliente1).first()
+        alterar = reverse("admin:users_lancamentocontabil_change", args=[lancamento.pk])
+        apagar = reverse("admin:users_lancamentocontabil_delete", args=[lancamento.pk])
+
+        self.assertEqual(self.client.get(reverse("admin:users_lancamentocontabil_changelist")).status_code, 200)
+        self.assertEqual(self.client.get(alterar).status_code, 200)
+        self.assertEqual(self.client.post(alterar, {"valor": "1.00"}).status_code, 403)
+        self.assertEqual(self.client.post(apagar, {"post": "yes"}).status_code, 403)
+        self.assertEqual(self.client.get(reverse("admin:users_lancamentocontabil_add")).status_code, 403)
+        self.assertTrue(LancamentoContabil.objects.filter(pk=lancamento.pk).exists())
+
+    def test_lancamento_nao_pode_ser_alterado(self):
+        """O razão é somente de inclusão"""
+        lancamento = LancamentoContabil.objects.filter(cliente=self.cliente1).first()
+        lancamento.valor = Decimal("1.00")
+        with self.assertRaises(ValidationError):
+            lancamento.save()
+
+"""Painel do gerente"""
+class PainelGerenteTest(TestCase):
+    def setUp(self):
+        self.gerente = Gerente.objects.create(
+            nome="Gerente Painel",
+            cpf="111.111.111-11",
+            email="painel@teste.com",
+            telefone="(11)99999-9999",
+            matricula="G010",
+            data_admissao=date(2020, 1, 1),
+            data_de_nascimento=date(1980, 1, 1),
+            salario=Decimal("10000.00"),
+            password="senha123",
+        )
+        status = ["ativa"] * 30 + ["inativa"] * 2 + ["bloqueada"]
+        Cliente.objects.bulk_create([
+            Cliente(
+                gerente_responsavel=self.gerente,
+                numero_da_conta=f"{i:08d}",
+                cpf=f"{i:03d}.000.000-00",
+                username=f"cliente{i:02d}",
+                email=f"cliente{i}@teste.com",
+                password="senha123",
+                data_de_nascimento=date(1990, 1, 1),
+                telefone="(11)99999-9999",
+                saldo=Decimal("10.00"),
+                tipo_de_conta="corrente",
+                status_conta=s,
+            )
+            for i, s in enumerate(status)
+        ])
+        session = self.client.session
+        session["user_id"] = self.gerente.id
+        session["admUser"] = True
+        session.save()
+
+    def test_resumo_calculado_em_uma_consulta(self):
+        """Contagens e saldo total vêm de um único aggregate"""
+        resp = self.client.get(reverse("users:perfil"))
+        self.assertEqual(resp.context["resumo"]["total"], 33)
+        self.assertEqual(resp.context["resumo"]["ativos"], 30)
+        self.assertEqual(resp.context["resumo"]["inativos"], 2)
+        self.assertEqual(resp.context["resumo"]["bloqueados"], 1)
+        self.assertEqual(resp.context["saldo_total"], Decimal("300.00"))
+
+    def test_tabelas_paginadas(self):
+        """Cada tabela traz apenas uma página de clientes"""
+        resp = self.client.get(reverse("users:perfil"))
+        self.assertEqual(len(resp.context["clientes_ativos"]["itens"]), 25)
+        self.assertEqual(resp.context["clientes_ativos"]["total_paginas"], 2)
+
+        resp = self.client.get(reverse("users:perfil"), {"pagina_ativos": 2})
+        self.assertEqual(len(resp.context["clientes_ativos"]["itens"]), 5)
+
+    def test_consultas_nao_dependem_da_carteira(self):
+        """O número de consultas do painel é o mesmo com poucos ou muitos clientes"""
+        # Primeira visita carrega o gerente logado para o cache
+        self.client.get(reverse("users:perfil"))
+        with CaptureQueriesContext(connection) as antes:
+            self.client.get(reverse("users:perfil"))
+        Cliente.objects.bulk_create([
+            Cliente(
+                gerente_responsavel=self.gerente,
+                numero_da_conta=f"9{i:07d}",
+                cpf=f"{i:03d}.999.999-99",
+                username=f"extra{i:03d}",
+                email=f"extra{i}@teste.com",
+                password="senha123",
+                data_de_nascimento=date(1990, 1, 1),
+                telefone="(11)99999-9999",
+                tipo_de_conta="corrente",
+                status_conta="ativa",
+            )
+            for i in range(100)
+        ])
+        with CaptureQueriesContext(connection) as depois:
+            self.client.get(reverse("users:perfil"))
+        self.assertEqual(len(antes.captured_queries), len(depois.captured_queries))
+
+"""Cache das páginas do cliente"""
+class CachePaginasClienteTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.cliente = Cliente.objects.create(
+            cpf="111.111.111-11",
+            username="titular",
+            email="titular@example.com",
+            password="senha123",
+            data_de_nascimento=date(1990, 1, 1),
+            telefone="(11)99999-9999",
+            saldo=Decimal("1000.00"),
+            tipo_de_conta="corrente",
+        )
+        self.outro = Cliente.objects.create(
+            cpf="222.222.222-22",
+            username="outro",
+            email="outro@example.com",
+            password="senha123",
+            data_de_nascimento=date(1990, 1, 1),
+            telefone="(11)99999-9999",
+            saldo=Decimal("1000.00"),
+            tipo_de_conta="corrente",
+        )
+        session = self.client.session
+        session["user_id"] = self.cliente.id
+        session["admUser"] = False
+        session.save()
+
+    def _consultas_da_aplicacao(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        return [q["sql"] for q in ctx.captured_queries if "django_session" not in q["sql"]]
+
+    def test_visitas_repetidas_nao_consultam_o_banco(self):
+        """A partir da segunda visita, as páginas vêm do cache da conta"""
+        for nome in ("users:perfil", "users:meus_cartoes", "users:listar_cartoes", "users:extrato"):
+            self.assertTrue(self._consultas_da_aplicacao(reverse(nome)))
+            self.assertEqual(self._consultas_da_aplicacao(reverse(nome)), [])
+
+    def test_transferencia_invalida_o_cache(self):
+        """Uma movimentação muda a versão da conta e a página é refeita"""
+        self.client.get(reverse("users:perfil"))
+        Transferencia.objects.create(remetente=self.outro, destinatario=self.cliente, valor=Decimal("50.00"))
+
+        resp = self.client.get(reverse("users:perfil"))
+        self.assertEqual(resp.context["user"].saldo, Decimal("1050.00"))
+
+    def test_cache_por_processo_com_varios_workers_fica_desligado(self):
+        """Sem cache compartilhado entre processos, a página é sempre montada do banco"""
+        with self.settings(CACHE_CONTAS_ATIVO=False):
+            self.client.get(reverse("users:perfil"))
+            # Alteração feita "em outro processo": nenhuma versão muda aqui
+            Cliente.objects.filter(pk=self.cliente.pk).update(saldo=Decimal("1234.00"))
+            resp = self.client.get(reverse("users:perfil"))
+        self.assertEqual(resp.context["user"].saldo, Decimal("1234.00"))
+
+"""Usuário logado por requisição"""
+class PrincipalTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.gerente = Gerente.objects.create(
+            nome="Gerente", cpf="777.000.000-00", email="principal@odinbank.com",
+            telefone="(11)90000-0000", matricula="P01", data_admissao=date(2020, 1, 1),
+            data_de_nascimento=date(1980, 1, 1), salario=Decimal("1.00"), password="senha123",
+        )
+        self.cliente = Cliente.objects.create(
+            gerente_responsavel=self.gerente, cpf="777.111.111-11", username="logado",
+            email="logado@teste.com", password="senha123", data_de_nascimento=date(1990, 1, 1),
+            telefone="(11)99999-9999", saldo=Decimal("100.00"), tipo_de_conta="corrente",
+        )
+
+    def _entrar(self, usuario, admUser):
+        session = self.client.session
+        session["user_id"] = usuario.id
+        session["admUser"] = admUser
+        session.save()
+
+    def _buscas_de_usuario(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        tabelas = ('"users_cliente"', '"users_gerente"')
+        return resp, [q["sql"] for q in ctx.captured_queries
+                      if q["sql"].startswith("SELECT") and any(f'FROM {t}' in q["sql"] for t in tabelas)]
+
+    def test_usuario_buscado_no_maximo_uma_vez(self):
+        """Cada requisição faz no máximo uma busca do usuário; as seguintes vêm do cache"""
+        self._entrar(self.cliente, False)
+        _, buscas = self._buscas_de_usuario(reverse("users:transferencia"))
+        self.assertEqual(len(buscas), 1)
+        _, buscas = self._buscas_de_usuario(reverse("users:transferencia"))
+        self.assertEqual(buscas, [])
+
+    def test_cliente_alterado_nao_fica_desatualizado(self):
+        """Alterar a conta descarta o cliente guardado em cache"""
+        self._entrar(self.cliente, False)
+        self.client.get(reverse("users:transferencia"))
+        self.cliente.username = "renomeado"
+        self.cliente.save()
+        resp = self.client.get(reverse("users:transferencia"))
+        self.assertEqual(resp.context["user"].username, "renomeado")
+
+    def test_decorators_bloqueiam_perfil_errado(self):
+        """Páginas de cliente recusam gerentes e vice-versa"""
+        self._entrar(self.gerente, True)
+        self.assertRedirects(self.client.get(reverse("users:extrato")), reverse("users:perfil"),
+                             fetch_redirect_response=False)
+        resp = self.client.post(reverse("users:transferencia_lote"), "[]", content_type="application/json")
+        self.assertEqual(resp.status_code, 403)
+
+        self._entrar(self.cliente, False)
+        self.assertRedirects(self.client.get(reverse("users:solicitacoes_cartoes")), reverse("users:login"))
+        self.assertRedirects(self.client.get(reverse("users:lista_solicitacoes_gerente")), reverse("users:login"))
+
+    def test_sem_login_redireciona(self):
+        self.assertRedirects(self.client.get(reverse("users:meus_cartoes")), reverse("users:login"))
+        resp = self.client.post(reverse("users:transferencia_lote"), "[]", content_type="application/json")
+        self.assertEqual(resp.status_code, 401)
+
+    def test_gerente_so_responde_as_proprias_solicitacoes(self):
+        """Responder solicitação de crédito exige ser o gerente dela"""
+        outro = Gerente.objects.create(
+            nome="Outro", cpf="777.000.000-01", email="outro.principal@odinbank.com",
+            telefone="(11)90000-0000", matricula="P02", data_admissao=date(2020, 1, 1),
+            data_de_nascimento=date(1980, 1, 1), salario=Decimal("1.00"), password="senha123",
+        )
+        solicitacao = SolicitacaoCredito.objects.create(
+            cliente=self.cliente, gerente=self.gerente, valor=Decimal("10.00"), motivo="Teste"
+        )
+        self._entrar(outro, True)
+        resp = self.client.post(reverse("users:responder_solicitacao", args=[solicitacao.id]), {"acao": "aprovar"})
+        self.assertEqual(resp.status_code, 404)
+
+
+"""Modos de sessão"""
+class SessoesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        Cliente.objects.create(
+            cpf="888.111.111-11", username="sessao", email="sessao@teste.com",
+            password=make_password("123"), data_de_nascimento=date(1990, 1, 1),
+            telefone="(11)99999-9999", tipo_de_conta="corrente",
+        )
+
+    def test_login_e_pagina_em_todos_os_modos(self):
+        """Login e páginas autenticadas funcionam em cada modo de sessão"""
+        for modo, engine in settings.SESSAO_MODOS.items():
+            with self.subTest(modo=modo), self.settings(SESSION_ENGINE=engine):
+                client = Client()
+                resp = client.post(reverse("users:login"), {"email": "sessao@teste.com", "password": "123"})
+                self.assertRedirects(resp, reverse("users:perfil"))
+                with CaptureQueriesContext(connection) as ctx:
+                    resp = client.get(reverse("users:perfil"))
+                self.assertEqual(resp.status_code, 200)
+                leituras = [q for q in ctx.captured_queries if "django_session" in q["sql"]]
+                self.assertEqual(len(leituras), 1 if modo == "db" else 0)
+
+    def test_limpar_sessoes_expiradas_em_lotes(self):
+        """Só as sessões expiradas são apagadas, em lotes"""
+        agora = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key=f"velha{i}", session_data="", expire_date=agora - timedelta(days=1)) for i in range(5)]
+            + [Session(session_key="valida", session_data="", expire_date=agora + timedelta(days=1))]
+        )
+        saida = StringIO()
+        call_command("limpar_sessoes", lote=2, pausa=0, stdout=saida)
+        self.assertIn("5 sessão(ões)", saida.getvalue())
+        self.assertEqual(list(Session.objects.values_list("session_key", flat=True)), ["valida"])
+
+
+"""Métricas por view"""
+class MetricasTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        registro.limpar()
+        self.cliente = Cliente.objects.create(
+            cpf="999.111.111-11", username="medido", email="medido@teste.com",
+            password="senha123", data_de_nascimento=date(1990, 1, 1),
+            telefone="(11)99999-9999", tipo_de_conta="corrente",
+        )
+        session = self.client.session
+        session["user_id"] = self.cliente.id
+        session["admUser"] = False
+        session.save()
+
+    def test_metricas_por_view(self):
+        """Requisições, latência e consultas aparecem agrupadas pelo nome da URL"""
+        self.client.get(reverse("users:extrato"))
+        self.client.get(reverse("users:extrato"))
+        texto = self.client.get(reverse("users:metricas")).content.decode()
+
+        self.assertIn('odinbank_requisicoes_total{view="users:extrato"} 2', texto)
+        self.assertIn('odinbank_latencia_segundos_count{view="users:extrato"} 2', texto)
+        self.assertIn('odinbank_latencia_segundos_bucket{view="users:extrato",le="+Inf"} 2', texto)
+        self.assertIn('odinbank_latencia_quantil_segundos{view="users:extrato",quantile="0.95"}', texto)
+        consultas = re.search(r'odinbank_sql_consultas_total\{view="users:extrato"\} (\d+)', texto)
+        self.assertGreater(int(consultas.group(1)), 0)
+
+    async def test_metricas_no_caminho_assincrono(self):
+        """Pelo ASGI o middleware também mede as consultas feitas pela view"""
+        self.async_client.cookies = self.client.cookies
+        await self.async_client.get(reverse("users:extrato"))
+        texto = (await self.async_client.get(reverse("users:metricas"))).content.decode()
+
+        self.assertIn('odinbank_requisicoes_total{view="users:extrato"} 1', texto)
+        consultas = re.search(r'odinbank_sql_consultas_total\{view="users:extrato"\} (\d+)', texto)
+        self.assertGreater(int(consultas.group(1)), 0)
+
+    def test_endpoint_so_para_ips_internos(self):
+        resp = self.client.get(reverse("users:metricas"), REMOTE_ADDR="203.0.113.5")
+        self.assertEqual(resp.status_code, 404)
+
+    def test_token_exigido_quando_configurado(self):
+        """Atrás de um proxy local o IP não basta: com METRICAS_TOKEN o cabeçalho é obrigatório"""
+        url = reverse("users:metricas")
+        with self.settings(METRICAS_TOKEN="segredo"):
+            self.assertEqual(self.client.get(url).status_code, 404)
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer outro").status_code, 404)
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer segredo").status_code, 200)
+
+    def test_requisicao_acima_do_limite_vai_para_o_log(self):
+        with self.settings(METRICAS_LIMITE_CONSULTAS=1), self.assertLogs("odinbank.metricas", "WARNING") as log:
+            self.client.get(reverse("users:extrato"))
+        self.assertIn("users:extrato", log.output[0])
+
+
+"""Benchmark"""
+class BenchTest(TestCase):
+    def test_cenarios_rodam_sem_erros(self):
+        """Todos os cenários do bench respondem sem erro sobre os dados gerados"""
+        cache.clear()
+        dados = popular_banco(gerentes=2, clientes=6, transferencias=20, solicitacoes_cartao=3)
+        resultado = medir_cenarios(dados, requisicoes=2, aquecimento=1, usuarios=2)
+        self.assertEqual(set(resultado), set(CENARIOS))
+        for nome, medida in resultado.items():
+            self.assertEqual(medida["erros"], 0, nome)
+            self.assertEqual(medida["n"], 2)
+
+    def test_comparar_aponta_regressoes(self):
+        base = {"extrato": {"p95_ms": 10.0, "consultas_por_requisicao": 2.0, "erros": 0}}
+        self.assertEqual(comparar({"extrato": {"p95_ms": 11.0, "consultas_por_requisicao": 2.0, "erros": 0}}, base), [])
+        regressoes = comparar({"extrato": {"p95_ms": 13.0, "consultas_por_requisicao": 3.0, "erros": 0}}, base)
+        self.assertEqual(len(regressoes), 2)
+
+
+class SeedTest(TestCase):
+    def test_dados_gerados_sao_consistentes(self):
+        """Saldos batem com o razão, o dinheiro só muda de conta e os cartões aprovados têm número válido"""
+        resultado = semear(escala=0.02, lote=7)
+        self.assertEqual(Gerente.objects.count(), 1)
+        self.assertEqual(Cliente.objects.count(), 20)
+        self.assertEqual(Credencial.objects.count(), 21)
+        self.assertGreater(Transferencia.objects.count(), 0)
+        self.assertEqual(resultado["linhas"], sum(t["linhas"] for t in resultado["tabelas"].values()))
+
+        abertura = LancamentoContabil.objects.filter(origem='abertura', conta='saldo')
+        self.assertEqual(sum(Cliente.objects.values_list('saldo', flat=True)), sum(l.valor for l in abertura))
+        agora = timezone.now()
+        for cliente in Cliente.objects.all():
+            self.assertEqual(LancamentoContabil.saldo_em(cliente, agora), cliente.saldo)
+            self.assertEqual(LancamentoContabil.saldo_em(cliente, agora, conta='creditos'), cliente.creditos)
+
+        for cartao in CartaoCliente.objects.filter(status='aprovado').select_related('cartao', 'cliente'):
+            self.assertTrue(luhn_valido(cartao.numero_cartao))
+            self.assertLessEqual(cartao.cartao.limite_minimo, cartao.cliente.creditos)
+
+        with self.assertRaises(ValueError):
+            semear(escala=0.02)
+
+
+"""Planos de consulta"""
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN é específico do SQLite")
+class PlanoDeConsultaTest(TestCase):
+    """Os caminhos mais acessados devem usar índice, sem varredura de tabela nem ordenação em árvore temporária."""
+
+    def assertUsaIndice(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            plano = [linha[-1] for linha in cursor.fetchall()]
+        for passo in plano:
+            self.assertNotRegex(passo, r"^SCAN \w+$", f"Varredura de tabela: {plano}")
+            self.assertNotIn("TEMP B-TREE", passo, f"Ordenação sem índice: {plano}")
+
+    def test_transferencias_enviadas_e_recebidas(self):
+        self.assertUsaIndice(Transferencia.objects.filter(remetente_id=1).order_by("-data_transferencia"))
+        self.assertUsaIndice(Transferencia.objects.filter(destinatario_id=1).order_by("-data_transferencia"))
+
+    def test_cartoes_do_cliente_por_status(self):
+        self.assertUsaIndice(CartaoCliente.objects.filter(cliente_id=1, status="aprovado").select_related("cartao"))
+
+    def test_fila_de_cartoes_do_gerente(self):
+        self.assertUsaIndice(
+            CartaoCliente.objects.filter(gerente_id=1)
+            .select_related("cliente", "cartao")
+            .order_by("-data_solicitacao")
+        )
+
+    def test_solicitacoes_de_credito_do_gerente(self):
+        self.assertUsaIndice(SolicitacaoCredito.objects.filter(gerente_id=1).order_by("-data_solicitacao"))
+
+    def test_clientes_do_gerente_por_status(self):
+        self.assertUsaIndice(
+            Cliente.objects.filter(gerente_responsavel_id=1, status_conta="ativa")
+            .only("id", "username", "cpf", "saldo")
+            .order_by("username", "id")
+        )
+
+    def test_extrato_do_cliente(self):
+        self.assertUsaIndice(lancamentos_do_cliente(1, ler_filtros({})))
+
+"""Model - Credencial"""
+class CredencialTest(TestCase):
+    def setUp(self):
+        self.gerente = Gerente.objects.create(
+            nome="Gerente", cpf="111.111.111-11", email="gerente@teste.com",
+            telefone="(11)99999-9999", matricula="G001", data_admissao=date(2020, 1, 1),
+            data_de_nascimento=date(1980, 1, 1), salario=Decimal("1000.00"),
+            password=make_password("123"),
+        )
+        self.cliente = Cliente.objects.create(
+            cpf="222.222.222-22", username="cliente", email="cliente@teste.com",
+            password=make_password("123"), data_de_nascimento=date(1990, 1, 1),
+            telefone="(11)88888-8888", tipo_de_conta="corrente",
+        )
+
+    def test_credenciais_criadas_e_sincronizadas(self):
+        """Criar ou alterar gerente e cliente mantém a credencial em dia"""
+        self.assertTrue(self.gerente.credencial.admUser)
+        self.assertFalse(self.cliente.credencial.admUser)
+
+        self.cliente.email = "novo@teste.com"
+        self.cliente.save()
+        self.assertTrue(Credencial.objects.filter(email="novo@teste.com", cliente=self.cliente).exists())
+        self.assertFalse(Credencial.objects.filter(email="cliente@teste.com").exists())
+
+    def test_login_do_cliente_em_uma_busca(self):
+        """O login resolve o usuário com uma única consulta de credencial"""
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.post(reverse("users:login"), {"email": "cliente@teste.com", "password": "123"})
+        self.assertRedirects(resp, reverse("users:perfil"), fetch_redirect_response=False)
+        self.assertEqual(self.client.session["user_id"], self.cliente.id)
+        buscas = [q for q in ctx.captured_queries if "users_" in q["sql"]]
+        self.assertEqual(len(buscas), 1)
+
+    def test_login_do_gerente(self):
+        resp = self.client.post(reverse("users:login"), {"email": "gerente@teste.com", "password": "123"})
+        self.assertRedirects(resp, reverse("users:perfil"), fetch_redirect_response=False)
+        self.assertTrue(self.client.session["admUser"])
+
+    def test_cadastro_nao_reusa_email_de_gerente(self):
+        """O e-mail de login é único entre gerentes e clientes"""
+        resp = self.client.post(reverse("users:cadastro"), {
+            "cpf": "333.333.333-33", "username": "novo", "email": "gerente@teste.com",
+            "password": "123", "data_de_nascimento": "2000-01-01",
+            "telefone": "(11)77777-7777", "tipo_de_conta": "corrente",
+        })
+        self.assertContains(resp, "Este e-mail já está cadastrado!")
+
+"""Login e cadastro assíncronos"""
+class HashAssincronoTest(TestCase):
+    def setUp(self):
+        self.cliente = Cliente.objects.create(
+            cpf="222.222.222-22", username="cliente", email="cliente@teste.com",
+            password=make_password("123"), data_de_nascimento=date(1990, 1, 1),
+            telefone="(11)88888-8888", tipo_de_conta="corrente",
+        )
+
+    async def test_login_pelo_cliente_assincrono(self):
+        """O login funciona pelo caminho ASGI"""
+        resp = await self.async_client.post(reverse("users:login"), {"email": "cliente@teste.com", "password": "123"})
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(resp.url, reverse("users:perfil"))
+
+    def test_pool_lotado_responde_503(self):
+        """Sem vagas no pool de hash, login e cadastro devolvem 503 com Retry-After"""
+        executor = ExecutorDeHash(1, 0)
+        executor._vagas.acquire()  # ocupa a única vaga
+        with mock.patch("users.hashing._executor", executor):
+            login = self.client.post(reverse("users:login"), {"email": "cliente@teste.com", "password": "123"})
+            cadastro = self.client.post(reverse("users:cadastro"), {
+                "cpf": "333.333.333-33", "username": "novo", "email": "novo@teste.com",
+                "password": "123", "data_de_nascimento": "2000-01-01",
+                "telefone": "(11)77777-7777", "tipo_de_conta": "corrente",
+            })
+
+        for resp in (login, cadastro):
+            self.assertEqual(resp.status_code, 503)
+            self.assertIn("Retry-After", resp)
+        self.assertFalse(Cliente.objects.filter(email="novo@teste.com").exists())
+
 """Model - Cartao"""
 class CartaoModelTest(TestCase):
     def setUp(self):
@@ -373,7 +1577,7 @@ class CartaoClienteModelTest(TestCase):
         nome="Carlos Gerente",
         cpf="111.222.333-44",
         email="carlos@example.com",
-        telefone="(11) 90000-0000",
+        telefone="(11)90000-0000",
         matricula="G002",
         data_admissao=date(2022, 5, 10),
         data_de_nascimento=date(1980, 2, 15),
@@ -389,7 +1593,7 @@ class CartaoClienteModelTest(TestCase):
             email="joana@example.com",
             password=make_password("senhaSegura123"),
             data_de_nascimento=date(1993, 4, 10),
-            telefone="(11) 95555-5555",
+            telefone="(11)95555-5555",
             saldo=Decimal('2000.00'),
             tipo_de_conta="corrente",
             status_conta="ativa",
@@ -415,6 +1619,11 @@ class CartaoClienteModelTest(TestCase):
         self.assertEqual(solicitacao.status, "pendente")
         self.assertIsNone(solicitacao.numero_cartao)
 
+    def test_solicitacao_vai_para_o_gerente_do_cliente(self):
+        """Sem gerente informado, a solicitação é atribuída ao gerente do cliente."""
+        solicitacao = CartaoCliente.objects.create(cliente=self.cliente, cartao=self.cartao)
+        self.assertEqual(solicitacao.gerente, self.gerente)
+
     def test_impedir_cartao_acima_limite(self):
         """Cliente com crédito insuficiente não pode solicitar o cartão."""
         self.cliente.creditos = Decimal('500.00')
@@ -459,6 +1668,8 @@ class CartaoClienteModelTest(TestCase):
 
         solicitacao.refresh_from_db()
         self.assertIsNotNone(solicitacao.numero_cartao)
+        self.assertTrue(luhn_valido(solicitacao.numero_cartao))
+        self.assertTrue(solicitacao.numero_cartao.startswith(settings.CARTAO_BIN))
         self.assertIsNotNone(solicitacao.validade)
         self.assertIsNotNone(solicitacao.cvv)
         self.assertIsNotNone(solicitacao.senha)
@@ -472,6 +1683,286 @@ class CartaoClienteModelTest(TestCase):
         )
         self.assertEqual(str(solicitacao), f"{self.cliente.username} - {self.cartao.nome} (pendente)")
 
+class PoolNumerosCartaoTest(TestCase):
+    def test_reabastecer_pool_ate_o_minimo(self):
+        """O pool é completado até o mínimo com números Luhn válidos do BIN."""
+        self.assertEqual(reabastecer_pool(minimo=30, lote=7), 30)
+        self.assertEqual(reabastecer_pool(minimo=30), 0)
+        for numero in NumeroCartaoDisponivel.objects.values_list('numero', flat=True):
+            self.assertTrue(luhn_valido(numero))
+            self.assertTrue(numero.startswith(settings.CARTAO_BIN))
+
+    def test_reivindicar_retira_do_pool(self):
+        """Números reivindicados saem do pool e não se repetem."""
+        reabastecer_pool(minimo=10)
+        numeros = reivindicar_numeros_cartao(4)
+        self.assertEqual(len(set(numeros)), 4)
+        self.assertEqual(NumeroCartaoDisponivel.objects.count(), 6)
+        self.assertFalse(NumeroCartaoDisponivel.objects.filter(numero__in=numeros).exists())
+
+    def test_reivindicar_com_pool_vazio_gera_na_hora(self):
+        """Sem números no pool, o restante é gerado na hora."""
+        reabastecer_pool(minimo=2)
+        numeros = reivindicar_numeros_cartao(5)
+        self.assertEqual(len(set(numeros)), 5)
+        self.assertTrue(all(luhn_valido(n) for n in numeros))
+        self.assertEqual(NumeroCartaoDisponivel.objects.count(), 0)
+
+
+class SolicitacoesCartaoEmLoteTest(TestCase):
+    def setUp(self):
+        self.gerente = Gerente.objects.create(
+            nome="Gerente Lote", cpf="500.000.000-00", email="lote@odinbank.com",
+            telefone="(11)90000-0000", matricula="L01", data_admissao=date(2020, 1, 1),
+            data_de_nascimento=date(1980, 1, 1), salario=Decimal("1.00"), password="senha123",
+        )
+        self.outro_gerente = Gerente.objects.create(
+            nome="Outro", cpf="500.000.000-01", email="outro@odinbank.com",
+            telefone="(11)90000-0000", matricula="L02", data_admissao=date(2020, 1, 1),
+            data_de_nascimento=date(1980, 1, 1), salario=Decimal("1.00"), password="senha123",
+        )
+        self.cartao = Cartao.objects.create(
+            nome="Básico", descricao="-", tipo="credito",
+            limite_minimo=Decimal("100.00"), limite_maximo=Decimal("1000.00"), cor_hex="#000000",
+        )
+        self.clientes = [self._cliente(i, self.gerente, Decimal("500.00")) for i in range(3)]
+        self.sem_limite = self._cliente(3, self.gerente, Decimal("10.00"))
+        self.de_outro = self._cliente(4, self.outro_gerente, Decimal("500.00"))
+
+        session = self.client.session
+        session["user_id"] = self.gerente.id
+        session["admUser"] = True
+        session.save()
+
+    def _cliente(self, i, gerente, creditos):
+        return Cliente.objects.create(
+            gerente_responsavel=gerente, cpf=f"{i:03d}.500.500-50", username=f"lote{i}",
+            email=f"lote{i}@teste.com", password="senha123", data_de_nascimento=date(1990, 1, 1),
+            telefone="(11)99999-9999", tipo_de_conta="corrente", creditos=creditos,
+        )
+
+    def _solicitar(self, cliente):
+        # bulk_create pula o clean(): a elegibilidade é conferida só na decisão
+        return CartaoCliente.objects.bulk_create([
+            CartaoCliente(cliente=cliente, gerente=cliente.gerente_responsavel, cartao=self.cartao)
+        ])[0]
+
+    def _decidir(self, solicitacoes, acao):
+        return self.client.post(
+            reverse("users:solicitacoes_cartoes"),
+            {"acao": acao, "solicitacoes": [s.id for s in solicitacoes]},
+        )
+
+    def test_aprovar_em_lote(self):
+        """Solicitações elegíveis são aprovadas com número, validade, cvv e senha."""
+        solicitacoes = [self._solicitar(c) for c in self.clientes]
+        resp = self._decidir(solicitacoes, "aprovar")
+        self.assertRedirects(resp, reverse("users:solicitacoes_cartoes"))
+
+        numeros = set()
+        for s in solicitacoes:
+            s.refresh_from_db()
+            self.assertEqual(s.status, "aprovado")
+            self.assertEqual(s.gerente, self.gerente)
+            self.assertTrue(luhn_valido(s.numero_cartao))
+            self.assertIsNotNone(s.validade)
+            self.assertEqual(len(s.cvv), 3)
+            self.assertEqual(len(s.senha), 4)
+            numeros.add(s.numero_cartao)
+        self.assertEqual(len(numeros), 3)
+
+    def test_ignora_inelegiveis_e_de_outro_gerente(self):
+        """Limite insuficiente, outro gerente e cartão repetido ficam de fora."""
+        ok = self._solicitar(self.clientes[0])
+        repetida = self._solicitar(self.clientes[0])
+        sem_limite = self._solicitar(self.sem_limite)
+        de_outro = self._solicitar(self.de_outro)
+
+        resultado = decidir_solicitacoes_cartao(
+            [ok.id, repetida.id, sem_limite.id, de_outro.id, 999999], "aprovar", self.gerente.id
+        )
+        self.assertEqual(resultado["processadas"], [ok.id])
+        self.assertEqual(
+            [i["id"] for i in resultado["ignoradas"]],
+            [repetida.id, sem_limite.id, de_outro.id, 999999],
+        )
+        for s in (repetida, sem_limite, de_outro):
+            s.refresh_from_db()
+            self.assertEqual(s.status, "pendente")
+
+    def test_negar_em_lote(self):
+        """Negar não gera dados de cartão."""
+        solicitacoes = [self._solicitar(c) for c in self.clientes]
+        self._decidir(solicitacoes, "negar")
+        for s in solicitacoes:
+            s.refresh_from_db()
+            self.assertEqual(s.status, "negado")
+            self.assertIsNone(s.numero_cartao)
+
+    def test_troca_de_gerente_leva_as_solicitacoes_pendentes(self):
+        """A listagem, a decisão individual e a em lote seguem o gerente gravado na solicitação."""
+        pendente = self._solicitar(self.clientes[0])
+        respondida = self._solicitar(self.clientes[1])
+        CartaoCliente.objects.filter(pk=respondida.pk).update(status="negado")
+
+        for cliente in self.clientes[:2]:
+            cliente.gerente_responsavel = self.outro_gerente
+            cliente.save()
+
+        pendente.refresh_from_db()
+        respondida.refresh_from_db()
+        self.assertEqual(pendente.gerente, self.outro_gerente)
+        self.assertEqual(respondida.gerente, self.gerente)
+
+        resp = self.client.get(reverse("users:solicitacoes_cartoes"))
+        self.assertNotIn(pendente, resp.context["solicitacoes"])
+        resp = self.client.get(reverse("users:aprovar_ou_negar_cartao", args=[pendente.id, "aprovar"]))
+        self.assertEqual(resp.status_code, 404)
+        resultado = decidir_solicitacoes_cartao([pendente.id], "aprovar", self.gerente.id)
+        self.assertEqual(resultado["processadas"], [])
+
+        resultado = decidir_solicitacoes_cartao([pendente.id], "aprovar", self.outro_gerente.id)
+        self.assertEqual(resultado["processadas"], [pendente.id])
+
+    def test_consultas_nao_dependem_do_tamanho_do_lote(self):
+        """O número de consultas é o mesmo para 2 ou 20 aprovações."""
+        reabastecer_pool(minimo=30)
+        pequeno = [self._solicitar(c) for c in self.clientes[:2]]
+        with CaptureQueriesContext(connection) as antes:
+            decidir_solicitacoes_cartao([s.id for s in pequeno], "aprovar", self.gerente.id)
+
+        cartoes = Cartao.objects.bulk_create([
+            Cartao(nome=f"Extra {i}", descricao="-", tipo="debito", limite_minimo=Decimal("0.00"),
+                   limite_maximo=Decimal("1.00"), cor_hex="#FFFFFF")
+            for i in range(20)
+        ])
+        grande = CartaoCliente.objects.bulk_create([
+            CartaoCliente(cliente=self.clientes[2], gerente=self.gerente, cartao=c) for c in cartoes
+        ])
+        with CaptureQueriesContext(connection) as depois:
+            resultado = decidir_solicitacoes_cartao([s.id for s in grande], "aprovar", self.gerente.id)
+        self.assertEqual(len(resultado["processadas"]), 20)
+        self.assertLessEqual(len(depois.captured_queries), len(antes.captured_queries))
+
+
+class CatalogoCartoesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ouro = Cartao.objects.create(nome="Ouro", tipo="credito", limite_minimo=Decimal("2000"),
+                                          limite_maximo=Decimal("10000"))
+        self.basico = Cartao.objects.create(nome="Básico", tipo="credito", limite_minimo=Decimal("0"),
+                                            limite_maximo=Decimal("1000"))
+        self.debito = Cartao.objects.create(nome="Débito", tipo="debito", limite_minimo=Decimal("0"),
+                                            limite_maximo=Decimal("0"))
+        self.cliente = Cliente.objects.create(
+            cpf="555.555.555-55", username="catalogo", email="catalogo@example.com", password="senha123",
+            data_de_nascimento=date(1990, 1, 1), telefone="(11)99999-9999", tipo_de_conta="corrente",
+        )
+        session = self.client.session
+        session["user_id"] = self.cliente.id
+        session["admUser"] = False
+        session.save()
+
+    def test_listagem_sem_consultas_ao_catalogo(self):
+        """Depois da primeira leitura, listar cartões não consulta a tabela de cartões"""
+        self.client.get(reverse("users:listar_cartoes"))
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse("users:listar_cartoes"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse([q for q in ctx.captured_queries if "users_cartao" in q["sql"]])
+        # Separado por tipo e ordenado pelo limite mínimo
+        self.assertEqual(resp.context["cartao_debito"], self.debito)
+        self.assertEqual(resp.context["cartao_credito1"], self.basico)
+        self.assertEqual(resp.context["cartao_credito2"], self.ouro)
+
+    def test_sinais_invalidam_o_catalogo(self):
+        self.assertEqual(len(catalogo.todos()), 3)
+        self.ouro.nome = "Ouro Plus"
+        self.ouro.save()
+        self.assertEqual(catalogo.obter(self.ouro.pk).nome, "Ouro Plus")
+        apagado = self.basico.pk
+        self.basico.delete()
+        self.assertEqual(catalogo.por_tipo("credito"), [self.ouro])
+        self.assertIsNone(catalogo.obter(apagado))
+
+        resp = self.client.post(reverse("users:solicitar_cartao", args=[apagado]))
+        self.assertEqual(resp.status_code, 404)
+
+    def test_aquecido_na_primeira_requisicao(self):
+        request_started.connect(aquecer_catalogo, dispatch_uid="odinbank_aquecer_catalogo")
+        catalogo.invalidar()
+        # Como o Client de testes: close_old_connections fecharia a conexão da
+        # transação do TestCase (no SQLite em memória ela nunca é fechada)
+        request_started.disconnect(close_old_connections)
+        try:
+            request_started.send(sender=self.__class__)
+        finally:
+            request_started.connect(close_old_connections)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(catalogo.todos()), 3)
+        # O receptor se desconecta depois de aquecer uma vez
+        self.assertFalse(request_started.disconnect(dispatch_uid="odinbank_aquecer_catalogo"))
+
+    def test_situacao_de_cada_cartao_em_uma_consulta(self):
+        """Possui, já solicitou, sem limite ou disponível, calculado em uma única consulta"""
+        Cliente.objects.filter(pk=self.cliente.pk).update(creditos=Decimal("1000"))
+        self.cliente.refresh_from_db()
+        CartaoCliente.objects.create(cliente=self.cliente, cartao=self.debito, status="aprovado")
+        CartaoCliente.objects.create(cliente=self.cliente, cartao=self.basico)
+        catalogo.aquecer()
+
+        with self.assertNumQueries(1):
+            situacoes = situacao_dos_cartoes(self.cliente)
+        self.assertEqual(situacoes, {
+            self.debito.pk: "aprovado", self.basico.pk: "pendente", self.ouro.pk: "sem_limite",
+        })
+        # Vem do cache da conta até a conta ou o catálogo mudarem
+        with self.assertNumQueries(0):
+            situacao_dos_cartoes(self.cliente)
+        novo = Cartao.objects.create(nome="Prata", tipo="credito", limite_minimo=Decimal("500"),
+                                     limite_maximo=Decimal("2000"))
+        self.assertEqual(situacao_dos_cartoes(self.cliente)[novo.pk], "disponivel")
+
+        resp = self.client.get(reverse("users:listar_cartoes"))
+        self.assertEqual(resp.context["situacao_credito2"], "disponivel")
+        self.assertEqual(resp.context["situacao_credito3"], "sem_limite")
+        self.assertContains(resp, "Limite insuficiente")
+        self.assertContains(resp, "Solicitação em análise")
+
+        # Pedido de um cartão fora do limite é recusado antes de tentar gravar
+        resp = self.client.post(reverse("users:solicitar_cartao", args=[self.ouro.pk]), follow=True)
+        self.assertContains(resp, "Seu limite atual não permite solicitar este cartão.")
+        self.assertFalse(CartaoCliente.objects.filter(cliente=self.cliente, cartao=self.ouro).exists())
+
+
+@skipUnless(connection.vendor == "sqlite", "perfil específico do SQLite")
+class PerfilSqliteTest(TestCase):
+    def _conexao(self, pasta):
+        conexao = sqlite3.connect(os.path.join(pasta, "perfil.sqlite3"), isolation_level=None)
+        self.addCleanup(conexao.close)
+        return SimpleNamespace(vendor="sqlite", connection=conexao)
+
+    def test_perfil_aplicado_em_novas_conexoes(self):
+        """Com o perfil ligado, cada conexão nova sai em WAL com os PRAGMAs configurados"""
+        with tempfile.TemporaryDirectory() as pasta, self.settings(SQLITE_PRODUCAO=True):
+            banco = self._conexao(pasta)
+            connection_created.send(sender=connection.__class__, connection=banco)
+            valores = {nome: banco.connection.execute(f"PRAGMA {nome}").fetchone()[0]
+                       for nome in ("journal_mode", "synchronous", "busy_timeout", "temp_store", "cache_size")}
+        self.assertEqual(valores["journal_mode"], "wal")
+        self.assertEqual(valores["synchronous"], 1)  # NORMAL
+        self.assertEqual(valores["busy_timeout"], settings.SQLITE_PRAGMAS["busy_timeout"])
+        self.assertEqual(valores["temp_store"], 2)  # MEMORY
+        self.assertEqual(valores["cache_size"], settings.SQLITE_PRAGMAS["cache_size"])
+
+    def test_perfil_desligado_nao_altera_conexao(self):
+        """Sem o opt-in, o banco continua no journal padrão"""
+        with tempfile.TemporaryDirectory() as pasta, self.settings(SQLITE_PRODUCAO=False):
+            banco = self._conexao(pasta)
+            connection_created.send(sender=connection.__class__, connection=banco)
+            self.assertEqual(banco.connection.execute("PRAGMA journal_mode").fetchone()[0], "delete")
+
+
 """Views"""
 class UsersViewsTests(TestCase):
     def setUp(self):
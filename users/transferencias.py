@@ -0,0 +1,153 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import Case, F, Value, When
+
+from .cache import invalidar_contas
+from .models import Cliente, LancamentoContabil, Transferencia, lancamentos_da_transferencia
+
+
+def ler_lote_csv(arquivo):
+    """Lê um lote em CSV com as colunas remetente, destinatario e valor."""
+    if isinstance(arquivo, bytes):
+        arquivo = arquivo.decode('utf-8-sig')
+    if isinstance(arquivo, str):
+        arquivo = io.StringIO(arquivo)
+    return [dict(linha) for linha in csv.DictReader(arquivo)]
+
+
+def ler_lote_json(conteudo):
+    """Lê um lote em JSON: uma lista de objetos ou {"transferencias": [...]}."""
+    dados = json.loads(conteudo) if isinstance(conteudo, (str, bytes)) else conteudo
+    if isinstance(dados, dict):
+        dados = dados.get('transferencias', [])
+    if not isinstance(dados, list):
+        raise ValueError("O lote deve ser uma lista de transferências.")
+    return dados
+
+
+def _erro(numero, mensagem):
+    return {"linha": numero, "status": "erro", "mensagem": mensagem}
+
+
+def processar_lote(linhas, remetente=None):
+    """
+    Aplica um lote de transferências em uma única transação.
+
+    Cada linha traz remetente (CPF), destinatario (CPF) e valor. Quando
+    `remetente` é informado, todas as linhas saem dessa conta. Os CPFs são
+    resolvidos em uma única consulta e as linhas são validadas em memória, na
+    ordem do lote. O saldo líquido de cada conta é aplicado com um único
+    UPDATE `saldo = saldo + delta`, sem reescrever valores lidos antes; os
+    lançamentos contábeis partem dos saldos lidos de volta após o UPDATE.
+    Retorna um relatório com o resultado de cada linha.
+    """
+    relatorio = []
+    pendentes = []
+
+    # Normaliza as linhas antes de tocar no banco
+    for numero, linha in enumerate(linhas, start=1):
+        if not isinstance(linha, dict):
+            relatorio.append(_erro(numero, "Linha em formato inválido."))
+            continue
+        cpf_remetente = remetente.cpf if remetente else str(linha.get('remetente') or '').strip()
+        cpf_destinatario = str(linha.get('destinatario') or '').strip()
+        try:
+            valor = Decimal(str(linha.get('valor', '')).strip())
+        except InvalidOperation:
+            relatorio.append(_erro(numero, "Valor inválido."))
+            continue
+        if not cpf_remetente or not cpf_destinatario:
+            relatorio.append(_erro(numero, "Preencha remetente e destinatário."))
+            continue
+        if not valor.is_finite() or valor <= 0:
+            relatorio.append(_erro(numero, "O valor da transferência deve ser maior que zero."))
+            continue
+        # Frações de centavo seriam gravadas arredondadas na transferência e no razão
+        if valor != valor.quantize(Decimal('0.01')):
+            relatorio.append(_erro(numero, "Valor inválido."))
+            continue
+        relatorio.append(None)
+        pendentes.append((numero, cpf_remetente, cpf_destinatario, valor))
+
+    if not pendentes:
+        return relatorio
+
+    cpfs = {p[1] for p in pendentes} | {p[2] for p in pendentes}
+
+    try:
+        with transaction.atomic():
+            clientes = {
+                c.cpf: c
+                for c in Cliente.objects.select_for_update()
+                .filter(cpf__in=cpfs)
+                .only('id', 'cpf', 'username', 'saldo')
+                .order_by('pk')
+            }
+
+            deltas = defaultdict(Decimal)
+            transferencias = []
+            for numero, cpf_remetente, cpf_destinatario, valor in pendentes:
+                origem = clientes.get(cpf_remetente)
+                destino = clientes.get(cpf_destinatario)
+                if origem is None:
+                    relatorio[numero - 1] = _erro(numero, "CPF do remetente não encontrado.")
+                    continue
+                if destino is None:
+                    relatorio[numero - 1] = _erro(numero, "CPF do destinatário não encontrado.")
+                    continue
+                if origem.pk == destino.pk:
+                    relatorio[numero - 1] = _erro(numero, "Você não pode transferir para si mesmo.")
+                    continue
+                if origem.saldo < valor:
+                    relatorio[numero - 1] = _erro(numero, "Saldo insuficiente para realizar a transferência.")
+                    continue
+
+                origem.saldo -= valor
+                destino.saldo += valor
+                deltas[origem.pk] -= valor
+                deltas[destino.pk] += valor
+                transferencias.append(Transferencia(remetente=origem, destinatario=destino, valor=valor))
+                relatorio[numero - 1] = {
+                    "linha": numero,
+                    "status": "ok",
+                    "mensagem": f"R$ {valor:.2f} para {destino.username}",
+                }
+
+            if transferencias:
+                Cliente.objects.filter(pk__in=deltas).update(saldo=F('saldo') + Case(
+                    *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+                    output_field=Cliente._meta.get_field('saldo'),
+                ))
+                Transferencia.objects.bulk_create(transferencias)
+
+                # Saldo após cada lançamento, a partir do valor final lido do banco
+                finais = dict(Cliente.objects.filter(pk__in=deltas).values_list('pk', 'saldo'))
+                correntes = {pk: finais[pk] - deltas[pk] for pk in deltas}
+                lancamentos = []
+                for transferencia in transferencias:
+                    correntes[transferencia.remetente_id] -= transferencia.valor
+                    correntes[transferencia.destinatario_id] += transferencia.valor
+                    lancamentos.extend(lancamentos_da_transferencia(
+                        transferencia,
+                        correntes[transferencia.remetente_id],
+                        correntes[transferencia.destinatario_id],
+                    ))
+                LancamentoContabil.objects.bulk_create(lancamentos)
+                invalidar_contas(*deltas)
+    except (IntegrityError, OperationalError) as erro:
+        # Saldo negativo por concorrência (IntegrityError) ou banco ocupado por
+        # outra escrita (OperationalError no SQLite): nada do lote é aplicado
+        if isinstance(erro, IntegrityError):
+            mensagem = "Lote não aplicado: saldo alterado durante o processamento."
+        else:
+            mensagem = "Lote não aplicado: banco ocupado, tente novamente."
+        for i, item in enumerate(relatorio):
+            if item and item["status"] == "ok":
+                relatorio[i] = _erro(item["linha"], mensagem)
+
+    return relatorio
@@ -12,7 +12,15 @@ urlpatterns = [
     path('solicitacoes/', views.lista_solicitacoes_gerente, name='lista_solicitacoes_gerente'),
     path('solicitacoes/<int:solicitacao_id>/', views.responder_solicitacao, name='responder_solicitacao'),
     path('transferencia/', views.transferencia, name="transferencia"),
+    path('transferencia/lote/', views.transferencia_lote, name="transferencia_lote"),
     path('extrato/', views.extrato, name='extrato'),
+    path('extrato/exportar/<str:formato>/', views.exportar_extrato, name='exportar_extrato'),
+    path(
+        'cliente/<int:cliente_id>/extrato/exportar/<str:formato>/',
+        views.exportar_extrato_cliente,
+        name='exportar_extrato_cliente'
+    ),
+    path('interno/metricas/', views.metricas, name='metricas'),
     path('cartoes/', views.listar_cartoes, name='listar_cartoes'),    
     path('cartoes/solicitar/<int:cartao_id>/', views.solicitar_cartao, name='solicitar_cartao'),
     path("meus-cartoes/", views.meus_cartoes, name="meus_cartoes"),
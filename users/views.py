@@ -1,21 +1,49 @@
+import hmac
+
 from django.shortcuts import redirect, render, get_object_or_404
-from .models import Cliente, Gerente, Transferencia, SolicitacaoCredito, Cartao, CartaoCliente
+from .models import Cliente, Gerente, Transferencia, SolicitacaoCredito, CartaoCliente, LancamentoContabil, Credencial
 from datetime import datetime
-from django.contrib.auth.hashers import make_password
 from django.contrib import messages
-from django.contrib.auth.hashers import check_password
-from django.db.models import Sum
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Q, Sum
 from .forms import SolicitacaoCreditoForm
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
 from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
+from .cache import contexto_em_cache
+from .catalogo import catalogo, situacao_dos_cartoes
+from .decorators import cliente_required, gerente_required
+from .metricas import registro
+from .middleware import principal_da_requisicao
+from .cartoes import RESPOSTAS, decidir_solicitacoes_cartao
+from .creditos import RESPOSTAS as RESPOSTAS_CREDITO, decidir_solicitacoes_credito
+from .exportacao import FORMATOS, em_blocos_assincronos
+from .extrato import ler_filtros, pagina_extrato
+from .fechamento import resumo_mensal
+from .hashing import FilaDeHashCheia, gerar_hash, verificar_senha
+from .transferencias import ler_lote_csv, ler_lote_json, processar_lote
+
+# Renderização fora do loop de eventos: templates podem ler a sessão (mensagens)
+arender = sync_to_async(render)
+
+AVISO_SERVICO_OCUPADO = "Muitas tentativas no momento. Tente novamente em instantes."
+
+def servico_ocupado(request, template):
+    """Resposta 503 quando o pool de hash de senhas está lotado."""
+    resposta = render(request, template, {"error": AVISO_SERVICO_OCUPADO}, status=503)
+    resposta["Retry-After"] = str(settings.HASH_RETRY_AFTER)
+    return resposta
 
 # Create your views here.
-def view_cadastro(request):
+async def view_cadastro(request):
     if request.method == 'POST':
         cpf = request.POST.get('cpf')
         username = request.POST.get('username')
         email = request.POST.get('email')
-        password = make_password(request.POST.get('password'))
         data_str = request.POST.get('data_de_nascimento')
         telefone = request.POST.get('telefone')
         tipo_de_conta = request.POST.get('tipo_de_conta')
@@ -25,18 +53,26 @@ def view_cadastro(request):
             data_de_nascimento = datetime.strptime(data_str, "%Y-%m-%d").date()
         except (ValueError, TypeError):
             messages.error(request, 'Data de nascimento inválida!')
-            return render(request, 'users/cadastro/index.html')
+            return await arender(request, 'users/cadastro/index.html')
 
-        # Verifica se já existe e-mail ou CPF cadastrados
-        if Cliente.objects.filter(email=email).exists():
+        # Verifica se já existe e-mail (de cliente ou gerente) ou CPF cadastrados
+        if await Credencial.objects.filter(email=email).aexists():
             messages.error(request, 'Este e-mail já está cadastrado!')
-            return render(request, 'users/cadastro/index.html')
+            return await arender(request, 'users/cadastro/index.html')
 
-        if Cliente.objects.filter(cpf=cpf).exists():
+        if await Cliente.objects.filter(cpf=cpf).aexists():
             messages.error(request, 'Este CPF já está cadastrado!')
-            return render(request, 'users/cadastro/index.html')
+            return await arender(request, 'users/cadastro/index.html')
+
+        # O hash (PBKDF2) roda no pool limitado, fora do worker da requisição
+        try:
+            password = await gerar_hash(request.POST.get('password'))
+        except FilaDeHashCheia:
+            messages.error(request, AVISO_SERVICO_OCUPADO)
+            return await sync_to_async(servico_ocupado)(request, 'users/cadastro/index.html')
 
-        new_cliente = Cliente(
+        # acreate instancia o cliente fora do loop: o número da conta pode consultar o banco
+        await Cliente.objects.acreate(
             cpf=cpf,
             username=username,
             email=email,
@@ -45,121 +81,182 @@ def view_cadastro(request):
             telefone=telefone,
             tipo_de_conta=tipo_de_conta
         )
-        new_cliente.save()
         messages.success(request, 'Cadastro realizado com sucesso!')
         return redirect('users:login')
 
-    return render(request, 'users/cadastro/index.html')
+    return await arender(request, 'users/cadastro/index.html')
 
-def view_login(request):
+async def view_login(request):
     if request.method == "POST":
         email = request.POST.get("email")
         password = request.POST.get("password")
 
-        user = None
+        # Gerentes e clientes são resolvidos em uma única busca pelo e-mail
+        credencial = await (
+            Credencial.objects.only("password", "admUser", "gerente_id", "cliente_id")
+            .filter(email=email)
+            .afirst()
+        )
 
-        # Primeiro tenta achar um gerente
+        # Verifica senha criptografada no pool de hash
         try:
-            user = Gerente.objects.get(email=email)
-        except Gerente.DoesNotExist:
-            # Se não for gerente, tenta achar um cliente
-            try:
-                user = Cliente.objects.get(email=email)
-            except Cliente.DoesNotExist:
-                return render(
-                    request,
-                    "users/login/index.html",
-                    {"error": "Usuário ou senha inválidos"}
-                )
-
-        # Verifica senha criptografada
-        if check_password(password, user.password):
-            request.session["user_id"] = user.id
-            request.session["admUser"] = user.admUser
+            senha_valida = credencial is not None and await verificar_senha(password, credencial.password)
+        except FilaDeHashCheia:
+            return await sync_to_async(servico_ocupado)(request, "users/login/index.html")
+
+        if senha_valida:
+            # Nova chave a cada login: evita fixação de sessão e cópias antigas em cache
+            await request.session.acycle_key()
+            await request.session.aset("user_id", credencial.usuario_id)
+            await request.session.aset("admUser", credencial.admUser)
             return redirect("users:perfil")
         else:
-            return render(
+            return await arender(
                 request,
                 "users/login/index.html",
                 {"error": "Usuário ou senha inválidos"}
             )
 
-    return render(request, "users/login/index.html")
+    return await arender(request, "users/login/index.html")
+
+CLIENTES_POR_PAGINA = 25
+
+def _pagina_clientes(request, queryset, total, parametro):
+    """Recorta uma página da listagem usando a contagem já calculada no resumo."""
+    total_paginas = max(1, -(-total // CLIENTES_POR_PAGINA))
+    try:
+        numero = min(max(int(request.GET.get(parametro, 1)), 1), total_paginas)
+    except ValueError:
+        numero = 1
+
+    inicio = (numero - 1) * CLIENTES_POR_PAGINA
+
+    def link(pagina):
+        params = request.GET.copy()
+        params[parametro] = pagina
+        return params.urlencode()
+
+    return {
+        "itens": list(queryset[inicio:inicio + CLIENTES_POR_PAGINA]) if total else [],
+        "numero": numero,
+        "total_paginas": total_paginas,
+        "anterior": link(numero - 1) if numero > 1 else None,
+        "proxima": link(numero + 1) if numero < total_paginas else None,
+    }
 
 def view_perfil(request):
-    if "user_id" not in request.session:
+    user = principal_da_requisicao(request)
+    if user is None:
         return redirect("users:login")
 
-    user_id = request.session["user_id"]
-    admUser = request.session.get("admUser", False)
-
-    if admUser:
-        user = Gerente.objects.get(id=user_id)
-        clientes = user.clientes.all()
-        
-        # Separar clientes por status
-        clientes_ativos = clientes.filter(status_conta='ativa')
-        clientes_inativos = clientes.filter(status_conta='inativa')
-        clientes_bloqueados = clientes.filter(status_conta='bloqueada')
-        
-        # Somatório de saldo apenas dos ativos
-        saldo_total = clientes_ativos.aggregate(total=Sum('saldo'))['total'] or 0
+    if isinstance(user, Gerente):
+        # Filtro direto (e não user.clientes) para o only() abaixo não
+        # disparar uma consulta por linha ao preencher o gerente conhecido
+        clientes = Cliente.objects.filter(gerente_responsavel=user)
+
+        # Contagens por status e saldo dos ativos em uma única consulta
+        resumo = clientes.aggregate(
+            total=Count("id"),
+            ativos=Count("id", filter=Q(status_conta="ativa")),
+            inativos=Count("id", filter=Q(status_conta="inativa")),
+            bloqueados=Count("id", filter=Q(status_conta="bloqueada")),
+            saldo_total=Sum("saldo", filter=Q(status_conta="ativa")),
+        )
+        saldo_total = resumo["saldo_total"] or 0
+
+        # Tabelas paginadas, trazendo só as colunas exibidas
+        listagem = clientes.only("id", "username", "cpf", "saldo").order_by("username", "id")
+        tabelas = {
+            nome: _pagina_clientes(
+                request, listagem.filter(status_conta=status), resumo[nome], f"pagina_{nome}"
+            )
+            for nome, status in (("ativos", "ativa"), ("inativos", "inativa"), ("bloqueados", "bloqueada"))
+        }
 
         return render(
             request,
             "users/perfil/gerente/index.html",
             {
                 "user": user,
-                "clientes": clientes,
-                "clientes_ativos": clientes_ativos,
-                "clientes_inativos": clientes_inativos,
-                "clientes_bloqueados": clientes_bloqueados,
+                "resumo": resumo,
+                "clientes_ativos": tabelas["ativos"],
+                "clientes_inativos": tabelas["inativos"],
+                "clientes_bloqueados": tabelas["bloqueados"],
                 "saldo_total": saldo_total,
             }
         )
 
     # Se for cliente
-    user = Cliente.objects.get(id=user_id)
-    return render(request, "users/perfil/cliente/index.html", {"user": user})
-
-def view_cliente_detalhes(request, cliente_id):
-    if "user_id" not in request.session:
-        return redirect("users:login")
+    def montar_pagina():
+        return {"user": user, "solicitacoes": list(user.solicitacoes.all())}
 
-    admUser = request.session.get("admUser", False)
-    if not admUser:
-        return redirect("users:perfil")
+    context = contexto_em_cache(user.id, "perfil", montar_pagina)
+    return render(request, "users/perfil/cliente/index.html", context)
 
+@gerente_required(mensagem=None, destino="users:perfil")
+def view_cliente_detalhes(request, cliente_id):
     cliente = Cliente.objects.get(id=cliente_id)
 
     # 🔹 Se o gerente enviou o formulário
     if request.method == "POST":
-        cliente.username = request.POST.get("username")
-        cliente.cpf = request.POST.get("cpf")
-        cliente.email = request.POST.get("email")
-        cliente.telefone = request.POST.get("telefone")
-        cliente.tipo_de_conta = request.POST.get("tipo_de_conta")
-        cliente.status_conta = request.POST.get("status_conta")
-        cliente.saldo = request.POST.get("saldo")
-
-        cliente.save()
+        try:
+            novo_saldo = Decimal(request.POST.get("saldo"))
+        except (InvalidOperation, TypeError):
+            messages.error(request, "Saldo inválido.")
+            return redirect("users:cliente_detalhes", cliente_id=cliente.id)
+        # O banco não aceita saldo negativo (cliente_saldo_nao_negativo) e o razão guarda centavos
+        if not novo_saldo.is_finite() or novo_saldo < 0 or novo_saldo != novo_saldo.quantize(Decimal("0.01")):
+            messages.error(request, "Saldo inválido.")
+            return redirect("users:cliente_detalhes", cliente_id=cliente.id)
+
+        # O e-mail é único entre clientes e gerentes (tabela de credenciais)
+        email = request.POST.get("email")
+        if Credencial.objects.filter(email=email).exclude(cliente=cliente).exists():
+            messages.error(request, "Este e-mail já está cadastrado!")
+            return redirect("users:cliente_detalhes", cliente_id=cliente.id)
+
+        with transaction.atomic():
+            # Recarrega com trava: uma transferência entre a primeira leitura e
+            # o UPDATE não pode ficar de fora do saldo anterior nem do save()
+            cliente = Cliente.objects.select_for_update().get(id=cliente.id)
+            saldo_anterior = cliente.saldo
+
+            cliente.username = request.POST.get("username")
+            cliente.cpf = request.POST.get("cpf")
+            cliente.email = email
+            cliente.telefone = request.POST.get("telefone")
+            cliente.tipo_de_conta = request.POST.get("tipo_de_conta")
+            cliente.status_conta = request.POST.get("status_conta")
+            cliente.saldo = novo_saldo
+            cliente.save()
+
+            # Alteração manual de saldo fica registrada no razão
+            diferenca = novo_saldo - saldo_anterior
+            if diferenca:
+                LancamentoContabil.objects.create(
+                    cliente=cliente,
+                    origem="ajuste",
+                    tipo="credito" if diferenca > 0 else "debito",
+                    valor=abs(diferenca),
+                    saldo_apos=novo_saldo,
+                    descricao="Ajuste do gerente",
+                )
 
-        from django.contrib import messages
         messages.success(request, "Dados do cliente atualizados com sucesso!")
         return redirect("users:cliente_detalhes", cliente_id=cliente.id)
 
     return render(request, "users/perfil/gerente/cliente_detalhes.html", {"cliente": cliente})
 
+@cliente_required
 def solicitar_credito(request):
-    cliente_id = request.session.get("user_id")
-    cliente = get_object_or_404(Cliente, id=cliente_id)
+    cliente = request.principal
 
     if request.method == "POST":
         form = SolicitacaoCreditoForm(request.POST)
         if form.is_valid():
             solicitacao = form.save(commit=False)
             solicitacao.cliente = cliente
-            solicitacao.gerente = cliente.gerente_responsavel
+            solicitacao.gerente_id = cliente.gerente_responsavel_id
             solicitacao.save()
             return redirect('users:perfil')  # ajuste para sua rota
     else:
@@ -167,16 +264,40 @@ def solicitar_credito(request):
 
     return render(request, 'users/perfil/cliente/solicitar_credito.html', {'form': form})
 
+@gerente_required
 def lista_solicitacoes_gerente(request):
-    gerente_id = request.session.get("user_id")
-    gerente = get_object_or_404(Gerente, id=gerente_id)
-    solicitacoes = SolicitacaoCredito.objects.filter(gerente=gerente).order_by('-data_solicitacao')
+    gerente = request.principal
+
+    if request.method == "POST":
+        # Ação em lote: aprova ou nega todas as solicitações marcadas de uma vez
+        acao = request.POST.get("acao")
+        try:
+            ids = [int(i) for i in request.POST.getlist("solicitacoes")]
+        except ValueError:
+            ids = []
+        if acao not in RESPOSTAS_CREDITO or not ids:
+            messages.error(request, "Selecione ao menos uma solicitação e uma ação válida.")
+            return redirect("users:lista_solicitacoes_gerente")
+
+        resultado = decidir_solicitacoes_credito(ids, acao, gerente.id, request.POST.get("resposta", "").strip())
+        if resultado["processadas"]:
+            messages.success(request, f"{len(resultado['processadas'])} solicitação(ões) {acao}da(s) com sucesso!")
+        for ignorada in resultado["ignoradas"]:
+            messages.warning(request, f"Solicitação {ignorada['id']}: {ignorada['mensagem']}")
+        return redirect("users:lista_solicitacoes_gerente")
+
+    solicitacoes = (
+        SolicitacaoCredito.objects.filter(gerente=gerente)
+        .select_related('cliente')
+        .order_by('-data_solicitacao')
+    )
 
     return render(request, 'users/perfil/gerente/solicitacoes.html', {'gerente': gerente, 'solicitacoes': solicitacoes})
 
 
+@gerente_required
 def responder_solicitacao(request, solicitacao_id):
-    solicitacao = get_object_or_404(SolicitacaoCredito, id=solicitacao_id)
+    solicitacao = get_object_or_404(SolicitacaoCredito, id=solicitacao_id, gerente=request.principal)
 
     if request.method == "POST":
         acao = request.POST.get("acao")
@@ -195,17 +316,9 @@ def responder_solicitacao(request, solicitacao_id):
 
     return render(request, 'users/perfil/gerente/responder_solicitacao.html', {'solicitacao': solicitacao})
 
+@cliente_required(mensagem="Apenas clientes podem realizar transferências.")
 def transferencia(request):
-    # Garante que o usuário está logado e é um cliente
-    if "user_id" not in request.session:
-        return redirect("users:login")
-
-    admUser = request.session.get("admUser", False)
-    if admUser:
-        messages.error(request, "Apenas clientes podem realizar transferências.")
-        return redirect("users:perfil")
-
-    remetente = get_object_or_404(Cliente, id=request.session["user_id"])
+    remetente = request.principal
 
     if request.method == "POST":
         cpf_destinatario = request.POST.get("cpf", "").strip()
@@ -256,72 +369,134 @@ def transferencia(request):
     # Renderiza a página (tanto GET quanto erros no POST)
     return render(request, "users/perfil/cliente/transferencia.html", {"user": remetente})
 
-def extrato(request):
-    # Garante que o usuário está logado e é um cliente
-    if "user_id" not in request.session:
-        return redirect("users:login")
-
-    admUser = request.session.get("admUser", False)
-    if admUser:
-        messages.error(request, "Apenas clientes podem acessar o extrato.")
-        return redirect("users:perfil")
+@require_POST
+@cliente_required(mensagem="Apenas clientes podem realizar transferências.", json=True)
+def transferencia_lote(request):
+    remetente = request.principal
 
-    # Pega o cliente logado
-    cliente = get_object_or_404(Cliente, id=request.session["user_id"])
-
-    # Busca transferências enviadas e recebidas
-    transferencias_enviadas = cliente.transferencias_enviadas.all()
-    transferencias_recebidas = cliente.transferencias_recebidas.all()
+    # Aceita um arquivo CSV enviado no campo "arquivo" ou um corpo JSON
+    try:
+        if "arquivo" in request.FILES:
+            linhas = ler_lote_csv(request.FILES["arquivo"].read())
+        else:
+            linhas = ler_lote_json(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({"erro": "Lote inválido."}, status=400)
+
+    resultados = processar_lote(linhas, remetente=remetente)
+    sucesso = sum(1 for r in resultados if r["status"] == "ok")
+
+    return JsonResponse({
+        "sucesso": sucesso,
+        "falhas": len(resultados) - sucesso,
+        "resultados": resultados,
+    })
+
+def metricas(request):
+    """Métricas das views no formato de texto do Prometheus (só para IPs internos e, se configurado, com token)."""
+    if request.META.get("REMOTE_ADDR") not in settings.METRICAS_IPS:
+        raise Http404
+    if settings.METRICAS_TOKEN and not hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(), f"Bearer {settings.METRICAS_TOKEN}".encode()
+    ):
+        raise Http404
+    return HttpResponse(registro.exportar(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+@cliente_required(mensagem="Apenas clientes podem acessar o extrato.")
+def extrato(request):
+    cliente = request.principal
+
+    def montar_pagina():
+        # Lê os lançamentos do razão em uma única consulta, paginada por cursor
+        lancamentos, proximo_cursor = pagina_extrato(cliente, request.GET)
+        return {
+            "user": cliente,
+            "lancamentos": lancamentos,
+            "proximo_cursor": proximo_cursor,
+            # Meses fechados vêm prontos do SaldoMensal; só o mês em aberto é somado
+            "resumo_mensal": resumo_mensal(cliente),
+        }
+
+    # Só a primeira página sem filtros vai para o cache
+    if request.GET:
+        pagina = montar_pagina()
+    else:
+        pagina = contexto_em_cache(cliente.id, "extrato", montar_pagina)
 
-    # Combina e ordena por data
-    todas_transferencias = sorted(
-        list(transferencias_enviadas) + list(transferencias_recebidas),
-        key=lambda t: t.data_transferencia,
-        reverse=True
-    )
+    proxima_pagina = None
+    if pagina["proximo_cursor"]:
+        params = request.GET.copy()
+        params["cursor"] = pagina["proximo_cursor"]
+        proxima_pagina = params.urlencode()
 
     context = {
-        "user": cliente,
-        "transferencias": todas_transferencias,
+        "user": pagina["user"],
+        "lancamentos": pagina["lancamentos"],
+        "proxima_pagina": proxima_pagina,
+        "resumo_mensal": pagina["resumo_mensal"],
+        "filtros": request.GET,
     }
     return render(request, 'users/perfil/cliente/extrato.html', context)
 
-def listar_cartoes(request):
-    if "user_id" not in request.session:
-        return redirect("users:login")
-
-    cliente = get_object_or_404(Cliente, id=request.session["user_id"])
-    cartoes = Cartao.objects.all()
-
-    # Separar cartões por tipo
-    cartao_debito = next((c for c in cartoes if c.tipo == 'debito'), None)
-    creditos = [c for c in cartoes if c.tipo == 'credito']
-
-    context = {
-        "user": cliente,
-        "cartao_debito": cartao_debito,
-        "cartao_credito1": creditos[0] if len(creditos) > 0 else None,
-        "cartao_credito2": creditos[1] if len(creditos) > 1 else None,
-        "cartao_credito3": creditos[2] if len(creditos) > 2 else None,
+def _extrato_em_arquivo(request, cliente, formato):
+    """Resposta em streaming: as linhas saem do banco em blocos direto para o cliente HTTP."""
+    if formato not in FORMATOS:
+        raise Http404
+    gerar, content_type = FORMATOS[formato]
+    conteudo = gerar(cliente, ler_filtros(request.GET))
+    if isinstance(request, ASGIRequest):
+        conteudo = em_blocos_assincronos(conteudo)
+    resposta = StreamingHttpResponse(conteudo, content_type=content_type)
+    resposta["Content-Disposition"] = f'attachment; filename="extrato-{cliente.numero_da_conta}.{formato}"'
+    return resposta
+
+@cliente_required(mensagem="Apenas clientes podem exportar o extrato.")
+def exportar_extrato(request, formato):
+    return _extrato_em_arquivo(request, request.principal, formato)
+
+@gerente_required(mensagem=None, destino="users:perfil")
+def exportar_extrato_cliente(request, cliente_id, formato):
+    # Auditoria: o gerente exporta o extrato dos clientes que atende
+    cliente = get_object_or_404(Cliente, id=cliente_id, gerente_responsavel=request.principal)
+    return _extrato_em_arquivo(request, cliente, formato)
+
+def _contexto_catalogo(cliente):
+    # O catálogo já vem do cache separado por tipo: nenhuma consulta ao banco
+    debito = catalogo.por_tipo('debito')
+    creditos = catalogo.por_tipo('credito')
+    cartoes = {
+        "debito": debito[0] if debito else None,
+        "credito1": creditos[0] if len(creditos) > 0 else None,
+        "credito2": creditos[1] if len(creditos) > 1 else None,
+        "credito3": creditos[2] if len(creditos) > 2 else None,
     }
+    # Situação de cada cartão para o cliente, para a página já mostrar o que pode ser solicitado
+    situacoes = situacao_dos_cartoes(cliente)
+    context = {"user": cliente}
+    for nome, cartao in cartoes.items():
+        context[f"cartao_{nome}"] = cartao
+        context[f"situacao_{nome}"] = situacoes.get(cartao.pk) if cartao else None
+    return context
+
+@cliente_required
+def listar_cartoes(request):
+    return render(request, "users/perfil/cliente/listar_cartoes.html", _contexto_catalogo(request.principal))
 
-    return render(request, "users/perfil/cliente/listar_cartoes.html", context)
-
+@cliente_required
 def solicitar_cartao(request, cartao_id):
-    if "user_id" not in request.session:
-        return redirect("users:login")
-
-    cliente = get_object_or_404(Cliente, id=request.session["user_id"])
-    cartao = get_object_or_404(Cartao, id=cartao_id)
+    cliente = request.principal
+    cartao = catalogo.obter(cartao_id)
+    if cartao is None:
+        raise Http404
 
     # 🔒 Impede solicitações duplicadas do mesmo cartão (pendente ou aprovado)
-    solicitacao_existente = CartaoCliente.objects.filter(
-        cliente=cliente, 
-        cartao=cartao
-    ).exclude(status="negado").exists()
-    if solicitacao_existente:
+    situacao = situacao_dos_cartoes(cliente).get(cartao.pk)
+    if situacao in ("pendente", "aprovado"):
         messages.warning(request, f"Você já possui uma solicitação ou um cartão {cartao.nome}.")
         return redirect("users:listar_cartoes")
+    if situacao == "sem_limite":
+        messages.error(request, "Seu limite atual não permite solicitar este cartão.")
+        return redirect("users:listar_cartoes")
 
     if request.method == "POST":
         try:
@@ -337,35 +512,23 @@ def solicitar_cartao(request, cartao_id):
             messages.error(request, e.messages[0])
             return redirect("users:listar_cartoes")
 
-    return render(request, "users/perfil/cliente/listar_cartoes.html", {
-        "user": cliente,
-        "cartoes": Cartao.objects.all(),
-    }) 
+    return render(request, "users/perfil/cliente/listar_cartoes.html", _contexto_catalogo(cliente))
 
+@cliente_required(mensagem="Apenas clientes podem visualizar seus cartões.")
 def meus_cartoes(request):
-    # Garante que o usuário está logado e é um cliente
-    if "user_id" not in request.session:
-        return redirect("users:login")
-
-    admUser = request.session.get("admUser", False)
-    if admUser:
-        messages.error(request, "Apenas clientes podem visualizar seus cartões.")
-        return redirect("users:perfil")
-
-    # Busca o cliente logado
-    cliente = get_object_or_404(Cliente, id=request.session["user_id"])
+    cliente = request.principal
 
-    # Busca os cartões conforme o status
-    cartoes_pendentes = CartaoCliente.objects.filter(cliente=cliente, status="pendente")
-    cartoes_aprovados = CartaoCliente.objects.filter(cliente=cliente, status="aprovado")
-    cartoes_negados = CartaoCliente.objects.filter(cliente=cliente, status="negado")
+    def montar_pagina():
+        # Busca os cartões conforme o status
+        cartoes = CartaoCliente.objects.filter(cliente=cliente).select_related("cartao")
+        return {
+            "cliente": cliente,
+            "cartoes_pendentes": list(cartoes.filter(status="pendente")),
+            "cartoes_aprovados": list(cartoes.filter(status="aprovado")),
+            "cartoes_negados": list(cartoes.filter(status="negado")),
+        }
 
-    context = {
-        "cliente": cliente,
-        "cartoes_pendentes": cartoes_pendentes,
-        "cartoes_aprovados": cartoes_aprovados,
-        "cartoes_negados": cartoes_negados,
-    }
+    context = contexto_em_cache(cliente.id, "meus_cartoes", montar_pagina)
 
     return render(request, "users/perfil/cliente/meus_cartoes.html", context)
 
@@ -373,23 +536,32 @@ from django.shortcuts import render, redirect
 from django.contrib import messages
 from users.models import CartaoCliente, Gerente
 
+@gerente_required
 def visualizar_solicitacoes_cartoes(request):
-    # Garante que o gerente está logado
-    if "user_id" not in request.session or not request.session.get("admUser", False):
-        messages.error(request, "Apenas gerentes podem acessar esta página.")
-        return redirect("users:login")
-
-    gerente_id = request.session["user_id"]
+    gerente = request.principal
 
-    try:
-        gerente = Gerente.objects.get(id=gerente_id)
-    except Gerente.DoesNotExist:
-        messages.error(request, "Gerente não encontrado.")
-        return redirect("users:login")
+    if request.method == "POST":
+        # Ação em lote: aprova ou nega todas as solicitações marcadas de uma vez
+        acao = request.POST.get("acao")
+        try:
+            ids = [int(i) for i in request.POST.getlist("solicitacoes")]
+        except ValueError:
+            ids = []
+        if acao not in RESPOSTAS or not ids:
+            messages.error(request, "Selecione ao menos uma solicitação e uma ação válida.")
+            return redirect("users:solicitacoes_cartoes")
+
+        resultado = decidir_solicitacoes_cartao(ids, acao, gerente.id)
+        if resultado["processadas"]:
+            messages.success(request, f"{len(resultado['processadas'])} solicitação(ões) {acao}da(s) com sucesso!")
+        for ignorada in resultado["ignoradas"]:
+            messages.warning(request, f"Solicitação {ignorada['id']}: {ignorada['mensagem']}")
+        return redirect("users:solicitacoes_cartoes")
 
     # Pega TODAS as solicitações de cartões de clientes desse gerente
+    # (o gerente do cliente é gravado na própria solicitação ao criá-la)
     solicitacoes = CartaoCliente.objects.filter(
-        cliente__gerente_responsavel=gerente
+        gerente=gerente
     ).select_related("cliente", "cartao").order_by("-data_solicitacao")
 
     context = {
@@ -402,14 +574,10 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from users.models import CartaoCliente, Gerente
 
+@gerente_required(mensagem="Apenas gerentes podem realizar essa ação.")
 def aprovar_ou_negar_cartao(request, solicitacao_id, acao):
-    # Verifica se o gerente está logado
-    if "user_id" not in request.session or not request.session.get("admUser", False):
-        messages.error(request, "Apenas gerentes podem realizar essa ação.")
-        return redirect("users:login")
-
-    gerente_id = request.session["user_id"]
-    solicitacao = get_object_or_404(CartaoCliente, id=solicitacao_id, cliente__gerente_responsavel_id=gerente_id)
+    gerente_id = request.principal.id
+    solicitacao = get_object_or_404(CartaoCliente, id=solicitacao_id, gerente_id=gerente_id)
 
     if acao not in ["aprovar", "negar"]:
         messages.error(request, "Ação inválida.")